@@ -0,0 +1,185 @@
+"""
+Benchmarks of the congestion control classes, the ACK generators and `simulate`.
+
+Each case runs at several trace sizes and loss probabilities and reports:
+- `acks_per_sec`: ACKs processed (or generated) per second, from the best of `--repeat` runs;
+- `ns_per_ack`: the same as nanoseconds per ACK (for the `update_cwnd/*` cases, per `update_cwnd` call);
+- `peak_bytes`: peak of the memory allocated by Python during one extra run (`tracemalloc`).
+
+The results can be saved as a JSON baseline and compared with a later run: a case is flagged as
+a regression when its time or its peak memory grows more than `--threshold` over the baseline,
+and the script then exits with status 1. Everything runs offline, with the standard library and NumPy.
+
+Example:
+python benchmark.py --sizes 10000 100000 --save-baseline baseline.json
+python benchmark.py --sizes 10000 100000 --baseline baseline.json --threshold 0.15
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from methods.base import REGISTRY, available_algorithms
+from simulation import generate_ack_array, generate_ack_trace, simulate, BASE_RTT
+
+
+SIZES = (10_000, 100_000)
+LOSS_PROBS = (0.01, 0.1)
+REPEAT = 3
+THRESHOLD = 0.10  # Relative slowdown (or memory growth) flagged as a regression
+MEMORY_SLACK = 64 * 1024  # Peak memory growth (bytes) always tolerated: small peaks are noisy
+
+
+def _update_cwnd_case(cls, trace):
+    """Calls `update_cwnd` once per ACK of `trace` on a new `cls` object."""
+    times = trace['time'].tolist()
+    losses = trace['loss'].tolist()
+    if cls().uses_rtt:
+        rtts = trace['rtt'].tolist()
+
+        def run():
+            tcp = cls()
+            for ack_time, loss_event, rtt in zip(times, losses, rtts):
+                tcp.update_cwnd(ack_time, loss_event, rtt=rtt)
+    else:
+        def run():
+            tcp = cls()
+            for ack_time, loss_event in zip(times, losses):
+                tcp.update_cwnd(ack_time, loss_event)
+    return run
+
+
+def make_cases(sizes=SIZES, loss_probs=LOSS_PROBS, seed=1):
+    """
+    Returns the benchmark cases: a dict of name -> (number of ACKs, function to time).
+
+    The traces are generated here, so they are not part of the measured time.
+    """
+    simulated = available_algorithms()
+    classes = {name: REGISTRY[name] for name in simulated}
+    cases = {}
+    for num_acks in sizes:
+        for loss_prob in loss_probs:
+            suffix = f"n={num_acks}/loss={loss_prob}"
+            # the RTT column is drawn last: the other columns are the same as without it
+            trace = generate_ack_trace(num_acks=num_acks, loss_prob=loss_prob, seed=seed, base_rtt=BASE_RTT)
+            for name, cls in classes.items():
+                cases[f"update_cwnd/{name}/{suffix}"] = (num_acks, _update_cwnd_case(cls, trace))
+            for name in simulated:
+                cases[f"simulate/{name}/{suffix}"] = (
+                    num_acks, lambda cls=classes[name], trace=trace: simulate(cls(), trace))
+            cases[f"generate_ack_array/{suffix}"] = (
+                num_acks, lambda n=num_acks, p=loss_prob: generate_ack_array(num_acks=n, loss_prob=p, seed=seed))
+            cases[f"generate_ack_trace/{suffix}"] = (
+                num_acks, lambda n=num_acks, p=loss_prob: generate_ack_trace(num_acks=n, loss_prob=p, seed=seed))
+    return cases
+
+
+def measure(func, num_acks, repeat=REPEAT):
+    """Runs `func` `repeat` times (best time) and once more under `tracemalloc` (peak memory)."""
+    best = float('inf')
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'num_acks': num_acks,
+        'seconds': best,
+        'acks_per_sec': num_acks / best if best > 0 else float('inf'),
+        'ns_per_ack': best / num_acks * 1e9,
+        'peak_bytes': peak,
+    }
+
+
+def run_benchmarks(cases, repeat=REPEAT, pattern=None):
+    """Measures the cases whose name contains `pattern` (all by default), printing one line per case."""
+    results = {}
+    for name, (num_acks, func) in cases.items():
+        if pattern is not None and pattern not in name:
+            continue
+        results[name] = measure(func, num_acks, repeat)
+        r = results[name]
+        print("{:50s} {:14,.0f} ACKs/s {:10.1f} ns/ACK {:12,d} B peak".format(
+            name, r['acks_per_sec'], r['ns_per_ack'], r['peak_bytes']), file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compares `results` with the `baseline` results (cases missing from either are skipped).
+
+    Returns:
+    - The list of regressions, as (case, metric, baseline value, new value).
+    """
+    regressions = []
+    for name, r in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['ns_per_ack'], r['ns_per_ack']
+        if new > old * (1 + threshold):
+            regressions.append((name, 'ns_per_ack', old, new))
+        old, new = baseline[name]['peak_bytes'], r['peak_bytes']
+        if new > old * (1 + threshold) + MEMORY_SLACK:
+            regressions.append((name, 'peak_bytes', old, new))
+    return regressions
+
+
+def environment():
+    """Describes the machine: baselines are only comparable on the same one."""
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'system': platform.platform(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the congestion control algorithms and the simulator")
+
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES), help="trace sizes (ACKs)")
+    parser.add_argument('--loss-probs', nargs='+', type=float, default=list(LOSS_PROBS))
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="runs per case (the best one is kept)")
+    parser.add_argument('--filter', default=None, help="only run the cases whose name contains this string")
+
+    parser.add_argument('--save-baseline', default=None, help="save the results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="compare the results with this JSON baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help="relative growth of time or memory flagged as a regression (default: 0.10)")
+
+    args = parser.parse_args()
+
+    results = run_benchmarks(make_cases(args.sizes, args.loss_probs), repeat=args.repeat, pattern=args.filter)
+
+    if args.save_baseline is not None:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['environment'] != environment():
+            print("warning: the baseline was measured on another environment", file=sys.stderr)
+        regressions = compare(results, baseline['results'], args.threshold)
+        for name, metric, old, new in regressions:
+            print("REGRESSION {:50s} {:10s} {:14,.1f} -> {:14,.1f} ({:+.1%})".format(
+                name, metric, old, new, new / old - 1))
+        if regressions:
+            raise SystemExit(1)
+        print(f"no regression over {args.threshold:.0%} ({len(results)} cases)")
@@ -0,0 +1,249 @@
+"""
+Disk-backed, content-addressed cache of simulation results.
+
+A result is stored under the hash of everything it depends on:
+- the congestion control class and the source of the modules defining it, its base classes and its
+  transition kernel (`methods.kernels`), so editing an algorithm invalidates its results;
+- the state of the object before the run (constructor parameters such as `cwnd`, `ssthresh`, `hystart`);
+- the `time` and `loss` columns of the trace (and `rtt` for the algorithms that take RTT samples);
+- the kind of result (e.g., 'simulate' or 'summary') and its parameters.
+
+Each entry is one pickle file holding the results and the final state of the congestion control object,
+which is copied back on a hit, so a cached run leaves `tcp` as a real run would.
+The entries are written to a temporary file and renamed (`os.replace`), so parallel workers can share a
+cache directory: a reader sees a complete entry or none. The total size is bounded by evicting the least
+recently used entries (a hit refreshes the modification time of its file).
+
+Pickle files run code when loaded: only use a cache directory that you trust.
+
+Example:
+python simulation.py --use-cubic --seed 1 --num-acks 1000000 --no-plot --cache ~/.cache/tcp-congestion
+"""
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+from collections import deque
+
+import numpy as np
+
+
+CACHE_VERSION = 1  # Bump when the format of the cached results changes
+MAX_BYTES = 1 << 30  # Default size bound of a cache directory (1 GiB)
+EVICT_TO = 0.9  # Eviction goes down to this fraction of the bound, so the next writes do not scan again
+SUFFIX = '.pkl'
+HASH_CHUNK = 1 << 20  # Number of values hashed at a time
+
+_source_hashes = {}  # class -> hash of its source (None if not available)
+
+
+def _source_hash(cls):
+    """
+    Hash of the source files of the modules defining `cls`, its base classes and its transition kernel
+    (`cls.kernel`, see `methods.kernels`), None if one is not available.
+    """
+    if cls not in _source_hashes:
+        digest = hashlib.blake2b(digest_size=16)
+        try:
+            sources = [klass for klass in cls.__mro__ if klass is not object]
+            if getattr(cls, 'kernel', None) is not None:
+                sources.append(cls.kernel)
+            for path in dict.fromkeys(inspect.getsourcefile(source) for source in sources):
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+            _source_hashes[cls] = digest.hexdigest()
+        except (TypeError, OSError):  # built-in or dynamically created class
+            _source_hashes[cls] = None
+    return _source_hashes[cls]
+
+
+def _slot_names(obj):
+    """Names of the attributes of `obj`: its `__slots__` (of all its classes) and its `__dict__`."""
+    names = [name for klass in type(obj).__mro__ for name in getattr(klass, '__slots__', ())
+             if name not in ('__dict__', '__weakref__')]
+    return names + sorted(getattr(obj, '__dict__', {}))
+
+
+def _state(value):
+    """Comparable representation of the state of `value`, recursing in the attributes of objects."""
+    if value is None or isinstance(value, (bool, int, float, str, np.generic)):
+        return value
+    if isinstance(value, (list, tuple, deque)):
+        return tuple(_state(item) for item in value)
+    if isinstance(value, dict):
+        return tuple((key, _state(item)) for key, item in sorted(value.items()))
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, hashlib.blake2b(value.tobytes(), digest_size=16).hexdigest())
+    # objects (e.g., the HyStart or bandwidth filters of an algorithm): their class, its source and their attributes
+    return (type(value).__qualname__, _source_hash(type(value)),
+            tuple((name, _state(getattr(value, name, None))) for name in _slot_names(value) if name != 'hooks'))
+
+
+def copy_state(src, dst):
+    """Copies the attributes of the congestion control object `src` into `dst` (except the event hooks)."""
+    for name in _slot_names(src):
+        if name != 'hooks' and hasattr(src, name):
+            setattr(dst, name, getattr(src, name))
+
+
+def trace_digest(blocks, rtt=False):
+    """
+    Hash of a trace, given as an iterable of (time, loss, rtt) column blocks.
+
+    The columns are hashed separately, so the hash does not depend on the block size.
+    The `rtt` column is only included with `rtt=True` (and if the trace has one).
+    """
+    digests = [hashlib.blake2b(digest_size=16) for _ in range(3 if rtt else 2)]
+    dtypes = ('<f8', bool, '<f8')
+    for block in blocks:
+        for digest, column, dtype in zip(digests, block, dtypes):
+            if column is None:
+                continue
+            for start in range(0, len(column), HASH_CHUNK):
+                digest.update(np.ascontiguousarray(column[start:start + HASH_CHUNK], dtype=dtype).tobytes())
+    return '-'.join(digest.hexdigest() for digest in digests)
+
+
+class ResultCache:
+    """
+    Cache of simulation results in `directory`, with up to `max_bytes` of entries.
+
+    Usage:
+        key = cache.key(tcp, trace_digest(blocks, tcp.uses_rtt), 'simulate')
+        entry = cache.get(key)  # None on a miss
+        ...
+        cache.put(key, results, tcp)
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = os.path.expanduser(os.fspath(directory))
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Running total of the entry sizes (None: not scanned yet)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(tcp, trace_hash, kind, **params):
+        """
+        Returns the key of the results of `kind` for `tcp` (in its current state) over the trace `trace_hash`.
+
+        Returns None if the results cannot be cached: the source of the class is not available,
+        or event hooks are attached (they must see every ACK).
+        """
+        cls = type(tcp)
+        source = _source_hash(cls)
+        if source is None or getattr(tcp, 'hooks', None) is not None:
+            return None
+        fields = (CACHE_VERSION, cls.__module__, cls.__qualname__, source, _state(tcp), trace_hash, kind,
+                  tuple(sorted(params.items())))
+        return hashlib.sha256(repr(fields).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + SUFFIX)
+
+    def get(self, key, tcp=None):
+        """
+        Returns the results stored under `key`, or None.
+
+        On a hit, the final state of the cached run is copied into `tcp` (if given).
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                results, state = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):  # missing, evicted or being replaced
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)  # most recently used
+        except OSError:
+            pass
+        if tcp is not None and state is not None:
+            copy_state(state, tcp)
+        self.hits += 1
+        return results
+
+    def put(self, key, results, tcp=None):
+        """Stores `results` (and the final state of `tcp`) under `key`, then evicts old entries if needed."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        hooks = getattr(tcp, 'hooks', None)
+        if self._size is None:
+            self._size = self.size()
+        try:
+            if hooks is not None:
+                tcp.hooks = None  # the sinks are not part of the state
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump((results, tcp), f, protocol=pickle.HIGHEST_PROTOCOL)
+                size = f.tell()
+            try:
+                size -= os.stat(path).st_size  # replaces an entry
+            except FileNotFoundError:
+                pass
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        finally:
+            if hooks is not None:
+                tcp.hooks = hooks
+        self._size += size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        """Returns the (mtime, size, path) of the entries, least recently used first."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:  # evicted by another process
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        entries.sort()
+        return entries
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in `EVICT_TO` * `max_bytes`.
+
+        `put` only calls it when its running total of the entry sizes goes over `max_bytes`, so a write
+        does not scan the directory. The total is counted per `ResultCache` object (from one scan of the
+        directory on the first `put`) and corrected here: with several workers sharing a directory,
+        each one evicts when its own count goes over the bound.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= EVICT_TO * self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._size = total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._size = 0
+
+    def __repr__(self):
+        return f"ResultCache({self.directory!r}, max_bytes={self.max_bytes}, hits={self.hits}, misses={self.misses})"
@@ -0,0 +1,87 @@
+"""
+Downsampling of long series before plotting.
+
+A figure cannot show more points than it has pixels, so the series are reduced to a number of
+points bounded by the figure width, not by the trace length:
+- `minmax_indices`: splits the time axis in one bucket per pixel column and keeps the minimum and
+  the maximum of each bucket, so every cwnd peak and drop is still drawn (the buckets have the same
+  width in time, not the same number of ACKs: a burst of ACKs does not get more of the figure
+  than a sparse stretch of the same duration);
+- `lttb_indices`: Largest-Triangle-Three-Buckets, keeps the point of each bucket that forms the
+  largest triangle with its neighbours (smoother, one point per bucket).
+
+Both return the (sorted) indices of the points to keep, so the same selection can be applied to
+several columns. Loss markers are not decimated: they are sparse, and every one of them is drawn.
+"""
+import numpy as np
+
+
+METHODS = ('minmax', 'lttb', 'none')
+
+
+def minmax_indices(x, y, num_buckets):
+    """
+    Indices of the minimum and maximum of `y` in each of `num_buckets` intervals of the same width of `x`
+    (sorted, e.g. the ACK times), plus the first and last points. Empty intervals have no points.
+
+    Returns all the indices if `y` has no more than 2 * `num_buckets` points.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(y)
+    if n <= 2 * num_buckets:
+        return np.arange(n)
+
+    edges = np.searchsorted(x, np.linspace(x[0], x[-1], num_buckets + 1)[1:-1])
+    bounds = np.unique(np.concatenate(([0], edges, [n])))  # the non-empty buckets
+    indices = [0, n - 1]
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        bucket = y[start:end]
+        indices += (start + int(bucket.argmin()), start + int(bucket.argmax()))
+    return np.unique(indices)
+
+
+def lttb_indices(x, y, num_points):
+    """
+    Indices of the `num_points` points selected by Largest-Triangle-Three-Buckets.
+
+    Returns all the indices if the series has no more than `num_points` points.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n <= num_points or num_points < 3:
+        return np.arange(n)
+
+    # the first and last points are always kept; the others are split in num_points - 2 buckets
+    edges = np.linspace(1, n - 1, num_points - 1).astype(np.int64)
+    indices = np.empty(num_points, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(num_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # the third vertex is the average of the next bucket (or the last point)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def decimate(x, y, num_points, method='minmax'):
+    """
+    Reduces the series (x, y) to about `num_points` points with `method` ('minmax', 'lttb' or 'none').
+
+    Returns:
+    - the decimated `x` and `y`.
+    """
+    if method == 'minmax':
+        indices = minmax_indices(x, y, max(num_points // 2, 1))
+    elif method == 'lttb':
+        indices = lttb_indices(x, y, num_points)
+    elif method == 'none':
+        return x, y
+    else:
+        raise ValueError(f"Unknown decimation method: {method}")
+    return np.asarray(x)[indices], np.asarray(y)[indices]
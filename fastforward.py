@@ -0,0 +1,226 @@
+"""
+Event-skipping simulation mode for TCP AIMD, TCP Reno and TCP CUBIC.
+
+Between two loss (or RTO) events, `update_cwnd` follows a closed-form path:
+linear growth in slow start (AIMD) or doubling (Reno), `cwnd += MSS/cwnd` (AIMD) or `cwnd += 1` (Reno)
+in congestion avoidance, and the clamp at `CWND_MAX`.
+`simulate_fast_forward` jumps from one event to the next in the trace, computes the cwnd trajectory
+of the segment in between with NumPy, and only calls `update_cwnd` on the events themselves,
+so its cost is proportional to the number of events rather than the number of ACKs.
+In CUBIC's congestion avoidance, cwnd only depends on the time since the start of the epoch,
+so the segment is evaluated with one call of `TCPCubic.cubic_wnd` over the ACK times.
+
+The results are the same as `simulation.simulate`, except for AIMD's congestion avoidance, that uses
+the closed form of `cwnd += 1/cwnd` once cwnd >= 16 (relative error below 1e-6).
+"""
+import math
+import numpy as np
+
+from methods.aimd import TCPAIMD
+from methods.cubic import TCPCubic
+from methods.reno import TCPReno
+from simulation import ack_columns, simulate
+
+
+AIMD_EXACT_AVOIDANCE_CWND = 16  # below this cwnd, AIMD's avoidance is stepped exactly
+
+
+def _aimd_avoidance(cwnd, n):
+    """
+    Closed form of n steps of `cwnd += 1/cwnd`.
+
+    With u = cwnd^2, each step does u += 2 + 1/u, so u_j ~ u_0 + 2j + ln(1 + 2j/u_0)/2.
+    """
+    u0 = cwnd * cwnd
+    j = np.arange(1, n + 1, dtype=np.float64)
+    return np.sqrt(u0 + 2 * j + 0.5 * np.log1p(2 * j / u0))
+
+
+def _aimd_segment(tcp, times, cwnd_out, ssthresh_out):
+    """Fills the trajectory of TCP AIMD over ACKs without loss or RTO, and updates `tcp`."""
+    n = len(times)
+    cwnd, ssthresh, cwnd_max = tcp.cwnd, tcp.ssthresh, tcp.CWND_MAX
+    k = 0
+    while k < n:
+        remaining = n - k
+        if cwnd < ssthresh:
+            # Slow Start: cwnd += MSS until cwnd >= ssthresh, or forever if stuck at CWND_MAX < ssthresh
+            limit = min(remaining, math.ceil(min(ssthresh, cwnd_max) - cwnd) + 1)
+            steps = np.full(limit + 1, tcp.MSS, dtype=np.float64)
+            steps[0] = cwnd
+            grown = np.minimum(np.add.accumulate(steps), cwnd_max)  # same rounding as sequential +=
+            reached = grown[1:] >= min(ssthresh, cwnd_max)
+            m = int(np.argmax(reached)) + 1 if reached.any() else limit
+            if cwnd_max < ssthresh:
+                m = remaining
+            cwnd_out[k:k + m] = grown[1:m + 1] if m <= limit else np.append(grown[1:], [cwnd_max] * (m - limit))
+            ssthresh_out[k:k + m] = ssthresh
+            cwnd = float(cwnd_out[k + m - 1])
+            tcp.in_slow_start = True
+        else:
+            # Congestion Avoidance: cwnd += MSS/cwnd and ssthresh follows cwnd, until cwnd reaches CWND_MAX
+            if cwnd < AIMD_EXACT_AVOIDANCE_CWND:
+                # exact steps while the closed form is not accurate enough (at most ~AIMD_EXACT_AVOIDANCE_CWND^2/2)
+                cwnd += tcp.MSS / cwnd
+                ssthresh = max(ssthresh, cwnd)
+                cwnd = min(cwnd, cwnd_max)
+                cwnd_out[k], ssthresh_out[k] = cwnd, ssthresh
+                tcp.in_slow_start = False
+                k += 1
+                continue
+            limit = min(remaining, math.ceil((cwnd_max * cwnd_max - cwnd * cwnd) / 2) + 1)
+            grown = _aimd_avoidance(cwnd, limit)
+            reached = grown >= cwnd_max
+            m = int(np.argmax(reached)) + 1 if reached.any() else limit
+            cwnd_out[k:k + m] = np.minimum(grown[:m], cwnd_max)
+            ssthresh_out[k:k + m] = np.maximum(grown[:m], ssthresh)
+            cwnd, ssthresh = float(cwnd_out[k + m - 1]), float(ssthresh_out[k + m - 1])
+            tcp.in_slow_start = False
+        k += m
+
+    tcp.cwnd, tcp.ssthresh = cwnd, ssthresh
+    tcp.last_ack_time = float(times[-1])
+
+
+def _reno_segment(tcp, times, cwnd_out, ssthresh_out):
+    """Fills the trajectory of TCP Reno over ACKs without loss, and updates `tcp`."""
+    n = len(times)
+    cwnd, cwnd_max = tcp.cwnd, tcp.CWND_MAX
+    ssthresh_out[:] = tcp.ssthresh  # only a loss changes ssthresh
+    k = 0
+    # Slow Start: cwnd doubles until it reaches ssthresh (at most log2(CWND_MAX/cwnd) steps before the clamp)
+    while k < n and tcp.in_slow_start:
+        cwnd *= 2
+        if cwnd >= tcp.ssthresh:
+            tcp.in_slow_start = False  # Move to Congestion Avoidance
+        cwnd = min(cwnd, cwnd_max)
+        cwnd_out[k] = cwnd
+        k += 1
+        if cwnd == cwnd_max and cwnd * 2 < tcp.ssthresh:
+            cwnd_out[k:] = cwnd  # stuck at CWND_MAX in slow start
+            k = n
+    # Fast Recovery / Congestion Avoidance: cwnd += 1, until CWND_MAX
+    if k < n:
+        limit = min(n - k, max(math.ceil(cwnd_max - cwnd), 0) + 1)
+        steps = np.ones(limit + 1)
+        steps[0] = cwnd
+        grown = np.minimum(np.add.accumulate(steps), cwnd_max)  # same rounding as sequential +=
+        cwnd_out[k:k + limit] = grown[1:]
+        cwnd_out[k + limit:] = cwnd_max
+        cwnd = cwnd_out[n - 1]
+
+    tcp.cwnd = float(cwnd)
+    tcp.last_ack = float(times[-1])
+
+
+def _cubic_segment(tcp, times, cwnd_out, ssthresh_out):
+    """Fills the trajectory of TCP CUBIC over ACKs without loss or RTO, and updates `tcp`."""
+    n = len(times)
+    cwnd_max = tcp.CWND_MAX
+    ssthresh_out[:] = tcp.ssthresh  # only a loss changes ssthresh
+    k = 0
+    while k < n:
+        remaining = n - k
+        if tcp.cwnd < tcp.ssthresh:
+            # Slow Start: cwnd += MSS until cwnd >= ssthresh, or forever if stuck at CWND_MAX < ssthresh
+            limit = min(remaining, math.ceil(min(tcp.ssthresh, cwnd_max) - tcp.cwnd) + 1)
+            steps = np.full(limit + 1, tcp.MSS, dtype=np.float64)
+            steps[0] = tcp.cwnd
+            grown = np.minimum(np.add.accumulate(steps), cwnd_max)  # same rounding as sequential +=
+            reached = grown[1:] >= tcp.ssthresh
+            m = int(np.argmax(reached)) + 1 if reached.any() else limit
+            if cwnd_max < tcp.ssthresh and grown[m] == cwnd_max:
+                m, grown = remaining, np.append(grown, [cwnd_max] * (remaining - limit))
+            cwnd_out[k:k + m] = grown[1:m + 1]
+            tcp.in_slow_start = True
+        else:
+            # Congestion Avoidance: the whole segment in one call of the CUBIC function,
+            # up to the first ACK that falls back below ssthresh (if any)
+            if tcp.epoch_start is None:
+                tcp.start_epoch(float(times[k]))
+            wnd = np.minimum(np.maximum(tcp.cubic_wnd(times[k:] - tcp.epoch_start), tcp.MSS), cwnd_max)
+            below = wnd < tcp.ssthresh
+            m = int(np.argmax(below)) + 1 if below.any() else remaining
+            cwnd_out[k:k + m] = wnd[:m]
+            tcp.in_slow_start = False
+        tcp.cwnd = float(cwnd_out[k + m - 1])
+        k += m
+
+    tcp.last_ack_time = float(times[-1])
+
+
+def _aimd_events(tcp, times, losses):
+    """Positions of the loss and RTO events of TCP AIMD (and TCP CUBIC)."""
+    gaps = np.diff(times, prepend=times[0] if tcp.last_ack_time is None else tcp.last_ack_time)
+    return np.flatnonzero(losses | (gaps > tcp.RTO_THRESHOLD))
+
+
+def _reno_events(tcp, times, losses):
+    """Positions of the loss events of TCP Reno (the simulator has no timeouts or duplicate ACKs)."""
+    return np.flatnonzero(losses)
+
+
+# events and segment functions for each supported algorithm
+FAST_FORWARD = {
+    TCPAIMD: (_aimd_events, _aimd_segment),
+    TCPReno: (_reno_events, _reno_segment),
+    TCPCubic: (_aimd_events, _cubic_segment),
+}
+
+
+def supports_fast_forward(tcp):
+    """True if `simulate_fast_forward` has a fast-forward mode for the class of `tcp`."""
+    return type(tcp) in FAST_FORWARD
+
+
+def simulate_fast_forward(tcp, ack_array):
+    """
+    Simulates the entire TCP congestion process, jumping from one loss/RTO event to the next.
+
+    Parameters:
+    - `tcp`: TCP congestion control object to be simulated (`TCPAIMD`, `TCPReno` or `TCPCubic`).
+    - `ack_array`: Array of traffic (ACK_number, time, loss_event) to be processed.
+
+    Returns the same arrays as `simulation.simulate`:
+    - `time_stamps`: Array of times corresponding to each ACK.
+    - `cwnd_evolution`: Array of congestion window values over time.
+    - `loss_events`: Array of loss events (1 if loss, 0 otherwise).
+    - `ssthreshs`: Array of slow-start thresholds over time.
+
+    With event hooks attached to `tcp` (see `methods/events.py`), or with HyStart enabled,
+    every ACK must go through `update_cwnd`, so this falls back to `simulation.simulate`.
+    Other classes raise ValueError (see `supports_fast_forward`).
+    """
+    if not supports_fast_forward(tcp):
+        raise ValueError(f'No fast-forward mode for {type(tcp).__name__}')
+    if tcp.hooks is not None or tcp.uses_rtt:
+        # the skipped segments would not run the event hooks / the RTT-based slow start exit
+        return simulate(tcp, ack_array)
+    find_events, fill_segment = FAST_FORWARD[type(tcp)]
+
+    time_stamps, losses = ack_columns(ack_array)
+    n = len(time_stamps)
+    cwnd_evolution = np.empty(n)
+    loss_events = np.zeros(n, dtype=np.int8)
+    ssthreshs = np.empty(n)
+    if n == 0:
+        return time_stamps, cwnd_evolution, loss_events, ssthreshs
+
+    if getattr(tcp, 'start_time', 0) is None:
+        tcp.start_time = float(time_stamps[0])  # Set simulation start time
+
+    start = 0
+    for event in np.append(find_events(tcp, time_stamps, losses), n):
+        if event > start:
+            # closed-form segment between two events
+            fill_segment(tcp, time_stamps[start:event], cwnd_evolution[start:event], ssthreshs[start:event])
+            tcp.loss_event = tcp.rto_event = False
+        if event < n:
+            # the event itself goes through the reference implementation
+            tcp.update_cwnd(float(time_stamps[event]), bool(losses[event]))
+            cwnd_evolution[event] = tcp.cwnd
+            loss_events[event] = 1 if tcp.loss_event else 0
+            ssthreshs[event] = tcp.ssthresh
+        start = event + 1
+
+    return time_stamps, cwnd_evolution, loss_events, ssthreshs
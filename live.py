@@ -0,0 +1,362 @@
+"""
+Live mode: the congestion control classes of `methods/` driven by streamed ACK events (shadow model).
+
+The events are text lines `flow_id time loss [rtt]` (e.g., `17 12.503 0`), read from stdin, a TCP socket
+or a Unix socket. Each flow gets its own controller on its first event. The input is read in large chunks
+and every chunk is applied as one batch (parsed column-wise, no await per event), so the service keeps up
+with hundreds of thousands of events/s. Every `--interval` seconds a snapshot of the flows updated since
+the previous one (`cwnd`, `ssthresh`) is published as one JSON line.
+
+`replay` streams a saved trace in the same format, split among `--flows` flows, and stands in for the real feed.
+
+Example:
+python live.py replay acks.trace --flows 1000 | python live.py serve --algorithm cubic --interval 0.5
+python live.py serve --algorithm cubic --port 9000 --snapshots snapshots.jsonl &
+python live.py replay acks.trace --flows 1000 --connect 127.0.0.1:9000 --rate 200000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+import numpy as np
+
+from methods.base import available_algorithms, get_algorithm
+from simulation import ack_columns, INITIAL_CWND, INITIAL_SSTHRESH
+
+
+READ_SIZE = 1 << 18  # Bytes read (and applied as one batch) at a time
+REPLAY_CHUNK = 1 << 14  # Events formatted (and written) at a time by `replay`
+SNAPSHOT_INTERVAL = 1.0  # Seconds between two snapshots
+PORT = 9000
+TRUE = frozenset((b'1', b'True', b'true'))  # Accepted values of a lost ACK
+LOSS_VALUES = TRUE | {b'0', b'False', b'false'}  # Accepted values of the loss field (the others are malformed)
+
+
+class LiveModel:
+    """
+    Controllers of the flows seen so far, updated by batches of event lines.
+
+    Parameters:
+    - `factory`: Callable returning a new congestion control object (called on the first event of a flow).
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.flows = {}  # flow id (bytes) -> controller
+        self.dirty = set()  # flows updated since the last snapshot
+        self.num_events = 0
+        self.num_errors = 0  # malformed lines, skipped
+        self.uses_rtt = factory().uses_rtt  # the controllers take RTT samples
+
+    def _new_flow(self, flow):
+        tcp = self.flows[flow] = self.factory()
+        return tcp
+
+    def apply(self, data):
+        """Applies the complete event lines of `data` (bytes). Returns the number of events applied."""
+        lines = data.split(b'\n')
+        if not lines[-1]:
+            lines.pop()
+        rows = list(map(bytes.split, lines))
+        widths = set(map(len, rows))
+        try:
+            if widths == {3}:
+                flows, times, losses = zip(*rows)
+                count = self._apply_columns(flows, times, losses, None)
+            elif widths == {4}:
+                count = self._apply_columns(*zip(*rows))
+            else:  # blank lines, missing fields, or lines with and without `rtt` in the same batch
+                count = self._apply_lines(lines)
+        except ValueError:  # a field is not a number: nothing was applied yet
+            count = self._apply_lines(lines)
+        self.num_events += count
+        return count
+
+    def _apply_columns(self, flows, times, losses, rtts):
+        """Fast path: every line of the batch has 3 (or every line 4) fields (raises ValueError before any update)."""
+        if not LOSS_VALUES.issuperset(losses):
+            raise ValueError("malformed loss field")
+        times = list(map(float, times))
+        rtts = list(map(float, rtts)) if rtts is not None else None
+
+        controllers = self.flows
+        self.dirty.update(flows)
+        if rtts is None or not self.uses_rtt:
+            for flow, ack_time, loss in zip(flows, times, losses):
+                tcp = controllers.get(flow) or self._new_flow(flow)
+                tcp.update_cwnd(ack_time, loss in TRUE)
+        else:
+            for flow, ack_time, loss, rtt in zip(flows, times, losses, rtts):
+                tcp = controllers.get(flow) or self._new_flow(flow)
+                tcp.update_cwnd(ack_time, loss in TRUE, rtt=rtt)
+        return len(times)
+
+    def _apply_lines(self, lines):
+        """Slow path, line by line: the malformed lines are counted and skipped."""
+        count = 0
+        for line in lines:
+            fields = line.split()
+            if not fields:
+                continue
+            try:
+                flow, ack_time, loss = fields[0], float(fields[1]), fields[2] in TRUE
+                rtt = float(fields[3]) if len(fields) > 3 else None
+                if fields[2] not in LOSS_VALUES:
+                    raise ValueError(fields[2])
+            except (IndexError, ValueError):
+                self.num_errors += 1
+                continue
+            tcp = self.flows.get(flow) or self._new_flow(flow)
+            if rtt is not None and self.uses_rtt:
+                tcp.update_cwnd(ack_time, loss, rtt=rtt)
+            else:
+                tcp.update_cwnd(ack_time, loss)
+            self.dirty.add(flow)
+            count += 1
+        return count
+
+    def snapshot(self, full=False):
+        """
+        Returns the state of the flows updated since the last snapshot (all the flows with `full=True`).
+
+        Returns:
+        - A dict with the number of `events` and `errors` so far, and `flows`: flow id -> [cwnd, ssthresh].
+        """
+        flows = self.flows if full else self.dirty
+        controllers = self.flows
+        state = {flow.decode(errors='replace'): [controllers[flow].cwnd, controllers[flow].ssthresh] for flow in flows}
+        self.dirty = set()
+        return {'events': self.num_events, 'errors': self.num_errors, 'num_flows': len(controllers), 'flows': state}
+
+
+class LiveService:
+    """
+    Feeds a `LiveModel` from asyncio streams and publishes its snapshots every `interval` seconds.
+
+    Parameters:
+    - `model`: `LiveModel` updated by the events.
+    - `publish`: Callable taking a snapshot dict (default: JSON lines to stdout).
+    - `interval`: Seconds between two snapshots.
+    - `full`: Publish all the flows in each snapshot, not only the updated ones.
+    """
+
+    def __init__(self, model, publish=None, interval=SNAPSHOT_INTERVAL, full=False):
+        self.model = model
+        self.publish = publish or JsonLines(sys.stdout)
+        self.interval = interval
+        self.full = full
+        self._last = (time.monotonic(), 0)
+
+    def _publish(self):
+        now, events = time.monotonic(), self.model.num_events
+        snapshot = self.model.snapshot(self.full)
+        snapshot['time'] = time.time()
+        snapshot['rate'] = (events - self._last[1]) / max(now - self._last[0], 1e-9)  # events/s since the last one
+        self._last = (now, events)
+        self.publish(snapshot)
+
+    async def consume(self, reader):
+        """Applies the events of `reader` (with an async `read(n)`) until its end."""
+        pending = b''
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            end = data.rfind(b'\n') + 1
+            if end == 0:
+                pending += data
+                continue
+            self.model.apply(pending + data[:end])
+            pending = data[end:]
+        if pending.strip():
+            self.model.apply(pending + b'\n')
+
+    async def _snapshots(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self._publish()
+
+    async def run(self, source):
+        """
+        Runs until `source` (a coroutine, e.g., `consume(reader)` or a server) returns,
+        then publishes a last snapshot.
+        """
+        ticker = asyncio.create_task(self._snapshots())
+        try:
+            await source
+        finally:
+            ticker.cancel()
+            self._publish()
+
+    async def serve_stdin(self):
+        await self.run(self.consume(_FileReader(sys.stdin.buffer)))
+
+    async def serve_socket(self, host='127.0.0.1', port=PORT, path=None):
+        """Accepts any number of connections (TCP, or Unix socket at `path`) feeding the same model, until cancelled."""
+        async def handle(reader, writer):
+            try:
+                await self.consume(reader)
+            finally:
+                writer.close()
+
+        if path is not None:
+            server = await asyncio.start_unix_server(handle, path=path)
+        else:
+            server = await asyncio.start_server(handle, host=host, port=port)
+        async with server:
+            await self.run(server.serve_forever())
+
+
+class _FileReader:
+    """Async `read(n)` of a blocking binary file (e.g., stdin, a pipe or a regular file), in a worker thread."""
+
+    def __init__(self, f):
+        self.f = f
+
+    async def read(self, n):
+        return await asyncio.get_running_loop().run_in_executor(None, self.f.read1, n)
+
+
+class JsonLines:
+    """Publishes the snapshots as JSON lines to a text file."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __call__(self, snapshot):
+        self.f.write(json.dumps(snapshot, separators=(',', ':')) + '\n')
+        self.f.flush()
+
+
+def replay_events(trace, num_flows=1, chunk_size=REPLAY_CHUNK):
+    """
+    Yields the ACKs of a trace as event lines (bytes chunks of up to `chunk_size` lines).
+
+    The trace is split in `num_flows` consecutive segments of the same length (the remainder is dropped),
+    one per flow (ids 0 to num_flows - 1), and the events of the flows are interleaved.
+    The times are written with `repr`, so the controllers see exactly the times of the trace.
+    """
+    times, losses, rtts = ack_columns(trace, rtt=True)
+    segment = len(times) // num_flows
+    flows = np.tile(np.arange(num_flows), segment)
+    # row k of the output is ACK k // num_flows of the segment of flow k % num_flows
+    rows = np.arange(segment * num_flows)
+    rows = rows // num_flows + (rows % num_flows) * segment
+    for start in range(0, len(rows), chunk_size):
+        index = rows[start:start + chunk_size]
+        columns = [flows[start:start + chunk_size].tolist(), times[index].tolist(),
+                   losses[index].astype(np.int8).tolist()]
+        if rtts is None:
+            lines = [f"{flow} {ack_time!r} {loss}" for flow, ack_time, loss in zip(*columns)]
+        else:
+            lines = [f"{flow} {ack_time!r} {loss} {rtt!r}"
+                     for flow, ack_time, loss, rtt in zip(*columns, rtts[index].tolist())]
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+async def replay(trace, writer, num_flows=1, rate=None):
+    """
+    Writes the events of `trace` (see `replay_events`) to the asyncio stream `writer`.
+
+    With `rate` (events/s), the chunks are paced to that rate; else they are written as fast as the reader takes them.
+    """
+    start, sent = time.monotonic(), 0
+    for chunk in replay_events(trace, num_flows):
+        writer.write(chunk)
+        await writer.drain()
+        sent += chunk.count(b'\n')
+        if rate is not None:
+            delay = start + sent / rate - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    writer.close()
+    await writer.wait_closed()
+
+
+def _replay_main(args):
+    if args.connect is None and args.unix is None:
+        out = sys.stdout.buffer
+        start, sent = time.monotonic(), 0
+        for chunk in replay_events(args.trace, args.flows):
+            out.write(chunk)
+            sent += chunk.count(b'\n')
+            if args.rate is not None:
+                out.flush()
+                time.sleep(max(start + sent / args.rate - time.monotonic(), 0))
+        out.flush()
+        return
+
+    async def main():
+        if args.unix is not None:
+            _, writer = await asyncio.open_unix_connection(args.unix)
+        else:
+            host, _, port = args.connect.rpartition(':')
+            _, writer = await asyncio.open_connection(host or '127.0.0.1', int(port))
+        await replay(args.trace, writer, args.flows, args.rate)
+
+    asyncio.run(main())
+
+
+def _serve_main(args, parser):
+    try:
+        cls = get_algorithm(args.algorithm)
+    except (KeyError, ImportError, AttributeError) as e:
+        parser.error(str(e))
+    options = dict(cwnd=args.cwnd, ssthresh=args.ssthresh)
+    if args.hystart:
+        options['hystart'] = True
+    try:
+        cls(**options)
+    except TypeError:
+        parser.error(f"{args.algorithm} has no HyStart option")
+
+    snapshots = sys.stdout if args.snapshots == '-' else open(args.snapshots, 'a')
+    service = LiveService(LiveModel(lambda: cls(**options)), publish=JsonLines(snapshots),
+                          interval=args.interval, full=args.full)
+    if args.port is None and args.unix is None:
+        source = service.serve_stdin()
+    else:
+        source = service.serve_socket(host=args.host, port=args.port, path=args.unix)
+    try:
+        asyncio.run(source)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if snapshots is not sys.stdout:
+            snapshots.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drives congestion controllers from streamed ACK events")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="read 'flow_id time loss [rtt]' lines and publish cwnd snapshots")
+    serve.add_argument('--algorithm', default='aimd',
+                       help="congestion control of the flows: one of {} or 'module:Class'".format(
+                           ', '.join(available_algorithms())))
+    serve.add_argument('--cwnd', type=int, default=INITIAL_CWND)
+    serve.add_argument('--ssthresh', type=int, default=INITIAL_SSTHRESH)
+    serve.add_argument('--hystart', action='store_true', help="enable the HyStart slow start exit (cubic, reno)")
+    serve.add_argument('--port', type=int, default=None, help="listen on this TCP port instead of reading stdin")
+    serve.add_argument('--host', default='127.0.0.1', help="address to listen on with --port")
+    serve.add_argument('--unix', default=None, help="listen on this Unix socket instead of reading stdin")
+    serve.add_argument('--interval', type=float, default=SNAPSHOT_INTERVAL, help="seconds between two snapshots")
+    serve.add_argument('--full', action='store_true', help="publish all the flows, not only the updated ones")
+    serve.add_argument('--snapshots', default='-', help="JSON lines file of the snapshots (default: stdout)")
+
+    replay_parser = commands.add_parser('replay', help="stream a saved trace as event lines")
+    replay_parser.add_argument('trace', help="trace file or directory of shards (see tracefile.py)")
+    replay_parser.add_argument('--flows', type=int, default=1, help="number of flows the trace is split among")
+    replay_parser.add_argument('--rate', type=float, default=None, help="events/s (default: as fast as possible)")
+    replay_parser.add_argument('--connect', default=None, metavar='HOST:PORT',
+                               help="send to a TCP socket instead of stdout")
+    replay_parser.add_argument('--unix', default=None, help="send to a Unix socket instead of stdout")
+
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        _replay_main(args)
+    else:
+        _serve_main(args, parser)
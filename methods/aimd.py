@@ -1,5 +1,8 @@
 import numpy as np
-import logging
+
+from methods import kernels
+from methods.base import CongestionControl, register
+from methods.kernels import AVOIDANCE, EVENT_FLAGS, SLOW_START
 
 # ------------------------------------
 #
@@ -10,7 +13,10 @@ INITIAL_CWND = 1  # Initial congestion window
 INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
 
 
-class TCPAIMD:
+@register('aimd', 'TCP AIMD')
+class TCPAIMD(CongestionControl):
+
+    __slots__ = ('start_time', 'last_ack_time')
 
     # Constants for AIMD
     MSS = 1  # Maximum Segment Size
@@ -18,50 +24,34 @@ class TCPAIMD:
 
 
     def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
-        self.cwnd = cwnd  # Initial congestion window
-        self.ssthresh = ssthresh  # Slow start threshold
+        super().__init__(cwnd, ssthresh)
         self.start_time = None  # Start time of simulation
         self.last_ack_time = None  # Last received ACK time
-        self.loss_event = False
-        self.in_slow_start = True  # Start in slow start phase
-        self.CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
-        self.RTO_THRESHOLD = 3.0  # If no ACKs arrive for 3s, reset cwnd (RTO event)
-        logging.debug(f"AIMD initialized with cwnd={cwnd}, ssthresh={ssthresh}")
-
-    def update_cwnd(self, ack_time, loss_event=False):
-        """Updates cwnd based on AIMD (Slow Start, Additive Increase, Multiplicative Decrease)."""
-        if self.start_time is None:
-            self.start_time = ack_time  # Set simulation start time
-        self.loss_event = False
-        # Check for RTO (No ACKs for RTO_THRESHOLD seconds)
-        if self.last_ack_time is not None and (ack_time - self.last_ack_time > self.RTO_THRESHOLD):
-            # Retransmission Timeout (RTO): If no ACKs arrive in RTO_THRESHOLD seconds, cwnd resets to MSS.
-            self.cwnd = self.MSS  # Timeout resets cwnd
-            self.ssthresh = self.CWND_MAX
-            logging.debug(f"[RTO] Reset cwnd at time {ack_time:.2f}s")
-            self.in_slow_start = True  # Reset to slow start
-
-        elif loss_event:
-            # Multiplicative Decrease: Cut cwnd by 50%
-            self.ssthresh = max(self.ssthresh * self.BETA, self.cwnd + 1, 2)  # Prevent ssthresh from going too low
-            self.cwnd = max(self.cwnd * self.BETA, 1)  # Prevent cwnd from reaching 0
-            self.loss_event = True
-            logging.debug("-- Loss : {:8.4f} {:8.4f} {:6.2f}".format(self.cwnd, self.ssthresh, ack_time))
-            self.in_slow_start = True  # Reset to slow start
 
-        elif self.cwnd < self.ssthresh:
-            # Slow Start (Exponential Growth)
-            self.cwnd += self.MSS
-            logging.debug("-- Start: {:8.4f} {:8.4f} {:6.2f}".format(self.cwnd, self.ssthresh, ack_time))
+    @classmethod
+    def make_kernel(cls):
+        return kernels.aimd(cls.MSS, cls.BETA, cls.CWND_MAX, cls.RTO_THRESHOLD)
 
-        else:
-            # Congestion Avoidance (Additive Increase)
-            self.cwnd += self.MSS / self.cwnd  # Linear growth: Add 1 MSS per RTT
-            self.ssthresh = max(self.ssthresh, self.cwnd)  # Keep track of max cwnd (not traditional AIMD!)
-            logging.debug("-- Avoid: {:8.4f} {:8.4f} {:6.2f}".format(self.cwnd, self.ssthresh, ack_time))
+    def _record(self):
+        return (None, SLOW_START if self.in_slow_start else AVOIDANCE, self.cwnd, self.ssthresh,
+                self.start_time, self.last_ack_time)
 
-        # Enforce cwnd_max limit
-        self.cwnd = min(self.cwnd, self.CWND_MAX)
+    def _store(self, record):
+        branch, phase, self.cwnd, self.ssthresh, self.start_time, self.last_ack_time = record
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
 
-        # Update last ACK time
-        self.last_ack_time = ack_time
+    def update_cwnd(self, ack_time, loss_event=False):
+        """
+        Updates cwnd based on AIMD (Slow Start, Additive Increase, Multiplicative Decrease).
+
+        The rules are in `methods.kernels.aimd`: RTO (no ACKs for RTO_THRESHOLD seconds) resets cwnd
+        to MSS, a loss cuts cwnd by BETA, then slow start or additive increase.
+        """
+        branch, phase, self.cwnd, self.ssthresh, self.start_time, self.last_ack_time = self.kernel(
+            (None, None, self.cwnd, self.ssthresh, self.start_time, self.last_ack_time), ack_time, loss_event)
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
+
+        if self.hooks is not None:
+            self.hooks.after_ack(self, ack_time)
@@ -0,0 +1,232 @@
+"""
+Common base of the congestion control classes, and the registry of the algorithms by name.
+
+`CongestionControl` holds the state shared by all the classes in `__slots__`: the objects have no
+`__dict__`, so they are smaller (one flow object per flow in `netsim.py`) and their attributes are
+faster to access. The constants (`CWND_MAX`, `RTO_THRESHOLD`, ...) are class attributes.
+
+The algorithms are registered by name with `@register('name')`, and the sweeps and the CLIs select
+them with `get_algorithm('name')`. Besides the built-in classes, the registry includes:
+- the classes exposed by installed packages in the entry point group `tcp_congestion.algorithms`
+  (e.g., `[project.entry-points."tcp_congestion.algorithms"] bbr = "mypackage.bbr:TCPBBR"`);
+- any class given as 'module:Class' (e.g., `--algorithm mymodule:MyCC`), imported on demand.
+
+The per-ACK logic of the built-in algorithms is a pure transition kernel over a flat state record
+(see `methods/kernels.py`): `update_cwnd` packs the attributes into a record, runs the kernel and
+unpacks the result, and `simulation.simulate` runs the kernel over whole blocks of ACKs.
+
+`snapshot()` returns the state of an object as plain values (JSON-compatible), and `restore()` /
+`from_snapshot()` bring it back exactly: a simulation can be checkpointed and resumed
+(`simulation.simulate_checkpointed`), or forked from a warm state into several continuations (`fork()`).
+"""
+import importlib
+import logging
+from importlib import metadata
+
+
+# ------------------------------------
+#
+# Constants for TCP
+#
+# ------------------------------------
+INITIAL_CWND = 1  # Initial congestion window
+INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
+
+ENTRY_POINT_GROUP = 'tcp_congestion.algorithms'
+BUILTIN_MODULES = ('methods.aimd', 'methods.cubic', 'methods.hystart', 'methods.reno', 'methods.westwood')
+
+REGISTRY = {}  # name -> class
+
+_slot_names = {}  # class -> names of the attributes in the `__slots__` of the class and its bases
+
+
+class Snapshot:
+    """
+    Mixin: `snapshot()` / `restore()` of the attributes in `__slots__` (and `__dict__`, if any).
+
+    Nested `Snapshot` objects (e.g., the HyStart or bandwidth filters of an algorithm) are saved as
+    {'class': 'module:Class', 'state': {...}}. The attributes in `_TRANSIENT` are not saved.
+    """
+
+    __slots__ = ()
+
+    _TRANSIENT = ()  # Attributes not part of the state, None after `from_snapshot`
+
+    @classmethod
+    def _state_names(cls):
+        if cls not in _slot_names:
+            names = [name for klass in reversed(cls.__mro__) for name in getattr(klass, '__slots__', ())
+                     if name not in ('__dict__', '__weakref__')]
+            _slot_names[cls] = tuple(name for name in names if name not in cls._TRANSIENT)
+        return _slot_names[cls]
+
+    def snapshot(self):
+        """Returns the state of the object as a dict of plain values."""
+        state = {name: _encode(getattr(self, name)) for name in self._state_names() if hasattr(self, name)}
+        state.update((name, _encode(value)) for name, value in getattr(self, '__dict__', {}).items()
+                     if name not in self._TRANSIENT)
+        return state
+
+    def restore(self, state):
+        """Sets the state of the object from `snapshot()` (and returns it)."""
+        for name, value in state.items():
+            setattr(self, name, _decode(value))
+        return self
+
+    @classmethod
+    def from_snapshot(cls, state):
+        """Returns a new object with the state `state` (without calling `__init__`)."""
+        obj = cls.__new__(cls)
+        for name in cls._TRANSIENT:
+            setattr(obj, name, None)
+        return obj.restore(state)
+
+    def fork(self):
+        """Returns an independent copy of the object, in the same state (without the transient attributes)."""
+        return type(self).from_snapshot(self.snapshot())
+
+
+def _encode(value):
+    if isinstance(value, Snapshot):
+        return {'class': f"{type(value).__module__}:{type(value).__qualname__}", 'state': value.snapshot()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and value.keys() == {'class', 'state'}:
+        module, _, name = value['class'].partition(':')
+        return getattr(importlib.import_module(module), name).from_snapshot(value['state'])
+    return value
+
+
+class CongestionControl(Snapshot):
+    """
+    State shared by the congestion control algorithms.
+
+    Subclasses implement `update_cwnd(ack_time, loss_event=False)`, which updates `cwnd` and `ssthresh`
+    and sets `loss_event` / `rto_event` (True only for the ACK that triggered them) and `in_slow_start`.
+    They declare their own attributes in `__slots__`.
+
+    The algorithms that take RTT samples (`uses_rtt`) also accept `update_cwnd(..., rtt=sample)`;
+    the simulators pass the `rtt` column of the trace to them.
+
+    A subclass can also express its logic as a kernel (see `methods/kernels.py`): `make_kernel()`
+    returns it, built from the constants of the class, and `_record()` / `_store(record)` convert
+    the attributes to and from its state record. `kernel` is None for the classes without one;
+    `kernel_only` is False for the subclasses that override `update_cwnd` without a new kernel.
+    """
+
+    __slots__ = ('cwnd', 'ssthresh', 'loss_event', 'rto_event', 'in_slow_start', 'hooks', 'hystart')
+
+    _TRANSIENT = ('hooks',)  # the event sinks are not part of the state
+
+    NAME = None  # Name in the registry
+    LABEL = None  # Name in plot titles and reports
+    NEEDS_RTT = False  # update_cwnd needs an RTT sample per ACK
+    CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
+    RTO_THRESHOLD = 3.0  # If no ACKs arrive for 3s, reset cwnd (RTO event)
+
+    kernel = None  # Transition kernel of the class (set from `make_kernel`)
+    kernel_only = False  # True if `update_cwnd` only runs the kernel (then it can run over whole blocks of ACKs)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        kernel = cls.make_kernel()
+        cls.kernel = staticmethod(kernel) if kernel is not None else None
+        # a subclass that overrides `update_cwnd` (e.g., to extend it) without a new kernel still uses it per ACK
+        cls.kernel_only = kernel is not None and issubclass(_defining_class(cls, 'make_kernel'),
+                                                            _defining_class(cls, 'update_cwnd'))
+
+    def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
+        self.cwnd = cwnd  # Congestion window (MSS units)
+        self.ssthresh = ssthresh  # Slow start threshold
+        self.loss_event = False
+        self.rto_event = False
+        self.in_slow_start = True  # Start in slow start phase
+        self.hooks = None  # Event sinks (see methods/events.py)
+        self.hystart = None  # HyStart delay-based slow start exit, if enabled (see methods/hystart.py)
+        logging.debug("%s initialized with cwnd=%s, ssthresh=%s", type(self).__name__, cwnd, ssthresh)
+
+    @property
+    def uses_rtt(self):
+        """True if `update_cwnd` takes RTT samples (`rtt=`)."""
+        return self.NEEDS_RTT or self.hystart is not None
+
+    def update_cwnd(self, ack_time, loss_event=False):
+        raise NotImplementedError
+
+    @classmethod
+    def make_kernel(cls):
+        """Returns the transition kernel of the class, or None (see `methods/kernels.py`)."""
+        return None
+
+    def _record(self):
+        """State record of the kernel, from the attributes."""
+        raise NotImplementedError
+
+    def _store(self, record):
+        """Sets the attributes from a state record of the kernel."""
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"{type(self).__name__}(cwnd={self.cwnd}, ssthresh={self.ssthresh})"
+
+
+def _defining_class(cls, name):
+    """First class in the MRO of `cls` defining the attribute `name`."""
+    return next(klass for klass in cls.__mro__ if name in vars(klass))
+
+
+def register(name, label=None):
+    """Class decorator: registers a `CongestionControl` subclass as `name`."""
+    def decorator(cls):
+        if REGISTRY.get(name, cls) is not cls:
+            raise ValueError(f"Algorithm {name!r} is already registered by {REGISTRY[name].__name__}")
+        cls.NAME = name
+        cls.LABEL = label or cls.LABEL or name
+        REGISTRY[name] = cls
+        return cls
+    return decorator
+
+
+_loaded = False
+
+
+def _load():
+    """Imports the built-in algorithms and the entry point plugins (once)."""
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    for module in BUILTIN_MODULES:
+        importlib.import_module(module)
+    for entry_point in metadata.entry_points(group=ENTRY_POINT_GROUP):
+        if entry_point.name in REGISTRY:
+            continue
+        try:
+            REGISTRY[entry_point.name] = entry_point.load()
+        except Exception as e:  # a broken plugin must not break the built-in algorithms
+            logging.warning("Cannot load algorithm %r from %s: %s", entry_point.name, entry_point.value, e)
+
+
+def available_algorithms():
+    """Returns the sorted names of the registered algorithms (built-in and plugins)."""
+    _load()
+    return sorted(REGISTRY)
+
+
+def get_algorithm(name):
+    """
+    Returns the class registered as `name`, or the class `Class` of `module` for 'module:Class'.
+
+    Raises `KeyError` if there is no such algorithm.
+    """
+    _load()
+    if name in REGISTRY:
+        return REGISTRY[name]
+    if ':' in name:
+        module, _, attribute = name.partition(':')
+        cls = getattr(importlib.import_module(module), attribute)
+        REGISTRY[name] = cls
+        return cls
+    raise KeyError(f"Unknown algorithm {name!r} (available: {', '.join(available_algorithms())})")
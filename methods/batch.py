@@ -0,0 +1,316 @@
+"""
+Structure-of-arrays versions of the congestion control classes.
+
+Each engine holds the state of `num_flows` independent flows as NumPy arrays (one slot per flow)
+and advances all of them with one call to `step()`. Each step classifies the flows into the branches
+of the kernels (`methods.kernels.State`), in the same order (RTO, loss, slow start, then avoidance or
+fast recovery), keeps them in `branch`, and computes each branch as a masked vectorized update following
+the same rules as the kernels of the scalar classes (`TCPAIMD`, `TCPCubic`, `TCPReno`, `TCPWestwood`),
+which remain the reference implementation: for the same inputs, flow `i` of an engine produces exactly
+the same `cwnd`/`ssthresh` sequence as the corresponding scalar object. The flags come from the branches
+through the same tables (`LOSS_EVENT`, `RTO_EVENT`).
+
+`None` attributes of the scalar classes (e.g., `last_ack_time` before the first ACK) are stored as NaN.
+"""
+import numpy as np
+
+from methods.aimd import TCPAIMD
+from methods.cubic import TCPCubic
+from methods.filters import MIN_SAMPLE_INTERVAL, WESTWOOD_ALPHA
+from methods.kernels import (AVOIDANCE, FAST_RECOVERY, LOSS, LOSS_EVENT, RTO, RTO_EVENT, SLOW_START, cubic_epoch,
+                             cubic_window)
+
+
+# ------------------------------------
+#
+# Constants for TCP
+#
+# ------------------------------------
+INITIAL_CWND = 1  # Initial congestion window
+INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
+
+
+class BatchCongestionControl:
+    """Common state of the batch engines: one slot per flow."""
+
+    def __init__(self, num_flows, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
+        self.num_flows = num_flows
+        # `cwnd` and `ssthresh` can be scalars (same for all flows) or arrays with one value per flow
+        self.cwnd = np.full(num_flows, cwnd, dtype=np.float64)
+        self.ssthresh = np.full(num_flows, ssthresh, dtype=np.float64)
+        self.last_ack_time = np.full(num_flows, np.nan)  # Last received ACK time
+        self.loss_event = np.zeros(num_flows, dtype=bool)
+        self.rto_event = np.zeros(num_flows, dtype=bool)
+        self.in_slow_start = np.ones(num_flows, dtype=bool)  # Start in slow start phase
+        self.branch = np.full(num_flows, SLOW_START, dtype=np.int8)  # Branch taken by the last ACK (`State`)
+        self.CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
+        self.RTO_THRESHOLD = 3.0  # If no ACKs arrive for 3s, reset cwnd (RTO event)
+
+    def _inputs(self, ack_time, loss_event):
+        """Broadcasts the per-step inputs to one value per flow."""
+        ack_time = np.broadcast_to(np.asarray(ack_time, dtype=np.float64), (self.num_flows,))
+        loss_event = np.broadcast_to(np.asarray(loss_event, dtype=bool), (self.num_flows,))
+        return ack_time, loss_event
+
+    def _rto(self, ack_time):
+        """Flows whose last ACK is older than RTO_THRESHOLD (never true before the first ACK)."""
+        with np.errstate(invalid='ignore'):
+            return ack_time - self.last_ack_time > self.RTO_THRESHOLD
+
+    def _classify(self, rto, loss, slow, default=AVOIDANCE):
+        """
+        Sets `branch` from the conditions of the flows, in the priority order of the kernels,
+        and the `loss_event` / `rto_event` flags from it. Returns the masks of the RTO, LOSS and SLOW_START branches.
+        """
+        self.branch = np.select([rto, loss, slow], [RTO, LOSS, SLOW_START], default).astype(np.int8)
+        self.loss_event = LOSS_EVENT[self.branch]
+        self.rto_event = RTO_EVENT[self.branch]
+        return self.rto_event, self.loss_event, self.branch == SLOW_START
+
+    def step(self, ack_time, loss_event=False):
+        raise NotImplementedError
+
+    def snapshot(self):
+        """Returns a copy of the state of all the flows (dict of arrays)."""
+        return {name: value.copy() if isinstance(value, np.ndarray) else value for name, value in vars(self).items()}
+
+    def restore(self, state):
+        """Sets the state of all the flows from `snapshot()` (and returns the engine)."""
+        for name, value in state.items():
+            setattr(self, name, value.copy() if isinstance(value, np.ndarray) else value)
+        return self
+
+    def __len__(self):
+        return self.num_flows
+
+
+class BatchAIMD(BatchCongestionControl):
+    """Batch version of `TCPAIMD`."""
+
+    MSS = TCPAIMD.MSS
+    BETA = TCPAIMD.BETA
+
+    def __init__(self, num_flows, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
+        super().__init__(num_flows, cwnd=cwnd, ssthresh=ssthresh)
+        self.start_time = np.full(num_flows, np.nan)  # Start time of simulation
+
+    def step(self, ack_time, loss_event=False):
+        """Advances every flow by one ACK (see `TCPAIMD.update_cwnd`)."""
+        ack_time, loss_event = self._inputs(ack_time, loss_event)
+        self.start_time = np.where(np.isnan(self.start_time), ack_time, self.start_time)
+
+        cwnd, ssthresh = self.cwnd, self.ssthresh
+        rto, loss, slow = self._classify(self._rto(ack_time), loss_event, cwnd < ssthresh)
+        avoid = self.branch == AVOIDANCE
+
+        # Congestion Avoidance (Additive Increase)
+        new_cwnd = np.where(avoid, cwnd + self.MSS / cwnd, cwnd)
+        new_ssthresh = np.where(avoid, np.maximum(ssthresh, new_cwnd), ssthresh)
+        # Slow Start (Exponential Growth)
+        new_cwnd = np.where(slow, cwnd + self.MSS, new_cwnd)
+        # Multiplicative Decrease: Cut cwnd by 50%
+        new_ssthresh = np.where(loss, np.maximum(np.maximum(ssthresh * self.BETA, cwnd + 1), 2), new_ssthresh)
+        new_cwnd = np.where(loss, np.maximum(cwnd * self.BETA, 1), new_cwnd)
+        # Retransmission Timeout (RTO): cwnd resets to MSS
+        new_cwnd = np.where(rto, self.MSS, new_cwnd)
+        new_ssthresh = np.where(rto, self.CWND_MAX, new_ssthresh)
+
+        self.in_slow_start = ~avoid
+        self.ssthresh = new_ssthresh
+        # Enforce cwnd_max limit
+        self.cwnd = np.minimum(new_cwnd, self.CWND_MAX)
+        self.last_ack_time = ack_time.copy()
+
+
+class BatchCubic(BatchCongestionControl):
+    """Batch version of `TCPCubic`, with the same per-epoch K and origin point."""
+
+    MSS = TCPCubic.MSS
+    C = TCPCubic.C
+    BETA = TCPCubic.BETA
+
+    def __init__(self, num_flows, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
+        super().__init__(num_flows, cwnd=cwnd, ssthresh=ssthresh)
+        self.W_max = np.full(num_flows, np.nan)  # Previous max window size
+        self.epoch_start = np.full(num_flows, np.nan)  # Start time of the current epoch
+        self.K = np.zeros(num_flows)  # Time to reach the origin point, computed once per epoch
+        self.origin_point = np.full(num_flows, np.nan)  # Window at the plateau of the CUBIC function
+        self.last_loss_time = np.full(num_flows, np.nan)  # Time of last loss
+        self.start_time = np.full(num_flows, np.nan)  # Start time of simulation
+
+    def start_epoch(self, mask, ack_time, cwnd):
+        """Starts a new epoch for the flows in `mask` (see `TCPCubic.start_epoch`)."""
+        idx = np.flatnonzero(mask)
+        if len(idx) == 0:
+            return
+        self.epoch_start[idx] = ack_time[idx]
+        # per flow, with Python floats (NaN: no W_max yet)
+        epochs = [cubic_epoch(W_max, c, self.C) for W_max, c in zip(self.W_max[idx].tolist(), cwnd[idx].tolist())]
+        self.K[idx], self.origin_point[idx] = zip(*epochs)
+
+    def step(self, ack_time, loss_event=False):
+        """Advances every flow by one ACK (see `TCPCubic.update_cwnd`)."""
+        ack_time, loss_event = self._inputs(ack_time, loss_event)
+        self.start_time = np.where(np.isnan(self.start_time), ack_time, self.start_time)
+        elapsed_time = ack_time - self.start_time
+
+        cwnd = self.cwnd
+        rto, loss, slow = self._classify(self._rto(ack_time), loss_event, cwnd < self.ssthresh)
+        avoid = self.branch == AVOIDANCE
+
+        # Congestion Avoidance (CUBIC Growth): t is measured from the start of the epoch
+        self.start_epoch(avoid & np.isnan(self.epoch_start), ack_time, cwnd)
+        cubic = np.maximum(cubic_window(ack_time - self.epoch_start, self.K, self.origin_point, self.C), self.MSS)
+        new_cwnd = np.where(avoid, cubic, cwnd)
+        # Slow Start (Exponential Growth)
+        new_cwnd = np.where(slow, cwnd + self.MSS, new_cwnd)
+        # Multiplicative Decrease
+        self.W_max = np.where(loss, cwnd, self.W_max)
+        new_cwnd = np.where(loss, cwnd * self.BETA, new_cwnd)
+        self.ssthresh = np.where(loss, np.maximum(new_cwnd, 1), self.ssthresh)
+        self.last_loss_time = np.where(loss, elapsed_time, self.last_loss_time)
+        self.start_epoch(loss, ack_time, new_cwnd)
+        # Retransmission Timeout (RTO): cwnd resets to MSS
+        new_cwnd = np.where(rto, self.MSS, new_cwnd)
+        self.epoch_start[rto] = np.nan
+
+        self.in_slow_start = rto | slow
+        # Enforce cwnd_max limit
+        self.cwnd = np.minimum(new_cwnd, self.CWND_MAX)
+        self.last_ack_time = ack_time.copy()
+
+
+class BatchReno(BatchCongestionControl):
+    """Batch version of `TCPReno`, including the `timeout` and `dup_ack` inputs."""
+
+    def __init__(self, num_flows, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
+        super().__init__(num_flows, cwnd=cwnd, ssthresh=ssthresh)
+        self.dup_ack_count = np.zeros(num_flows, dtype=np.int64)  # Counter for duplicate ACKs
+        self.last_ack = np.full(num_flows, np.nan)  # Track last ACK received
+        self.in_fast_recovery = np.zeros(num_flows, dtype=bool)
+
+    def _fast_recovery(self, mask, cwnd):
+        """Triple Duplicate ACKs -> Fast Recovery, for the flows in `mask`."""
+        self.ssthresh = np.where(mask, np.maximum(cwnd // 2, 2), self.ssthresh)
+        self.in_slow_start &= ~mask
+        self.in_fast_recovery |= mask
+        return np.where(mask, self.ssthresh, cwnd)  # Enter Fast Recovery
+
+    def step(self, ack_time, loss_event=False, timeout=False, dup_ack=False):
+        """Advances every flow by one ACK (see `TCPReno.update_cwnd`)."""
+        ack_time, loss_event = self._inputs(ack_time, loss_event)
+        timeout = np.broadcast_to(np.asarray(timeout, dtype=bool), (self.num_flows,))
+        dup_ack = np.broadcast_to(np.asarray(dup_ack, dtype=bool), (self.num_flows,))
+
+        cwnd = self.cwnd
+        default = np.where(self.in_fast_recovery, FAST_RECOVERY, AVOIDANCE)
+        timeout, loss, slow = self._classify(timeout, loss_event, self.in_slow_start, default)
+        linear = ~timeout & ~loss & ~slow  # Fast Recovery and Congestion Avoidance grow the same way
+
+        # Fast Recovery / Congestion Avoidance: Additive Increase
+        new_cwnd = np.where(linear, cwnd + 1, cwnd)
+        # Slow Start: Exponential Growth
+        new_cwnd = np.where(slow, cwnd * 2, new_cwnd)
+        self.in_slow_start &= ~(slow & (new_cwnd >= self.ssthresh))  # Move to Congestion Avoidance
+        # Triple Duplicate ACKs -> Fast Recovery
+        new_cwnd = self._fast_recovery(loss, new_cwnd)
+        # Timeout -> Reset to Slow Start
+        self.ssthresh = np.where(timeout, np.maximum(cwnd // 2, 2), self.ssthresh)
+        new_cwnd = np.where(timeout, 1, new_cwnd)
+        self.dup_ack_count[timeout] = 0
+        self.in_slow_start |= timeout
+        self.in_fast_recovery &= ~timeout
+
+        # Handle Duplicate ACKs: the third one re-enters Fast Recovery (and sets loss_event)
+        same_ack = dup_ack & (ack_time == self.last_ack)
+        self.dup_ack_count = np.where(same_ack, self.dup_ack_count + 1, np.where(dup_ack, 0, self.dup_ack_count))
+        third = same_ack & (self.dup_ack_count == 3)
+        new_cwnd = self._fast_recovery(third, new_cwnd)
+
+        self.branch[third] = LOSS  # on top of the branch above
+        self.loss_event = LOSS_EVENT[self.branch]
+        self.rto_event = RTO_EVENT[self.branch]
+        # Enforce cwnd_max limit
+        self.cwnd = np.minimum(new_cwnd, self.CWND_MAX)
+        self.last_ack = ack_time.copy()
+        self.last_ack_time = self.last_ack
+
+
+class BatchWestwood(BatchCongestionControl):
+    """Batch version of `TCPWestwood` (one `BandwidthSampler` per flow, as arrays)."""
+
+    ALPHA = WESTWOOD_ALPHA
+
+    def __init__(self, num_flows, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
+        super().__init__(num_flows, cwnd=cwnd, ssthresh=ssthresh)
+        self.bw_est = np.zeros(num_flows)  # Estimated bandwidth (segments/s)
+        self.acked = np.zeros(num_flows)  # Segments acknowledged in the current interval
+        self.sample_start = np.full(num_flows, np.nan)  # Start of the current interval
+        self.min_rtt = np.full(num_flows, np.inf)  # Minimum RTT
+
+    def step(self, ack_time, loss_event=False, rtt=np.nan):
+        """Advances every flow by one ACK (see `TCPWestwood.update_cwnd`); NaN RTTs are missing samples."""
+        ack_time, loss_event = self._inputs(ack_time, loss_event)
+        rtt = np.broadcast_to(np.asarray(rtt, dtype=np.float64), (self.num_flows,))
+
+        # Westwood+ bandwidth sample, once per RTT
+        acked = ~np.isnan(rtt)
+        self.min_rtt = np.fmin(self.min_rtt, rtt)
+        started = acked & ~np.isnan(self.sample_start)
+        count = np.where(started, self.acked + 1, self.acked)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            elapsed = ack_time - self.sample_start
+            due = started & (elapsed >= np.maximum(rtt, MIN_SAMPLE_INTERVAL)) & (elapsed > 0)
+            sample = count / elapsed
+        bw_est = np.where(self.bw_est == 0, sample, self.ALPHA * self.bw_est + (1 - self.ALPHA) * sample)
+        self.bw_est = np.where(due, bw_est, self.bw_est)
+        self.acked = np.where(due, 0, count)
+        self.sample_start = np.where((acked & ~started) | due, ack_time, self.sample_start)
+
+        cwnd = self.cwnd
+        with np.errstate(invalid='ignore', over='ignore'):
+            bdp = np.where(np.isinf(self.min_rtt), 0, self.bw_est * self.min_rtt)  # bandwidth-delay product
+            new_ssthresh = np.minimum(np.maximum(np.trunc(bdp), 2), self.CWND_MAX)
+        _, loss, slow = self._classify(False, loss_event, cwnd < self.ssthresh)
+        self.ssthresh = np.where(loss, new_ssthresh, self.ssthresh)
+        self.in_slow_start = slow
+        new_cwnd = np.where(slow, cwnd + 1, cwnd + 1.0 / cwnd)
+        new_cwnd = np.where(loss, self.ssthresh, new_cwnd)  # Enter congestion avoidance
+
+        # Enforce cwnd_max limit
+        self.cwnd = np.minimum(new_cwnd, self.CWND_MAX)
+
+
+def simulate_batch(engine, ack_times, loss_events, rtts=None):
+    """
+    Simulates all the flows of a batch engine given their ACKs.
+
+    Parameters:
+    - `engine`: Batch congestion control object (e.g., `BatchAIMD`) to be simulated.
+    - `ack_times`: ACK arrival times, shape (num_steps,) when all flows see the same trace
+      or (num_steps, num_flows) for one trace per flow.
+    - `loss_events`: Loss events, same shape as `ack_times`.
+    - `rtts`: RTT samples, same shape as `ack_times`, for the engines that take them (`BatchWestwood`).
+
+    Returns:
+    - `cwnd_evolution`: Array (num_steps, num_flows) of congestion window values over time.
+    - `loss_events`: Array (num_steps, num_flows) of loss events (1 if loss, 0 otherwise).
+    - `ssthreshs`: Array (num_steps, num_flows) of slow-start thresholds over time.
+    """
+    num_steps = len(ack_times)
+    cwnd_evolution = np.empty((num_steps, engine.num_flows))
+    flow_losses = np.empty((num_steps, engine.num_flows), dtype=np.int8)
+    ssthreshs = np.empty((num_steps, engine.num_flows))
+
+    for i in range(num_steps):
+        if rtts is None:
+            engine.step(ack_times[i], loss_events[i])
+        else:
+            engine.step(ack_times[i], loss_events[i], rtt=rtts[i])
+
+        # Store results
+        cwnd_evolution[i] = engine.cwnd
+        flow_losses[i] = engine.loss_event
+        ssthreshs[i] = engine.ssthresh
+
+    return cwnd_evolution, flow_losses, ssthreshs
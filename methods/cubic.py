@@ -1,6 +1,10 @@
-import logging
 import numpy as np
 
+from methods import kernels
+from methods.base import CongestionControl, register
+from methods.hystart import HyStartDelay
+from methods.kernels import AVOIDANCE, EVENT_FLAGS, SLOW_START
+
 
 # ------------------------------------
 #
@@ -11,7 +15,10 @@ INITIAL_CWND = 1  # Initial congestion window
 INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
 
 
-class TCPCubic:
+@register('cubic', 'TCP CUBIC')
+class TCPCubic(CongestionControl):
+
+    __slots__ = ('W_max', 'epoch_start', 'K', 'origin_point', 'last_loss_time', 'start_time', 'last_ack_time')
 
     # Constants for CUBIC
     MSS = 1  # Maximum Segment Size
@@ -19,62 +26,82 @@ class TCPCubic:
     BETA = 0.7  # Multiplicative decrease factor
 
 
-    def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
-        self.cwnd = cwnd  # Initial congestion window
-        self.ssthresh = ssthresh  # Slow start threshold
+    def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH, hystart=False):
+        super().__init__(cwnd, ssthresh)
+        if hystart:
+            self.hystart = HyStartDelay()  # slow start also ends when the RTT grows (needs `rtt`)
         self.W_max = None  # Previous max window size
+        self.epoch_start = None  # Start time of the current epoch (None: starts at the next avoidance ACK)
+        self.K = 0.0  # Time to reach the origin point, computed once per epoch
+        self.origin_point = None  # Window at the plateau of the CUBIC function in this epoch
         self.last_loss_time = None  # Time of last loss
         self.start_time = None  # Start time of simulation
         self.last_ack_time = None  # Last received ACK time
-        self.loss_event = False
-        self.CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
-        self.RTO_THRESHOLD = 3.0  # If no ACKs arrive for 3s, reset cwnd (RTO event)
-        logging.debug(f"CUBIC initialized with cwnd={cwnd}, ssthresh={ssthresh}")
 
     def cubic_wnd(self, t):
-        """CUBIC function: calculates new cwnd based on time t since last loss."""
-        if self.W_max is None:
-            self.W_max = self.cwnd
-        K = ((self.W_max * (1 - self.BETA)) / self.C) ** (1/3)
-        return self.C * ((t - K) ** 3) + self.W_max
-
-    def update_cwnd(self, ack_time, loss_event=False):
-        """Updates cwnd based on slow start, congestion avoidance, or loss."""
-        if self.start_time is None:
-            self.start_time = ack_time  # Set simulation start time
-        self.loss_event = False
-
-        elapsed_time = ack_time - self.start_time
-
-        # Check for RTO (No ACKs for RTO_THRESHOLD seconds)
-        if self.last_ack_time is not None and (ack_time - self.last_ack_time > self.RTO_THRESHOLD):
-            # Retransmission Timeout (RTO): If no ACKs arrive in RTO_THRESHOLD seconds, cwnd resets to MSS.
-            self.cwnd = self.MSS  # Timeout resets cwnd
-            # self.ssthresh = max(self.cwnd // 2, 2)
-            print(f"[RTO] Reset cwnd at time {ack_time:.2f}s")
-
-        elif loss_event:
-            # Multiplicative Decrease
-            self.W_max = self.cwnd  # Save previous cwnd before reduction
-            self.cwnd *= self.BETA  # Reduce window size
-            self.ssthresh = max(self.cwnd, 1)  # Adjust threshold
-            self.last_loss_time = elapsed_time  # Track last loss event
-            # print(f"Loss event at time {ack_time:.2f}s")
-            self.loss_event = True
-
-        elif self.cwnd < self.ssthresh:
-            # Slow Start (Exponential Growth)
-            self.cwnd += self.MSS
-
+        """
+        CUBIC function: calculates new cwnd based on time t since the start of the epoch.
+
+        `t` can be a scalar or an array with the times of a whole segment of ACKs.
+        K and the origin point are cached per epoch (see `start_epoch`).
+        Before the first epoch there is no CUBIC function yet: the window is the current cwnd.
+        """
+        if not np.isscalar(t):
+            t = np.asarray(t, dtype=np.float64)
+            if self.origin_point is None:
+                return np.full(t.shape, self.cwnd, dtype=np.float64)
+        elif self.origin_point is None:
+            return self.cwnd
+        return kernels.cubic_window(t, self.K, self.origin_point, self.C)
+
+    def start_epoch(self, ack_time):
+        """
+        Starts a new epoch at `ack_time`, and precomputes K and the origin point.
+
+        After a loss, cwnd = BETA * W_max and K = ((W_max * (1 - BETA)) / C) ** (1/3).
+        Without a previous W_max above cwnd (first epoch), the epoch starts at the plateau (K = 0).
+        """
+        self.epoch_start = ack_time
+        self.K, self.origin_point = kernels.cubic_epoch(self.W_max, self.cwnd, self.C)
+
+    @classmethod
+    def make_kernel(cls):
+        return kernels.cubic(cls.MSS, cls.C, cls.BETA, cls.CWND_MAX, cls.RTO_THRESHOLD)
+
+    def _record(self):
+        hystart = self.hystart
+        return (None, SLOW_START if self.in_slow_start else AVOIDANCE, self.cwnd, self.ssthresh, self.W_max,
+                self.epoch_start, self.K, self.origin_point, self.last_loss_time, self.start_time, self.last_ack_time,
+                hystart.min_rtt if hystart is not None else None,
+                hystart.delay_threshold if hystart is not None else None)
+
+    def _store(self, record):
+        (branch, phase, self.cwnd, self.ssthresh, self.W_max, self.epoch_start, self.K, self.origin_point,
+         self.last_loss_time, self.start_time, self.last_ack_time, min_rtt, _) = record
+        if self.hystart is not None:
+            self.hystart.min_rtt = min_rtt
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
+
+    def update_cwnd(self, ack_time, loss_event=False, rtt=None):
+        """
+        Updates cwnd based on slow start, congestion avoidance, or loss (see `methods.kernels.cubic`).
+
+        With HyStart, `rtt` samples can also end the slow start.
+        """
+        if self.hystart is not None:
+            self._store(self.kernel(self._record(), ack_time, loss_event, rtt))
         else:
-            # Congestion Avoidance (CUBIC Growth)
-            self.cwnd = max(self.cubic_wnd(elapsed_time), self.MSS)  # Ensure minimum cwnd
-
-        # Enforce cwnd_max limit
-        self.cwnd = min(self.cwnd, self.CWND_MAX)
-
-        # Update last ACK time
-        self.last_ack_time = ack_time
+            # `_record()` and `_store()` inlined: the common case, once per ACK
+            (branch, phase, self.cwnd, self.ssthresh, self.W_max, self.epoch_start, self.K, self.origin_point,
+             self.last_loss_time, self.start_time, self.last_ack_time, _, _) = self.kernel(
+                (None, None, self.cwnd, self.ssthresh, self.W_max, self.epoch_start, self.K, self.origin_point,
+                 self.last_loss_time, self.start_time, self.last_ack_time, None, None), ack_time, loss_event)
+            self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+            self.in_slow_start = phase == SLOW_START
+
+        if self.hooks is not None:
+            self.hooks.after_ack(self, ack_time)
 
     def __repr__(self):
         return f"TCPCubic(cwnd={self.cwnd}, ssthresh={self.ssthresh}"
\ No newline at end of file
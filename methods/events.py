@@ -0,0 +1,170 @@
+"""
+Event hooks of the congestion control classes.
+
+Each class has a `hooks` attribute, None by default. At the end of `update_cwnd` it runs
+
+    if self.hooks is not None:
+        self.hooks.after_ack(self, ack_time)
+
+so with no hooks attached the cost is one attribute test per ACK (no string is built, nothing is printed).
+`attach(tcp, sink)` creates the `Hooks` of `tcp` and registers a sink: a callable `sink(event, tcp, ack_time)`
+that receives typed `Event`s, derived from the state flags of the class after each ACK:
+- `LOSS` and `RTO` when `loss_event` / `rto_event` are set;
+- `SLOW_START`, `AVOIDANCE` and `FAST_RECOVERY` when the phase changes (`in_fast_recovery`, `in_slow_start`);
+- `ACK` for every ACK, only for the sinks that subscribe to it (e.g., `SamplingProfiler`).
+
+Example:
+    counter = EventCounter()
+    attach(tcp, counter, EventLogger())
+    simulate(tcp, ack_array)
+    print(counter.counts)
+"""
+import collections
+import enum
+import logging
+import time
+
+
+class Event(enum.Enum):
+    ACK = 'ack'  # Every ACK
+    SLOW_START = 'slow_start'  # Entered slow start
+    AVOIDANCE = 'avoidance'  # Entered congestion avoidance
+    FAST_RECOVERY = 'fast_recovery'  # Entered fast recovery
+    LOSS = 'loss'  # Loss event (multiplicative decrease)
+    RTO = 'rto'  # Retransmission timeout
+
+
+TRANSITIONS = frozenset(Event) - {Event.ACK}  # Events sent to a sink by default
+
+
+def phase(tcp):
+    """Phase of `tcp` after its last ACK: `Event.FAST_RECOVERY`, `Event.SLOW_START` or `Event.AVOIDANCE`."""
+    if getattr(tcp, 'in_fast_recovery', False):
+        return Event.FAST_RECOVERY
+    if getattr(tcp, 'in_slow_start', tcp.cwnd < tcp.ssthresh):
+        return Event.SLOW_START
+    return Event.AVOIDANCE
+
+
+class Hooks:
+    """Sinks of one congestion control object, indexed by event."""
+
+    def __init__(self):
+        self.sinks = {event: [] for event in Event}
+        self.phase = None  # Phase after the previous ACK
+
+    def add(self, sink, events=None):
+        """Registers `sink` for `events` (default: `sink.events`, or all the events but `ACK`)."""
+        for event in events if events is not None else getattr(sink, 'events', TRANSITIONS):
+            self.sinks[event].append(sink)
+
+    def remove(self, sink):
+        for sinks in self.sinks.values():
+            if sink in sinks:
+                sinks.remove(sink)
+
+    def __bool__(self):
+        return any(self.sinks.values())
+
+    def emit(self, event, tcp, ack_time):
+        for sink in self.sinks[event]:
+            sink(event, tcp, ack_time)
+
+    def after_ack(self, tcp, ack_time):
+        """Emits the events of the ACK just processed by `tcp`."""
+        if self.sinks[Event.ACK]:
+            self.emit(Event.ACK, tcp, ack_time)
+        if tcp.rto_event:
+            self.emit(Event.RTO, tcp, ack_time)
+        elif tcp.loss_event:
+            self.emit(Event.LOSS, tcp, ack_time)
+        current = phase(tcp)
+        if current is not self.phase:
+            self.phase = current
+            self.emit(current, tcp, ack_time)
+
+
+def attach(tcp, *sinks, events=None):
+    """Registers `sinks` on `tcp` (for `events`, see `Hooks.add`) and returns its `Hooks`."""
+    if tcp.hooks is None:
+        tcp.hooks = Hooks()
+    for sink in sinks:
+        tcp.hooks.add(sink, events)
+    return tcp.hooks
+
+
+def detach(tcp, *sinks):
+    """Removes `sinks` from `tcp` (all of them if none is given); without sinks left the hooks cost nothing again."""
+    if tcp.hooks is None:
+        return
+    for sink in sinks:
+        tcp.hooks.remove(sink)
+    if not sinks or not tcp.hooks:
+        tcp.hooks = None
+
+
+class EventCounter:
+    """Counts the events, by type."""
+
+    def __init__(self, events=TRANSITIONS):
+        self.events = events
+        self.counts = collections.Counter()
+
+    def __call__(self, event, tcp, ack_time):
+        self.counts[event] += 1
+
+
+class EventRecorder:
+    """Keeps every event as (event, ack_time, cwnd, ssthresh)."""
+
+    def __init__(self, events=TRANSITIONS):
+        self.events = events
+        self.records = []
+
+    def __call__(self, event, tcp, ack_time):
+        self.records.append((event, ack_time, tcp.cwnd, tcp.ssthresh))
+
+
+class EventLogger:
+    """Logs the events with `logging` (the message is only formatted if the level is enabled)."""
+
+    def __init__(self, logger=None, level=logging.DEBUG, events=TRANSITIONS):
+        self.logger = logger if logger is not None else logging.getLogger('tcp.events')
+        self.level = level
+        self.events = events
+
+    def __call__(self, event, tcp, ack_time):
+        self.logger.log(self.level, "%-13s %s cwnd=%8.4f ssthresh=%8.4f t=%.2f",
+                        event.value, type(tcp).__name__, tcp.cwnd, tcp.ssthresh, ack_time)
+
+
+class SamplingProfiler:
+    """
+    Samples the wall time between one ACK and the next, every `every` ACKs.
+
+    Under `simulation.simulate` this is the cost of one `update_cwnd` call plus the loop that stores
+    its result. The samples are grouped by the phase of the ACK that started them.
+    """
+
+    events = (Event.ACK,)
+
+    def __init__(self, every=1000, clock=time.perf_counter_ns):
+        self.every = every
+        self.clock = clock
+        self.count = 0
+        self.pending = None  # (start, phase) of the sample in progress
+        self.samples = collections.defaultdict(list)  # phase -> durations (ns)
+
+    def __call__(self, event, tcp, ack_time):
+        now = self.clock()
+        if self.pending is not None:
+            start, sample_phase = self.pending
+            self.samples[sample_phase].append(now - start)
+            self.pending = None
+        self.count += 1
+        if self.count % self.every == 0:
+            self.pending = (self.clock(), phase(tcp))
+
+    def summary(self):
+        """Returns {phase: (number of samples, mean ns, max ns)}."""
+        return {p.value: (len(s), sum(s) / len(s), max(s)) for p, s in self.samples.items() if s}
@@ -0,0 +1,177 @@
+"""
+Bandwidth and RTT filters for the congestion control algorithms.
+
+- `BandwidthSampler`: Westwood+ bandwidth estimate: one sample per RTT (segments acknowledged in the
+  interval / duration of the interval), smoothed by an EWMA, so the estimate does not depend on the
+  ACK compression or on the number of ACKs per RTT.
+- `WindowedMax` / `WindowedMin`: maximum / minimum of the samples of the last `window` (seconds, or any
+  other increasing key), e.g. the max bandwidth of BBR or the min RTT of Vegas. The samples that can no
+  longer be the best are dropped on arrival (monotonic deque), so an update is amortized O(1)
+  and reading the value is O(1), without scans of the window.
+- `ewma`: the same EWMA over a whole array of samples, vectorized, for trace segments.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+from methods.base import Snapshot
+from methods.kernels import sample_bandwidth
+
+
+# ------------------------------------
+#
+# Constants of the filters
+#
+# ------------------------------------
+WESTWOOD_ALPHA = 7 / 8  # Weight of the previous estimate in the Westwood+ filter (Linux tcp_westwood)
+MIN_SAMPLE_INTERVAL = 0.05  # Minimum duration of a bandwidth sample (s)
+EWMA_MAX_EXP = 230.0  # ewma(): largest weight exponent in a sub-block, e.g. alpha ** -k < e ** 230 ~ 1e100
+
+
+class BandwidthSampler(Snapshot):
+    """
+    Westwood+ bandwidth estimator (segments/s).
+
+    The segments acknowledged since the start of the current interval are counted; once the interval
+    is longer than `interval` (normally the RTT), they give a bandwidth sample and a new interval starts.
+    The first sample initializes the estimate, the next ones are smoothed:
+    `bw_est = alpha * bw_est + (1 - alpha) * sample`.
+    """
+
+    __slots__ = ('alpha', 'bw_est', 'acked', 'sample_start')
+
+    def __init__(self, alpha=WESTWOOD_ALPHA):
+        self.alpha = alpha
+        self.bw_est = 0  # Estimated bandwidth (segments/s)
+        self.acked = 0  # Segments acknowledged in the current interval
+        self.sample_start = None  # Start of the current interval
+
+    def update(self, ack_time, acked, interval):
+        """
+        Adds `acked` segments acknowledged at `ack_time`.
+
+        Parameters:
+        - `ack_time`: Time of the ACK.
+        - `acked`: Number of segments acknowledged by the ACK.
+        - `interval`: Minimum duration of a sample (e.g., `max(rtt, MIN_SAMPLE_INTERVAL)`).
+
+        Returns:
+        - The bandwidth estimate.
+        """
+        self.bw_est, self.acked, self.sample_start = sample_bandwidth(
+            self.bw_est, self.acked, self.sample_start, self.alpha, ack_time, acked, interval)
+        return self.bw_est
+
+    def __repr__(self):
+        return f"BandwidthSampler(bw_est={self.bw_est:.2f})"
+
+
+class _WindowedFilter(Snapshot):
+    """Best sample over a sliding window, kept at the head of a monotonic deque of (key, value)."""
+
+    __slots__ = ('window', 'samples')
+
+    def __init__(self, window):
+        self.window = window  # Length of the window, in units of the key (e.g., seconds)
+        self.samples = deque()  # (key, value), keys increasing and values strictly worse from head to tail
+
+    @property
+    def value(self):
+        """Best value of the window, or None before the first sample."""
+        return self.samples[0][1] if self.samples else None
+
+    def reset(self):
+        self.samples.clear()
+
+    def snapshot(self):
+        return {'window': self.window, 'samples': [list(sample) for sample in self.samples]}
+
+    def restore(self, state):
+        self.window = state['window']
+        self.samples = deque(tuple(sample) for sample in state['samples'])
+        return self
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(window={self.window}, value={self.value})"
+
+
+class WindowedMax(_WindowedFilter):
+    """Maximum of the samples whose key is within `window` of the last key."""
+
+    __slots__ = ()
+
+    def update(self, key, value):
+        """Adds a sample (keys must not decrease) and returns the maximum of the window."""
+        samples = self.samples
+        # the samples not larger than the new one can no longer be the maximum
+        while samples and samples[-1][1] <= value:
+            samples.pop()
+        samples.append((key, value))
+        while samples[0][0] <= key - self.window:
+            samples.popleft()
+        return samples[0][1]
+
+
+class WindowedMin(_WindowedFilter):
+    """Minimum of the samples whose key is within `window` of the last key."""
+
+    __slots__ = ()
+
+    def update(self, key, value):
+        """Adds a sample (keys must not decrease) and returns the minimum of the window."""
+        samples = self.samples
+        # the samples not smaller than the new one can no longer be the minimum
+        while samples and samples[-1][1] >= value:
+            samples.pop()
+        samples.append((key, value))
+        while samples[0][0] <= key - self.window:
+            samples.popleft()
+        return samples[0][1]
+
+
+def ewma(samples, alpha=WESTWOOD_ALPHA, initial=None):
+    """
+    EWMA of a whole array of samples: `y[i] = alpha * y[i-1] + (1 - alpha) * samples[i]`.
+
+    Vectorized with the closed form `y[i] = alpha ** i * (y[-1] + (1 - alpha) * sum(alpha ** -k * samples[k]))`,
+    in sub-blocks short enough for the weights `alpha ** -k` not to overflow; the result matches
+    the sequential recursion up to float rounding.
+
+    Parameters:
+    - `samples`: 1-D array of samples.
+    - `alpha`: Weight of the previous value, in [0, 1].
+    - `initial`: Value before the first sample (e.g., the last value of the previous segment);
+      with None, the first sample initializes the filter.
+
+    Returns:
+    - Array of the filtered values, one per sample (its last value is the `initial` of the next segment).
+    """
+    x = np.asarray(samples, dtype=np.float64)
+    out = np.empty_like(x)
+    if len(x) == 0:
+        return out
+    if initial is None:
+        initial, x, out[0] = x[0], x[1:], x[0]
+        y = out[1:]
+    else:
+        y = out
+    if alpha <= 0:
+        y[:] = x
+        return out
+    if alpha >= 1:
+        y[:] = initial
+        return out
+
+    block = max(int(EWMA_MAX_EXP / -math.log(alpha)), 1)
+    powers = alpha ** np.arange(1, min(block, len(x)) + 1)  # alpha ** (k + 1)
+    prev = initial
+    for start in range(0, len(x), block):
+        segment = x[start:start + block]
+        p = powers[:len(segment)]
+        y[start:start + len(segment)] = p * (prev + (1 - alpha) * np.cumsum(segment / p))
+        prev = y[start + len(segment) - 1]
+    return out
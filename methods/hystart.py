@@ -1,12 +1,16 @@
 """
+HyStart (hybrid slow start): slow start exits when the RTT grows, before the losses.
 
->>>>>>>>>>>>>>>>>>>>>> NOT USED <<<<<<<<<<<<<<<<<<<<<<<<
-
-Uses RTT instead of ACKS
+When the queue of the bottleneck starts to build up, the RTT samples grow above the minimum RTT.
+`HyStartDelay` detects it (RTT above `delay_threshold` times the minimum RTT), and the slow start ends
+with ssthresh = cwnd instead of overshooting until a loss.
 
+`TCPHyStart` is a complete algorithm based on it; CUBIC and Reno take it as an option (`hystart=True`).
+They need a trace with an `rtt` column (see `simulation.generate_ack_trace(base_rtt=...)`).
 """
-import logging
-import numpy as np
+from methods import kernels
+from methods.base import CongestionControl, Snapshot, register
+from methods.kernels import AVOIDANCE, EVENT_FLAGS, SLOW_START
 
 
 # ------------------------------------
@@ -16,53 +20,68 @@ import numpy as np
 # ------------------------------------
 INITIAL_CWND = 1  # Initial congestion window
 INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
+DELAY_THRESHOLD = 1.25  # RTT increase threshold (1.25x min RTT)
 
 
-class TCPHyStart:
-    def __init__(self, cwnd=1, ssthresh=64):
-        self.cwnd = cwnd  # Initial congestion window (MSS units)
-        self.ssthresh = ssthresh  # Slow Start Threshold
+class HyStartDelay(Snapshot):
+    """Delay-based slow start exit of HyStart."""
+
+    __slots__ = ('min_rtt', 'delay_threshold')
+
+    def __init__(self, delay_threshold=DELAY_THRESHOLD):
         self.min_rtt = float("inf")  # Track min RTT
+        self.delay_threshold = delay_threshold
+
+    def exit(self, rtt):
+        """Adds an RTT sample, and returns True if the RTT increased above the threshold."""
+        self.min_rtt, exit_slow_start = kernels.hystart_exit(self.min_rtt, self.delay_threshold, rtt)
+        return exit_slow_start
+
+
+@register('hystart', 'TCP HyStart')
+class TCPHyStart(CongestionControl):
+
+    __slots__ = ('prev_rtt', 'ack_count')
+
+    NEEDS_RTT = True
+
+    def __init__(self, cwnd=1, ssthresh=64):
+        super().__init__(cwnd, ssthresh)
+        self.hystart = HyStartDelay()
         self.prev_rtt = None  # Previous RTT value
-        self.in_slow_start = True  # Start in Slow Start
-        self.delay_threshold = 1.25  # RTT increase threshold (1.25x min RTT)
         self.ack_count = 0  # Track number of ACKs
-        self.CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
-        self.loss_event = False
-        logging.debug(f"RENO initialized with cwnd={cwnd}, ssthresh={ssthresh}")
-
-    def update_cwnd(self, ack_time, rtt, loss_event=False):
-        self.ack_count += 1
-
-        # Update min RTT (for delay-based detection)
-        if rtt < self.min_rtt:
-            self.min_rtt = rtt
-
-        # Loss-based exit from slow start
-        if loss_event:
-            self.ssthresh = max(self.cwnd // 2, 2)
-            self.cwnd = self.ssthresh
-            self.in_slow_start = False  # Enter congestion avoidance
-            self.loss_event = True
-
-        # Delay-based exit from slow start
-        elif self.in_slow_start and self.prev_rtt is not None:
-            if rtt > self.min_rtt * self.delay_threshold:  # RTT increase detected
-                self.ssthresh = self.cwnd  # Set ssthresh to current cwnd
-                self.in_slow_start = False  # Exit slow start
-
-        # Normal Slow Start (Exponential Growth)
-        if self.in_slow_start:
-            self.cwnd *= 2  # Double cwnd every RTT
-        else:
-            # Congestion Avoidance (Additive Increase)
-            self.cwnd += 1  # Linear growth after slow start
-
-        # Enforce cwnd_max limit
-        self.cwnd = min(self.cwnd, self.CWND_MAX)
-
-        # Store last RTT
-        self.prev_rtt = rtt
+
+    @property
+    def min_rtt(self):
+        return self.hystart.min_rtt
+
+    @classmethod
+    def make_kernel(cls):
+        return kernels.hystart(cls.CWND_MAX)
+
+    def _record(self):
+        return (None, SLOW_START if self.in_slow_start else AVOIDANCE, self.cwnd, self.ssthresh,
+                self.prev_rtt, self.ack_count, self.hystart.min_rtt, self.hystart.delay_threshold)
+
+    def _store(self, record):
+        branch, phase, self.cwnd, self.ssthresh, self.prev_rtt, self.ack_count, self.hystart.min_rtt, _ = record
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
+
+    def update_cwnd(self, ack_time, loss_event=False, rtt=None):
+        """
+        Updates cwnd on an ACK (see `methods.kernels.hystart`): slow start ends on a loss,
+        or when an `rtt` sample is above the threshold.
+        """
+        hystart = self.hystart
+        branch, phase, self.cwnd, self.ssthresh, self.prev_rtt, self.ack_count, hystart.min_rtt, _ = self.kernel(
+            (None, SLOW_START if self.in_slow_start else AVOIDANCE, self.cwnd, self.ssthresh, self.prev_rtt,
+             self.ack_count, hystart.min_rtt, hystart.delay_threshold), ack_time, loss_event, rtt)
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
+
+        if self.hooks is not None:
+            self.hooks.after_ack(self, ack_time)
 
     def __repr__(self):
-        return f"TCPHyStart(cwnd={self.cwnd}, ssthresh={self.ssthresh}"
+        return f"TCPHyStart(cwnd={self.cwnd}, ssthresh={self.ssthresh})"
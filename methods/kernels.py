@@ -0,0 +1,359 @@
+"""
+Transition kernels of the congestion control algorithms.
+
+The per-ACK logic of each algorithm is written once, as a pure function over a flat state record:
+`kernel(record, ack_time, loss_event, rtt)` returns the next record and changes nothing else.
+A record is a tuple `(branch, phase, cwnd, ssthresh, ...)` followed by the fields of the algorithm
+(`None` where the class has `None`, e.g. `last_ack_time` before the first ACK):
+- `branch`: the `State` taken by the last ACK (RTO, LOSS, SLOW_START, AVOIDANCE or FAST_RECOVERY);
+  the kernels do not read it;
+- `phase`: the `State` the flow is in after it (SLOW_START, AVOIDANCE or FAST_RECOVERY).
+The flags of the classes follow from them through tables:
+`loss_event, rto_event = EVENT_FLAGS[branch]` and `in_slow_start, in_fast_recovery = PHASE_FLAGS[phase]`.
+
+The same kernel drives:
+- the scalar classes: `update_cwnd` packs its attributes into a record (`_record()`), calls the kernel
+  and unpacks the result (`_store()`), so the attributes stay the public state of the objects;
+- `run`: a tight loop over a block of ACKs that keeps the record in a local variable and writes
+  the results into preallocated arrays (used by `simulation.simulate` when no event hooks are attached);
+- the batch engines (`methods/batch.py`): their flows are classified into the same branches, in the
+  same order, and their flags come from the same tables.
+
+`cwnd` is capped with `cwnd_max if cwnd_max < cwnd else cwnd`, the same value as `min(cwnd, cwnd_max)`
+without the cost of a call on every ACK.
+
+The kernels are built per class from its constants (`make_kernel`), so a subclass that only changes
+e.g. `CWND_MAX` or `BETA` gets its own kernel.
+"""
+from enum import IntEnum
+
+import numpy as np
+
+
+class State(IntEnum):
+    """States of the congestion control state machine, and the branches an ACK can take."""
+    SLOW_START = 0
+    AVOIDANCE = 1
+    FAST_RECOVERY = 2
+    LOSS = 3  # Multiplicative decrease (loss event, e.g. triple duplicate ACKs)
+    RTO = 4  # Retransmission timeout
+
+
+# The kernels use the values of `State` as plain ints: faster to compare, and to store in arrays
+SLOW_START, AVOIDANCE, FAST_RECOVERY, LOSS, RTO = map(int, State)
+
+# Flags of the classes (indexed by `State`): (loss_event, rto_event) of the ACK that took a branch,
+# and (in_slow_start, in_fast_recovery) of a phase
+EVENT_FLAGS = tuple((state == LOSS, state == RTO) for state in State)
+PHASE_FLAGS = tuple((state == SLOW_START, state == FAST_RECOVERY) for state in State)
+LOSS_EVENT = np.array([loss_event for loss_event, _ in EVENT_FLAGS])  # the same, for arrays of branches
+RTO_EVENT = np.array([rto_event for _, rto_event in EVENT_FLAGS])
+
+
+# ------------------------------------
+#
+# Building blocks shared with the classes and the batch engines
+#
+# ------------------------------------
+def hystart_exit(min_rtt, delay_threshold, rtt):
+    """
+    HyStart delay-based slow start exit (see `methods.hystart.HyStartDelay`).
+
+    Returns:
+    - The new minimum RTT, and True if `rtt` is above `delay_threshold` times the minimum RTT.
+    """
+    if rtt < min_rtt:
+        return rtt, False
+    return min_rtt, rtt > min_rtt * delay_threshold
+
+
+def sample_bandwidth(bw_est, acked, sample_start, alpha, ack_time, count, interval):
+    """
+    Westwood+ bandwidth sample (see `methods.filters.BandwidthSampler.update`).
+
+    Returns:
+    - The new (`bw_est`, `acked`, `sample_start`).
+    """
+    if sample_start is None:
+        # the first ACK starts the first interval
+        return bw_est, acked, ack_time
+    acked += count
+    elapsed = ack_time - sample_start
+    if elapsed >= interval and elapsed > 0:
+        sample = acked / elapsed
+        bw_est = sample if bw_est == 0 else alpha * bw_est + (1 - alpha) * sample
+        return bw_est, 0, ack_time
+    return bw_est, acked, sample_start
+
+
+def cubic_epoch(W_max, cwnd, c):
+    """
+    K and origin point of a CUBIC epoch starting with `cwnd` (see `methods.cubic.TCPCubic.start_epoch`).
+
+    K is computed with Python floats: NumPy's SIMD `pow` can differ from `**` in the last bit.
+    """
+    if W_max is not None and W_max > cwnd:
+        return ((W_max - cwnd) / c) ** (1/3), W_max
+    return 0.0, cwnd
+
+
+def cubic_window(t, K, origin_point, c):
+    """CUBIC function at time `t` since the start of the epoch (scalars or arrays)."""
+    dt = t - K
+    return c * (dt * dt * dt) + origin_point  # same rounding as NumPy (no SIMD `pow`)
+
+
+# ------------------------------------
+#
+# Kernels
+#
+# ------------------------------------
+def aimd(mss, beta, cwnd_max, rto_threshold):
+    """
+    Kernel of `TCPAIMD`.
+
+    Record: (branch, phase, cwnd, ssthresh, start_time, last_ack_time).
+    """
+    def kernel(record, ack_time, loss_event, rtt=None):
+        _, _, cwnd, ssthresh, start_time, last_ack_time = record
+        if start_time is None:
+            start_time = ack_time  # Set simulation start time
+
+        if last_ack_time is not None and ack_time - last_ack_time > rto_threshold:
+            # Retransmission Timeout (RTO): cwnd resets to MSS
+            return RTO, SLOW_START, min(mss, cwnd_max), cwnd_max, start_time, ack_time
+        if loss_event:
+            # Multiplicative Decrease (prevent ssthresh from going too low, and cwnd from reaching 0)
+            return (LOSS, SLOW_START, min(max(cwnd * beta, 1), cwnd_max), max(ssthresh * beta, cwnd + 1, 2),
+                    start_time, ack_time)
+        if cwnd < ssthresh:
+            # Slow Start (Exponential Growth)
+            cwnd += mss
+            return SLOW_START, SLOW_START, cwnd_max if cwnd_max < cwnd else cwnd, ssthresh, start_time, ack_time
+        # Congestion Avoidance (Additive Increase); ssthresh keeps track of the max cwnd
+        cwnd += mss / cwnd
+        return (AVOIDANCE, AVOIDANCE, cwnd_max if cwnd_max < cwnd else cwnd, cwnd if cwnd > ssthresh else ssthresh,
+                start_time, ack_time)
+    return kernel
+
+
+def cubic(mss, c, beta, cwnd_max, rto_threshold):
+    """
+    Kernel of `TCPCubic`.
+
+    Record: (branch, phase, cwnd, ssthresh, W_max, epoch_start, K, origin_point, last_loss_time,
+    start_time, last_ack_time, hystart_min_rtt, delay_threshold); `delay_threshold` is None without HyStart.
+    """
+    def kernel(record, ack_time, loss_event, rtt=None):
+        (_, _, cwnd, ssthresh, W_max, epoch_start, K, origin_point, last_loss_time, start_time, last_ack_time,
+         min_rtt, delay_threshold) = record
+        if start_time is None:
+            start_time = ack_time  # Set simulation start time
+
+        if last_ack_time is not None and ack_time - last_ack_time > rto_threshold:
+            # Retransmission Timeout (RTO): cwnd resets to MSS, the next epoch starts when avoidance resumes
+            branch, phase = RTO, SLOW_START
+            cwnd = mss
+            epoch_start = None
+        elif loss_event:
+            # Multiplicative Decrease: cwnd == ssthresh, back to congestion avoidance
+            branch, phase = LOSS, AVOIDANCE
+            W_max = cwnd
+            cwnd *= beta
+            ssthresh = max(cwnd, 1)
+            last_loss_time = ack_time - start_time
+            epoch_start = ack_time
+            K, origin_point = cubic_epoch(W_max, cwnd, c)
+        else:
+            if cwnd < ssthresh and delay_threshold is not None and rtt is not None:
+                min_rtt, exit_slow_start = hystart_exit(min_rtt, delay_threshold, rtt)
+                if exit_slow_start:
+                    ssthresh = cwnd
+            if cwnd < ssthresh:
+                # Slow Start (Exponential Growth)
+                branch = phase = SLOW_START
+                cwnd += mss
+            else:
+                # Congestion Avoidance (CUBIC Growth): t is measured from the start of the epoch
+                branch = phase = AVOIDANCE
+                if epoch_start is None:
+                    epoch_start = ack_time
+                    K, origin_point = cubic_epoch(W_max, cwnd, c)
+                cwnd = cubic_window(ack_time - epoch_start, K, origin_point, c)
+                if mss > cwnd:
+                    cwnd = mss  # Ensure minimum cwnd
+
+        return (branch, phase, cwnd_max if cwnd_max < cwnd else cwnd, ssthresh, W_max, epoch_start, K, origin_point,
+                last_loss_time, start_time, ack_time, min_rtt, delay_threshold)
+    return kernel
+
+
+def reno(cwnd_max):
+    """
+    Kernel of `TCPReno`, with its `timeout` and `dup_ack` inputs.
+
+    Record: (branch, phase, cwnd, ssthresh, dup_ack_count, last_ack, hystart_min_rtt, delay_threshold).
+    """
+    def kernel(record, ack_time, loss_event, rtt=None, timeout=False, dup_ack=False):
+        _, phase, cwnd, ssthresh, dup_ack_count, last_ack, min_rtt, delay_threshold = record
+
+        if timeout:
+            # Timeout -> Reset to Slow Start
+            branch, phase = RTO, SLOW_START
+            ssthresh = max(cwnd // 2, 2)
+            cwnd = 1
+            dup_ack_count = 0
+        elif loss_event:
+            # Triple Duplicate ACKs -> Fast Recovery
+            branch, phase = LOSS, FAST_RECOVERY
+            ssthresh = max(cwnd // 2, 2)
+            cwnd = ssthresh
+        else:
+            if phase == SLOW_START and delay_threshold is not None and rtt is not None:
+                min_rtt, exit_slow_start = hystart_exit(min_rtt, delay_threshold, rtt)
+                if exit_slow_start:
+                    ssthresh = cwnd
+                    phase = AVOIDANCE
+            branch = phase
+            if phase == SLOW_START:
+                # Slow Start: Exponential Growth
+                cwnd *= 2
+                if cwnd >= ssthresh:
+                    phase = AVOIDANCE  # Move to Congestion Avoidance
+            else:
+                # Fast Recovery (temporary inflation until a new ACK) and Congestion Avoidance: Additive Increase
+                cwnd += 1
+
+        # Handle Duplicate ACKs: the third one is a loss event on top of the branch above
+        if dup_ack:
+            if ack_time == last_ack:
+                dup_ack_count += 1
+                if dup_ack_count == 3:
+                    branch, phase = LOSS, FAST_RECOVERY
+                    ssthresh = max(cwnd // 2, 2)
+                    cwnd = ssthresh
+            else:
+                dup_ack_count = 0  # Reset if a new ACK arrives
+
+        return (branch, phase, cwnd_max if cwnd_max < cwnd else cwnd, ssthresh, dup_ack_count, ack_time, min_rtt,
+                delay_threshold)
+    return kernel
+
+
+def westwood(cwnd_max, min_sample_interval):
+    """
+    Kernel of `TCPWestwood`.
+
+    Record: (branch, phase, cwnd, ssthresh, bw_est, acked, sample_start, alpha, min_rtt).
+    """
+    inf = float("inf")
+
+    def kernel(record, ack_time, loss_event, rtt=None):
+        _, _, cwnd, ssthresh, bw_est, acked, sample_start, alpha, min_rtt = record
+
+        if rtt is not None:
+            # each ACK with an RTT sample acknowledges one segment
+            if rtt < min_rtt:
+                min_rtt = rtt
+            bw_est, acked, sample_start = sample_bandwidth(bw_est, acked, sample_start, alpha, ack_time, 1,
+                                                           min_sample_interval if min_sample_interval > rtt else rtt)
+
+        if loss_event:
+            # bandwidth-delay product (0 before the first RTT sample); enter congestion avoidance
+            bdp = bw_est * min_rtt if min_rtt != inf else 0
+            branch, phase = LOSS, AVOIDANCE
+            ssthresh = cwnd = min(max(int(bdp), 2), cwnd_max)
+        elif cwnd < ssthresh:
+            # Exponential growth (Slow Start)
+            branch = phase = SLOW_START
+            cwnd += 1
+        else:
+            # Congestion Avoidance (Linear Growth)
+            branch = phase = AVOIDANCE
+            cwnd += 1.0 / cwnd
+
+        return (branch, phase, cwnd_max if cwnd_max < cwnd else cwnd, ssthresh, bw_est, acked, sample_start, alpha,
+                min_rtt)
+    return kernel
+
+
+def hystart(cwnd_max):
+    """
+    Kernel of `TCPHyStart` (no RTO).
+
+    Record: (branch, phase, cwnd, ssthresh, prev_rtt, ack_count, hystart_min_rtt, delay_threshold).
+    """
+    def kernel(record, ack_time, loss_event, rtt=None):
+        _, phase, cwnd, ssthresh, prev_rtt, ack_count, min_rtt, delay_threshold = record
+        ack_count += 1
+
+        # HyStart delay-based detection, on every ACK with an RTT sample (`hystart_exit`, inlined)
+        exit_slow_start = False
+        if rtt is not None:
+            if rtt < min_rtt:
+                min_rtt = rtt
+            else:
+                exit_slow_start = rtt > min_rtt * delay_threshold
+
+        if loss_event:
+            # Loss-based exit from slow start: enter congestion avoidance
+            branch, phase = LOSS, AVOIDANCE
+            ssthresh = max(cwnd // 2, 2)
+            cwnd = ssthresh
+        else:
+            if exit_slow_start and phase == SLOW_START and prev_rtt is not None:
+                # Delay-based exit from slow start
+                ssthresh = cwnd
+                phase = AVOIDANCE
+            branch = phase
+
+        if phase == SLOW_START:
+            cwnd *= 2  # Double cwnd every RTT
+        else:
+            cwnd += 1  # Congestion Avoidance (Additive Increase), also right after a loss
+
+        return branch, phase, cwnd_max if cwnd_max < cwnd else cwnd, ssthresh, rtt, ack_count, min_rtt, delay_threshold
+    return kernel
+
+
+# ------------------------------------
+#
+# Loop over a block of ACKs
+#
+# ------------------------------------
+def run(tcp, times, losses, cwnd_out, loss_out, ssthresh_out, rtts=None):
+    """
+    Runs the kernel of `tcp` over one block of ACKs, writing the results into the `*_out` buffers.
+
+    The state is read from `tcp` once before the block and written back once after it;
+    in between it only lives in the record (event hooks are not run: see `simulation.simulate`).
+
+    Parameters:
+    - `tcp`: Congestion control object whose `update_cwnd` only runs its kernel (`tcp.kernel_only`).
+    - `times`, `losses`: ACK times and loss events (lists of Python values).
+    - `cwnd_out`, `loss_out`, `ssthresh_out`: Arrays of the same length, for the results.
+    - `rtts`: RTT samples (list), for the algorithms that take them.
+    """
+    kernel = tcp.kernel
+    record = tcp._record()
+    branches = []
+    cwnds = []
+    ssthreshs = []
+    add_branch, add_cwnd, add_ssthresh = branches.append, cwnds.append, ssthreshs.append
+    if rtts is None:
+        for ack_time, loss_event in zip(times, losses):
+            record = kernel(record, ack_time, loss_event)
+            add_branch(record[0])
+            add_cwnd(record[2])
+            add_ssthresh(record[3])
+    else:
+        for ack_time, loss_event, rtt in zip(times, losses, rtts):
+            record = kernel(record, ack_time, loss_event, rtt)
+            add_branch(record[0])
+            add_cwnd(record[2])
+            add_ssthresh(record[3])
+    tcp._store(record)
+
+    cwnd_out[:] = cwnds
+    loss_out[:] = LOSS_EVENT[np.array(branches, dtype=np.intp)]
+    ssthresh_out[:] = ssthreshs
@@ -1,6 +1,8 @@
 
-import logging
-import numpy as np
+from methods import kernels
+from methods.base import CongestionControl, register
+from methods.hystart import HyStartDelay
+from methods.kernels import AVOIDANCE, EVENT_FLAGS, FAST_RECOVERY, PHASE_FLAGS, SLOW_START
 
 
 # ------------------------------------
@@ -12,65 +14,57 @@ INITIAL_CWND = 1  # Initial congestion window
 INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
 
 
-class TCPReno:
-    def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
-        self.cwnd = cwnd  # Congestion Window (MSS units)
-        self.ssthresh = ssthresh  # Slow Start Threshold
+@register('reno', 'TCP Reno')
+class TCPReno(CongestionControl):
+
+    __slots__ = ('dup_ack_count', 'last_ack', 'in_fast_recovery')
+
+    def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH, hystart=False):
+        super().__init__(cwnd, ssthresh)
+        if hystart:
+            self.hystart = HyStartDelay()  # slow start also ends when the RTT grows (needs `rtt`)
         self.dup_ack_count = 0  # Counter for duplicate ACKs
         self.last_ack = None  # Track last ACK received
-        self.in_slow_start = True
         self.in_fast_recovery = False
-        self.CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
-        self.RTO_THRESHOLD = 3.0  # If no ACKs arrive for 3s, reset cwnd (RTO event)
-        self.loss_event = False
-        logging.debug(f"RENO initialized with cwnd={cwnd}, ssthresh={ssthresh}")
 
-    def update_cwnd(self, ack_time, loss_event=False, timeout=False, dup_ack=False):
-        self.loss_event = False
-        if timeout:
-            # Timeout → Reset to Slow Start
-            self.ssthresh = max(self.cwnd // 2, 2)
-            self.cwnd = 1
-            self.dup_ack_count = 0
-            self.in_slow_start = True
-            self.in_fast_recovery = False
+    @classmethod
+    def make_kernel(cls):
+        return kernels.reno(cls.CWND_MAX)
 
-        elif loss_event:
-            # Triple Duplicate ACKs → Fast Recovery
-            self.ssthresh = max(self.cwnd // 2, 2)
-            self.cwnd = self.ssthresh  # Enter Fast Recovery
-            self.in_slow_start = False
-            self.in_fast_recovery = True
-            self.loss_event = True
+    def _record(self):
+        hystart = self.hystart
+        phase = SLOW_START if self.in_slow_start else FAST_RECOVERY if self.in_fast_recovery else AVOIDANCE
+        return (None, phase, self.cwnd, self.ssthresh, self.dup_ack_count, self.last_ack,
+                hystart.min_rtt if hystart is not None else None,
+                hystart.delay_threshold if hystart is not None else None)
 
-        elif self.in_slow_start:
-            # Slow Start: Exponential Growth
-            self.cwnd *= 2
-            if self.cwnd >= self.ssthresh:
-                self.in_slow_start = False  # Move to Congestion Avoidance
+    def _store(self, record):
+        branch, phase, self.cwnd, self.ssthresh, self.dup_ack_count, self.last_ack, min_rtt, _ = record
+        if self.hystart is not None:
+            self.hystart.min_rtt = min_rtt
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start, self.in_fast_recovery = PHASE_FLAGS[phase]
 
-        elif self.in_fast_recovery:
-            # Fast Recovery: Additive Increase (until new ACK)
-            self.cwnd += 1  # Temporary inflation during fast recovery
+    def update_cwnd(self, ack_time, loss_event=False, timeout=False, dup_ack=False, rtt=None):
+        """
+        Updates cwnd on an ACK (see `methods.kernels.reno`).
 
+        A `timeout` resets to slow start, a loss (or the third duplicate ACK with `dup_ack`) enters
+        fast recovery; with HyStart, `rtt` samples can also end the slow start.
+        """
+        if self.hystart is not None:
+            self._store(self.kernel(self._record(), ack_time, loss_event, rtt, timeout, dup_ack))
         else:
-            # Congestion Avoidance: Additive Increase
-            self.cwnd += 1  # Linear growth (1 MSS per RTT)
-
-        # Handle Duplicate ACKs
-        if dup_ack:
-            if ack_time == self.last_ack:
-                self.dup_ack_count += 1
-                if self.dup_ack_count == 3:
-                    self.update_cwnd(ack_time, loss_event=True)  # Enter Fast Recovery
-            else:
-                self.dup_ack_count = 0  # Reset if a new ACK arrives
-
-        # Enforce cwnd_max limit
-        self.cwnd = min(self.cwnd, self.CWND_MAX)
+            # `_record()` and `_store()` inlined: the common case, once per ACK
+            phase = SLOW_START if self.in_slow_start else FAST_RECOVERY if self.in_fast_recovery else AVOIDANCE
+            branch, phase, self.cwnd, self.ssthresh, self.dup_ack_count, self.last_ack, _, _ = self.kernel(
+                (None, phase, self.cwnd, self.ssthresh, self.dup_ack_count, self.last_ack, None, None),
+                ack_time, loss_event, None, timeout, dup_ack)
+            self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+            self.in_slow_start, self.in_fast_recovery = PHASE_FLAGS[phase]
 
-        # Update last ACK time
-        self.last_ack = ack_time
+        if self.hooks is not None:
+            self.hooks.after_ack(self, ack_time)
 
     def __repr__(self):
         return f"TCPReno(cwnd={self.cwnd}, ssthresh={self.ssthresh}, slow_start={self.in_slow_start})"
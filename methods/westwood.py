@@ -1,19 +1,20 @@
 """
+TCP Westwood+: after a loss, ssthresh is set to the estimated bandwidth-delay product instead of cwnd / 2.
 
->>>>>>>>>>>>>>>>>> STILL NEEDS TESTING <<<<<<<<<<<<<<
+The bandwidth is sampled once per RTT, from the segments acknowledged in the interval
+(`methods.filters.BandwidthSampler`), and ssthresh = bandwidth * minimum RTT, so the window
+after a loss is what the path carried before it. It needs RTT samples (a trace with an `rtt` column).
 
 For example,
 python simulation.py --use-westwood --seed 2 --num-acks 10000 --plot-ssthresh
 
-keeps in the maximum value of ssthresh almost in all cases
-
-problem in `self.bw_est` or need to adjust `self.cwnd`
-
-ref. https://en.wikipedia.org/wiki/TCP_Westwood
+ref. https://en.wikipedia.org/wiki/TCP_Westwood_plus
 """
 
-import logging
-import numpy as np
+from methods import kernels
+from methods.base import CongestionControl, register
+from methods.filters import BandwidthSampler, MIN_SAMPLE_INTERVAL
+from methods.kernels import AVOIDANCE, EVENT_FLAGS, SLOW_START
 
 # ------------------------------------
 #
@@ -23,44 +24,53 @@ import numpy as np
 INITIAL_CWND = 1  # Initial congestion window
 INITIAL_SSTHRESH = 80  # Arbitrary large value for testing, up to CWND_MAX
 
-class TCPWestwood:
+@register('westwood', 'TCP Westwood')
+class TCPWestwood(CongestionControl):
+
+    __slots__ = ('bandwidth', 'min_rtt')
+
+    NEEDS_RTT = True
 
     def __init__(self, cwnd=INITIAL_CWND, ssthresh=INITIAL_SSTHRESH):
-        self.cwnd = cwnd
-        self.bw_est = 0  # Estimated bandwidth
-        self.ssthresh = ssthresh
-        self.last_ack_time = None  # Last received ACK timestamp
-        self.CWND_MAX = 100  # Maximum congestion window (simulating bandwidth limit)
-        self.loss_event = False
-        logging.debug(f"WESTWOOD initialized with cwnd={cwnd}, ssthresh={ssthresh}")
-
-    def update_cwnd(self, ack_time, loss_event=False):
-        self.loss_event = False
-
-        if self.last_ack_time is not None and ack_time > self.last_ack_time:
-            rtt_sample = ack_time - self.last_ack_time  # Estimate RTT
-            if rtt_sample > 0:
-                sample_bw = self.cwnd / rtt_sample  # Bandwidth sample
-                self.bw_est = 0.9 * self.bw_est + 0.1 * sample_bw  # EWMA filter
-
-        # Store last ACK info
-        self.last_ack_time = ack_time
-
-        if loss_event:
-            self.ssthresh = min(max(int(self.bw_est * self.ssthresh), 2), self.CWND_MAX)
-            print(self.ssthresh, self.cwnd)
-            self.cwnd = self.ssthresh  # Enter congestion avoidance
-            self.loss_event = True
-
-        else:
-            if self.cwnd < self.ssthresh:
-                self.cwnd += 1  # Exponential growth (Slow Start)
-            else:
-                # (Congestion Avoidance)
-                self.cwnd += 1.0 / self.cwnd  # Normal Congestion Avoidance (Linear Growth)
-
-        # Enforce cwnd_max limit
-        self.cwnd = min(self.cwnd, self.CWND_MAX)
+        super().__init__(cwnd, ssthresh)  # Westwood has no retransmission timeout: rto_event stays False
+        self.bandwidth = BandwidthSampler()  # Estimated bandwidth (segments/s)
+        self.min_rtt = float("inf")  # Minimum RTT
+
+    @property
+    def bw_est(self):
+        return self.bandwidth.bw_est
+
+    @classmethod
+    def make_kernel(cls):
+        return kernels.westwood(cls.CWND_MAX, MIN_SAMPLE_INTERVAL)
+
+    def _record(self):
+        bandwidth = self.bandwidth
+        return (None, SLOW_START if self.in_slow_start else AVOIDANCE, self.cwnd, self.ssthresh,
+                bandwidth.bw_est, bandwidth.acked, bandwidth.sample_start, bandwidth.alpha, self.min_rtt)
+
+    def _store(self, record):
+        bandwidth = self.bandwidth
+        (branch, phase, self.cwnd, self.ssthresh, bandwidth.bw_est, bandwidth.acked, bandwidth.sample_start, _,
+         self.min_rtt) = record
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
+
+    def update_cwnd(self, ack_time, loss_event=False, rtt=None):
+        """
+        Updates the bandwidth estimate with the `rtt` sample, then cwnd (see `methods.kernels.westwood`):
+        after a loss, ssthresh = cwnd = bandwidth * minimum RTT.
+        """
+        bandwidth = self.bandwidth
+        (branch, phase, self.cwnd, self.ssthresh, bandwidth.bw_est, bandwidth.acked, bandwidth.sample_start, _,
+         self.min_rtt) = self.kernel(
+            (None, None, self.cwnd, self.ssthresh, bandwidth.bw_est, bandwidth.acked, bandwidth.sample_start,
+             bandwidth.alpha, self.min_rtt), ack_time, loss_event, rtt)
+        self.loss_event, self.rto_event = EVENT_FLAGS[branch]
+        self.in_slow_start = phase == SLOW_START
+
+        if self.hooks is not None:
+            self.hooks.after_ack(self, ack_time)
 
     def __repr__(self):
         return f"TCPWestwood(cwnd={self.cwnd}, bw_est={self.bw_est:.2f})"
@@ -0,0 +1,359 @@
+"""
+Discrete-event simulation of TCP flows sharing one bottleneck link.
+
+Unlike `simulation.generate_ack_trace`, losses and ACK times are not drawn at random: each flow sends
+as many packets as its congestion window allows, the packets go through the FIFO queue of the
+bottleneck link, and a packet is lost when the queue drops it (drop-tail or RED).
+Any mix of the congestion control classes in `methods/` drives the flows, through `update_cwnd`.
+
+Model:
+- the link serves `capacity` packets/s and holds up to `buffer_size` packets (including the one in service);
+- `prop_delay` is the one-way propagation delay: an ACK reaches the sender 2 * `prop_delay` after
+  its packet leaves the queue;
+- a dropped packet is detected (duplicate ACKs) when the packets queued behind it are acknowledged;
+  the window is reduced at most once per window of data, like NewReno/SACK recovery;
+- a flow left with nothing in flight (its whole window was dropped) has no ACKs to clock it: it retransmits
+  one packet when its retransmission timer expires, `RTO_INITIAL` seconds later, doubling the timer on each
+  consecutive timeout (up to `RTO_MAX`) until a packet is acknowledged, like RFC 6298; the timer is
+  randomized (`RTO_JITTER`), else the retransmissions keep landing right after the ACKs that refill the queue;
+- the flows start at random times within `start_jitter` (one RTT by default) of their start times, so that
+  flows started together do not stay in lockstep.
+
+The events are tuples (time, sequence, code, sent) in a binary heap (`heapq`, O(log n) per event), where `code`
+packs the event kind, the flow and the packet number in one int, and `sent` is the send time of the packet:
+the algorithms that take RTT samples (`uses_rtt`, e.g. HyStart) get `rtt=now - sent` with each ACK,
+so they see the queueing delay of the bottleneck. Since the departure time of a packet
+is known when it is queued (FIFO, constant service time), the link needs no events of its own.
+
+Example:
+python netsim.py --algorithms aimd cubic --flows 20 --capacity 2000 --buffer 200 --duration 60 --output netsim.png
+"""
+import argparse
+import heapq
+import itertools
+import math
+from collections import deque
+
+import numpy as np
+
+from methods.base import available_algorithms, get_algorithm
+
+
+# ------------------------------------
+#
+# Constants of the network
+#
+# ------------------------------------
+CAPACITY = 1000.0  # Bottleneck capacity (packets/s)
+BUFFER_SIZE = 100  # Bottleneck buffer (packets)
+PROP_DELAY = 0.05  # One-way propagation delay (s)
+DISCIPLINES = ('droptail', 'red')
+RTO_INITIAL = 1.0  # Retransmission timeout of a flow with nothing in flight (s), RFC 6298
+RTO_MAX = 60.0  # Upper bound of the exponential backoff of the retransmission timeout (s)
+RTO_JITTER = 0.5  # The timer expires after a random 1 to 1 + RTO_JITTER times the timeout
+
+# RED (Floyd & Jacobson, 1993)
+RED_WEIGHT = 0.002  # EWMA weight of the average queue
+RED_MAX_P = 0.1  # Drop probability at the maximum threshold
+
+# Event kinds (2 low bits of the event code)
+START, ACK, LOSS, TIMEOUT = 0, 1, 2, 3
+KIND_BITS = 2
+FLOW_BITS = 32  # Up to 2**32 flows
+
+RECORD_CHUNK = 1 << 16  # Rows of the record buffer allocated at a time
+
+# One row per event processed by a flow
+NETSIM_DTYPE = np.dtype([
+    ('flow', np.int32),  # flow index
+    ('time', np.float64),  # time of the event
+    ('cwnd', np.float64),  # cwnd after the event
+    ('loss', np.bool_),  # loss signaled to the congestion control
+    ('queue', np.int32),  # bottleneck queue length
+])
+
+
+class BottleneckLink:
+    """
+    FIFO bottleneck link with a drop-tail or RED queue.
+
+    Parameters:
+    - `capacity`: Service rate, in packets/s.
+    - `buffer_size`: Maximum number of packets in the link (queued or in service).
+    - `prop_delay`: One-way propagation delay, in seconds.
+    - `discipline`: 'droptail' or 'red'.
+    - `red_min`, `red_max`: RED thresholds of the average queue (default: 1/4 and 3/4 of the buffer).
+    - `seed`: Seed of the RED drop decisions.
+    """
+
+    def __init__(self, capacity=CAPACITY, buffer_size=BUFFER_SIZE, prop_delay=PROP_DELAY, discipline='droptail',
+                 red_min=None, red_max=None, red_max_p=RED_MAX_P, red_weight=RED_WEIGHT, seed=None):
+        if discipline not in DISCIPLINES:
+            raise ValueError(f"Unknown queue discipline: {discipline}")
+        self.capacity = capacity
+        self.service_time = 1.0 / capacity
+        self.buffer_size = buffer_size
+        self.prop_delay = prop_delay
+        self.discipline = discipline
+        self.red_min = buffer_size / 4 if red_min is None else red_min
+        self.red_max = 3 * buffer_size / 4 if red_max is None else red_max
+        self.red_max_p = red_max_p
+        self.red_weight = red_weight
+        self.rng = np.random.default_rng(seed)
+
+        self.departures = deque()  # Departure times of the packets in the link, in order
+        self.last_departure = 0.0
+        self.avg_queue = 0.0  # RED average queue
+        self.num_drops = 0
+
+    def queue_length(self, now):
+        """Number of packets in the link at `now`."""
+        departures = self.departures
+        while departures and departures[0] <= now:
+            departures.popleft()
+        return len(departures)
+
+    def enqueue(self, now):
+        """
+        Offers a packet to the link at `now`.
+
+        Returns:
+        - The time the packet leaves the link, or None if it was dropped.
+        """
+        queue = self.queue_length(now)
+        if self.discipline == 'red' and self._red_drop(queue):
+            self.num_drops += 1
+            return None
+        if queue >= self.buffer_size:
+            self.num_drops += 1
+            return None
+        self.last_departure = max(now, self.last_departure) + self.service_time
+        self.departures.append(self.last_departure)
+        return self.last_departure
+
+    def _red_drop(self, queue):
+        self.avg_queue += self.red_weight * (queue - self.avg_queue)
+        if self.avg_queue < self.red_min:
+            return False
+        if self.avg_queue >= self.red_max:
+            return True
+        p = self.red_max_p * (self.avg_queue - self.red_min) / (self.red_max - self.red_min)
+        return self.rng.random() < p
+
+
+class _Recorder:
+    """Appends `NETSIM_DTYPE` rows to fixed-size chunks (no per-event Python objects are kept)."""
+
+    def __init__(self):
+        self.chunks = []
+        self.buffer = np.empty(RECORD_CHUNK, dtype=NETSIM_DTYPE)
+        self.size = 0
+
+    def append(self, row):
+        if self.size == RECORD_CHUNK:
+            self.chunks.append(self.buffer)
+            self.buffer = np.empty(RECORD_CHUNK, dtype=NETSIM_DTYPE)
+            self.size = 0
+        self.buffer[self.size] = row
+        self.size += 1
+
+    def result(self):
+        return np.concatenate(self.chunks + [self.buffer[:self.size]])
+
+
+def simulate_network(controllers, link, duration, start_times=None, max_events=None, record=True,
+                     start_jitter=None, seed=None):
+    """
+    Runs the flows driven by `controllers` through `link` until `duration` seconds.
+
+    Parameters:
+    - `controllers`: One congestion control object per flow (e.g., `TCPCubic()`), in any mix.
+    - `link`: `BottleneckLink` shared by all the flows.
+    - `duration`: Simulated time, in seconds.
+    - `start_times`: Start time of each flow (default: all at 0).
+    - `max_events`: Stops after this number of events (default: no limit).
+    - `record`: Keeps one `NETSIM_DTYPE` row per event; with False only the per-flow counters are kept.
+    - `start_jitter`: Each flow starts at a random time up to this many seconds after its start time
+      (default: one RTT, 2 * `link.prop_delay`; 0 for the exact start times).
+    - `seed`: Seed of the start jitter and of the retransmission timers.
+
+    Returns:
+    - `records`: Structured array with one row per ACK or loss event (empty if `record` is False).
+    - `flows`: Dict of per-flow arrays: `delivered` and `lost` packets, and `throughput` (packets/s).
+    """
+    num_flows = len(controllers)
+    if start_times is None:
+        start_times = [0.0] * num_flows
+    rtt = 2 * link.prop_delay
+    if start_jitter is None:
+        start_jitter = rtt
+    rng = np.random.default_rng(seed)
+    start_times = (np.asarray(start_times, dtype=np.float64) + rng.uniform(0, start_jitter, size=num_flows)).tolist()
+
+    inflight = [0] * num_flows
+    next_seq = [0] * num_flows
+    recover_seq = [0] * num_flows  # Losses of packets sent before this one were already signaled
+    delivered = [0] * num_flows
+    lost = [0] * num_flows
+    rto = [RTO_INITIAL] * num_flows  # Retransmission timeout, doubled on each consecutive timeout
+
+    counter = itertools.count()
+    events = [(t, next(counter), (f << KIND_BITS) | START, t) for f, t in enumerate(start_times)]
+    heapq.heapify(events)
+    recorder = _Recorder() if record else None
+    flow_mask = (1 << FLOW_BITS) - 1
+    uses_rtt = [tcp.uses_rtt for tcp in controllers]
+
+    def send(f, now, window=None):
+        # fill the window: every packet goes through the link now
+        if window is None:
+            window = max(int(controllers[f].cwnd), 1)
+        while inflight[f] < window:
+            seq = next_seq[f]
+            next_seq[f] = seq + 1
+            inflight[f] += 1
+            departure = link.enqueue(now)
+            if departure is None:
+                # detected when the packets queued behind it are acknowledged
+                time, kind = max(now, link.last_departure) + rtt, LOSS
+            else:
+                time, kind = departure + rtt, ACK
+            heapq.heappush(events, (time, next(counter), (((seq << FLOW_BITS) | f) << KIND_BITS) | kind, now))
+
+    def wait_timeout(f, now):
+        # nothing in flight, so no ACK will clock the flow: retransmit when its timer expires
+        timeout = rto[f] * (1 + RTO_JITTER * rng.random())
+        heapq.heappush(events, (now + timeout, next(counter), (f << KIND_BITS) | TIMEOUT, now))
+
+    num_events = 0
+    while events and (max_events is None or num_events < max_events):
+        now, _, code, sent = heapq.heappop(events)
+        if now > duration:
+            break
+        num_events += 1
+        kind = code & ((1 << KIND_BITS) - 1)
+        code >>= KIND_BITS
+        f, seq = code & flow_mask, code >> FLOW_BITS
+        tcp = controllers[f]
+
+        if kind == ACK:
+            inflight[f] -= 1
+            delivered[f] += 1
+            rto[f] = RTO_INITIAL
+            if uses_rtt[f]:
+                tcp.update_cwnd(now, loss_event=False, rtt=now - sent)
+            else:
+                tcp.update_cwnd(now, loss_event=False)
+            loss = False
+        elif kind == LOSS:
+            inflight[f] -= 1
+            lost[f] += 1
+            loss = seq >= recover_seq[f]
+            if not loss:
+                # same loss episode: the window was already reduced
+                if inflight[f]:
+                    send(f, now)
+                else:
+                    wait_timeout(f, now)
+                continue
+            tcp.update_cwnd(now, loss_event=True)
+            recover_seq[f] = next_seq[f]
+        elif kind == TIMEOUT:
+            # retransmission timeout: one packet, and back off until it is acknowledged
+            rto[f] = min(2 * rto[f], RTO_MAX)
+            send(f, now, window=1)
+            continue
+        else:
+            loss = False
+
+        if recorder is not None:
+            recorder.append((f, now, tcp.cwnd, loss, link.queue_length(now)))
+        if kind == LOSS and not inflight[f]:
+            wait_timeout(f, now)
+        else:
+            send(f, now)
+
+    elapsed = np.maximum(min(duration, now) - np.asarray(start_times), math.ulp(1.0)) \
+        if num_events else np.ones(num_flows)
+    flows = {
+        'delivered': np.asarray(delivered),
+        'lost': np.asarray(lost),
+        'throughput': np.asarray(delivered) / elapsed,
+    }
+    records = recorder.result() if recorder is not None else np.empty(0, dtype=NETSIM_DTYPE)
+    return records, flows
+
+
+def jain_fairness(x):
+    """Jain's fairness index of the allocations `x`: 1 when all are equal, 1/n when one flow takes all."""
+    x = np.asarray(x, dtype=np.float64)
+    return x.sum() ** 2 / (len(x) * (x * x).sum()) if len(x) and x.any() else math.nan
+
+
+def plot_flows(records, names, title, output=None, max_flows=10):
+    """Plots cwnd over time of the first `max_flows` flows (decimated to the figure width)."""
+    import matplotlib
+    if output is not None:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from decimate import decimate
+
+    fig = plt.figure(figsize=(10, 5))
+    num_points = 2 * int(fig.get_figwidth() * fig.dpi)
+    for f, name in enumerate(names[:max_flows]):
+        rows = records[records['flow'] == f]
+        plt.plot(*decimate(rows['time'], rows['cwnd'], num_points), label=f"{f}: {name}")
+    plt.ylabel("Congestion Window (cwnd)")
+    plt.xlabel("Time (s)")
+    plt.title(title)
+    plt.legend(loc=0)
+    plt.grid()
+    plt.tight_layout()
+    if output is not None:
+        plt.savefig(output)
+        plt.close()
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TCP flows sharing a bottleneck link")
+
+    parser.add_argument('--algorithms', nargs='+', default=['aimd'],
+                        help="congestion control of the flows, assigned round-robin: "
+                             "{} or 'module:Class'".format(', '.join(available_algorithms())))
+    parser.add_argument('--flows', type=int, default=10, help="number of flows")
+    parser.add_argument('--capacity', type=float, default=CAPACITY, help="bottleneck capacity (packets/s)")
+    parser.add_argument('--buffer', type=int, default=BUFFER_SIZE, help="bottleneck buffer (packets)")
+    parser.add_argument('--delay', type=float, default=PROP_DELAY, help="one-way propagation delay (s)")
+    parser.add_argument('--discipline', choices=DISCIPLINES, default='droptail')
+    parser.add_argument('--duration', type=float, default=60.0, help="simulated time (s)")
+    parser.add_argument('--stagger', type=float, default=0.0, help="delay between the start of two flows (s)")
+    parser.add_argument('--start-jitter', type=float, default=None,
+                        help="random delay added to the start of each flow, up to this value "
+                             "(s, default: one RTT; 0 for none)")
+    parser.add_argument('--seed', type=int, default=None)
+
+    parser.add_argument('--no-plot', action='store_true', help="only print the per-flow summary")
+    parser.add_argument('--output', default=None, help="render the plot to a PNG/SVG file instead of showing it")
+
+    args = parser.parse_args()
+
+    names = [args.algorithms[f % len(args.algorithms)] for f in range(args.flows)]
+    controllers = [get_algorithm(name)() for name in names]
+    link = BottleneckLink(capacity=args.capacity, buffer_size=args.buffer, prop_delay=args.delay,
+                          discipline=args.discipline, seed=args.seed)
+    start_times = [f * args.stagger for f in range(args.flows)]
+
+    records, flows = simulate_network(controllers, link, args.duration, start_times=start_times,
+                                      record=not args.no_plot, start_jitter=args.start_jitter, seed=args.seed)
+
+    print("{:>5s} {:10s} {:>10s} {:>8s} {:>12s}".format('flow', 'algorithm', 'delivered', 'lost', 'throughput'))
+    for f, name in enumerate(names):
+        print("{:5d} {:10s} {:10d} {:8d} {:12.2f}".format(
+            f, name, flows['delivered'][f], flows['lost'][f], flows['throughput'][f]))
+    print("link utilization: {:.3f}  drops: {}  fairness: {:.3f}".format(
+        flows['throughput'].sum() / args.capacity, link.num_drops, jain_fairness(flows['throughput'])))
+
+    if not args.no_plot:
+        plot_flows(records, names, f"{args.flows} flows, {args.discipline} bottleneck", output=args.output)
@@ -0,0 +1,120 @@
+"""
+Chunked, parallel generation of very large ACK traces.
+
+The trace is split in shards of `shard_size` ACKs. Each shard gets its own random stream,
+spawned from one `numpy.random.SeedSequence`, so the shards are independent and the whole trace
+is reproducible for a given seed (and shard size), whatever the number of workers.
+The link saturation only depends on the global ACK number, so each shard knows its own state.
+
+The generation runs in two passes over a process pool:
+1. each worker generates a shard with times relative to the start of the shard and writes it to disk;
+2. the shard durations are accumulated, and each worker shifts the times of one shard by the
+   duration of all the shards before it (carried-over offset), in place.
+The output is a directory that `tracefile.load_trace` (and `--trace`) replays as one logical trace.
+
+Example:
+python sharding.py --num-acks 1000000000 --shard-size 10000000 --seed 1 --workers 8 --output acks/
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation import generate_ack_trace, MAX_LOSS_PROB
+from tracefile import load_trace, save_trace, save_manifest
+
+
+SHARD_SIZE = 1 << 22  # Default number of ACKs per shard
+SHIFT_CHUNK = 1 << 20  # Number of times shifted at a time in the second pass
+
+
+def _shard_file(index):
+    return f"shard-{index:05d}.trace"
+
+
+def _generate_shard(args):
+    """First pass: generates one shard (times relative to its start) and returns its duration."""
+    path, num_acks, first_ack, seed_seq, params = args
+    trace = generate_ack_trace(num_acks=num_acks, seed=seed_seq, first_ack=first_ack, **params)
+    save_trace(path, trace)
+    return float(trace['time'][-1]) if num_acks else 0.0
+
+
+def _shift_shard(args):
+    """Second pass: adds the time offset carried over from the previous shards, in place."""
+    path, offset = args
+    shard = load_trace(path)
+    if offset == 0 or len(shard) == 0:
+        return
+    times = np.memmap(path, dtype=shard['time'].dtype, mode='r+', offset=shard['time'].offset, shape=(len(shard),))
+    for start in range(0, len(times), SHIFT_CHUNK):
+        times[start:start + SHIFT_CHUNK] += offset
+    times.flush()
+
+
+def generate_sharded_trace(directory, num_acks, shard_size=SHARD_SIZE, base_interval=0.1, loss_prob=0.1, jitter=0.02,
+                           saturation_event=80, base_rtt=None, seed=None, workers=None):
+    """
+    Generates a trace of `num_acks` ACKs as shards on disk (see `simulation.generate_ack_trace`).
+
+    Parameters:
+    - `directory`: Output directory (created if needed).
+    - `num_acks`: Number of ACKs to generate.
+    - `shard_size`: Number of ACKs per shard (the memory needed by a worker is proportional to it).
+    - `base_interval`, `loss_prob`, `jitter`, `saturation_event`, `base_rtt`: See `simulation.generate_ack_trace`.
+    - `seed`: Optional seed of the `SeedSequence` from which the shard streams are spawned.
+    - `workers`: Number of worker processes (default: number of CPUs). With `workers=1` it runs in this process.
+
+    Returns:
+    - The sharded trace, mapped with `tracefile.load_trace`.
+    """
+    os.makedirs(directory, exist_ok=True)
+    num_shards = max(-(-num_acks // shard_size), 1)
+    seed_seqs = np.random.SeedSequence(seed).spawn(num_shards)
+    params = dict(base_interval=base_interval, loss_prob=min(loss_prob, MAX_LOSS_PROB), jitter=jitter,
+                  saturation_event=saturation_event, base_rtt=base_rtt)
+
+    files = [_shard_file(i) for i in range(num_shards)]
+    paths = [os.path.join(directory, name) for name in files]
+    tasks = [(paths[i], min(shard_size, num_acks - i * shard_size), i * shard_size + 1, seed_seqs[i], params)
+             for i in range(num_shards)]
+
+    if workers == 1:
+        durations = [_generate_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            durations = list(executor.map(_generate_shard, tasks))
+
+    # each shard starts where the previous one ended
+    offsets = np.concatenate(([0.0], np.cumsum(durations[:-1])))
+    if workers == 1:
+        for task in zip(paths, offsets.tolist()):
+            _shift_shard(task)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_shift_shard, zip(paths, offsets.tolist())))
+
+    save_manifest(directory, files, num_acks=num_acks, shard_size=shard_size, seed=seed, **params)
+    return load_trace(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates a large ACK trace as shards on disk")
+
+    parser.add_argument('--output', required=True, help="output directory")
+    parser.add_argument('--num-acks', type=int, required=True, help='Number of ACKs to generate')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Number of ACKs per shard')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--loss-prob', type=float, default=0.01, help='Probability to loose an ACK')
+    parser.add_argument('--base-rtt', type=float, default=None,
+                        help="add an RTT column (seconds) for the algorithms that need RTT samples (e.g., HyStart)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+
+    args = parser.parse_args()
+
+    assert 0 < args.loss_prob <= 1, "Loss probability must be between 0 and 1"
+
+    trace = generate_sharded_trace(args.output, args.num_acks, shard_size=args.shard_size, loss_prob=args.loss_prob,
+                                   base_rtt=args.base_rtt, seed=args.seed, workers=args.workers)
+    print(trace)
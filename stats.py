@@ -0,0 +1,137 @@
+"""
+Streaming statistics of a simulation, in O(1) memory.
+
+`SummaryStats` is updated once per ACK from the state of the congestion control object
+(`cwnd`, `loss_event`, `rto_event`, `in_slow_start` and `in_fast_recovery`) and never keeps the per-ACK series.
+"""
+import math
+
+
+PERCENTILES = (5, 25, 50, 75, 95, 99)
+SKETCH_BINS = 1000  # Number of bins of the cwnd histogram (percentile sketch)
+
+PHASES = ('slow_start', 'avoidance', 'fast_recovery')
+
+
+class RunningStats:
+    """Mean and variance of a stream of values (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squares of differences from the mean
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / self.count if self.count > 0 else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class HistogramSketch:
+    """
+    Fixed-size histogram of the values in [lo, hi], to estimate percentiles.
+
+    Values out of the range fall in the first or last bin.
+    The estimates are interpolated inside a bin, so the error is below (hi - lo) / bins.
+    """
+
+    def __init__(self, lo=0.0, hi=100.0, bins=SKETCH_BINS):
+        self.lo = lo
+        self.hi = hi
+        self.bins = bins
+        self.scale = bins / (hi - lo)
+        self.counts = [0] * bins
+        self.count = 0
+
+    def add(self, x):
+        i = int((x - self.lo) * self.scale)
+        self.counts[min(max(i, 0), self.bins - 1)] += 1
+        self.count += 1
+
+    def percentile(self, p):
+        """Estimates the `p`-th percentile (0 <= p <= 100) of the values added so far."""
+        if self.count == 0:
+            return math.nan
+        target = p / 100 * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            if c and cumulative + c >= target:
+                return self.lo + (i + (target - cumulative) / c) / self.scale
+            cumulative += c
+        return self.hi
+
+
+class SummaryStats:
+    """
+    Summary of a simulation, updated once per ACK.
+
+    - mean/variance of cwnd (per ACK);
+    - average cwnd weighted by time (throughput proxy): each window holds until the next ACK;
+    - number of loss and RTO events;
+    - time spent in slow start, congestion avoidance and fast recovery;
+    - percentiles of cwnd, from a `HistogramSketch`.
+    """
+
+    def __init__(self, cwnd_max=100, bins=SKETCH_BINS):
+        self.cwnd = RunningStats()
+        self.sketch = HistogramSketch(0, cwnd_max, bins)
+        self.num_losses = 0
+        self.num_rtos = 0
+        self.phase_time = dict.fromkeys(PHASES, 0.0)
+        self.weighted_cwnd = 0.0  # Integral of cwnd over time
+        self.first_time = None
+        self.last_time = None
+        self.last_cwnd = None
+        self.last_phase = None
+
+    def update(self, ack_time, tcp):
+        """Adds the state of `tcp` right after it processed the ACK received at `ack_time`."""
+        if self.last_time is None:
+            self.first_time = ack_time
+        else:
+            # the previous window and phase held from the last ACK until this one
+            dt = ack_time - self.last_time
+            self.weighted_cwnd += self.last_cwnd * dt
+            self.phase_time[self.last_phase] += dt
+
+        cwnd = tcp.cwnd
+        self.cwnd.update(cwnd)
+        self.sketch.add(cwnd)
+        self.num_losses += tcp.loss_event
+        self.num_rtos += getattr(tcp, 'rto_event', False)
+
+        if getattr(tcp, 'in_fast_recovery', False):
+            self.last_phase = 'fast_recovery'
+        elif getattr(tcp, 'in_slow_start', cwnd < tcp.ssthresh):
+            self.last_phase = 'slow_start'
+        else:
+            self.last_phase = 'avoidance'
+        self.last_time = ack_time
+        self.last_cwnd = cwnd
+
+    def result(self, percentiles=PERCENTILES):
+        """Returns the summary as a flat dict."""
+        duration = self.last_time - self.first_time if self.last_time is not None else 0.0
+        summary = {
+            'num_acks': self.cwnd.count,
+            'duration': duration,
+            'mean_cwnd': self.cwnd.mean if self.cwnd.count else math.nan,
+            'std_cwnd': self.cwnd.std,
+            'time_avg_cwnd': self.weighted_cwnd / duration if duration > 0 else self.last_cwnd,
+            'num_losses': self.num_losses,
+            'num_rtos': self.num_rtos,
+        }
+        for phase in PHASES:
+            summary[f'time_{phase}'] = self.phase_time[phase]
+        for p in percentiles:
+            summary[f'p{p}_cwnd'] = self.sketch.percentile(p)
+        return summary
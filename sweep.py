@@ -0,0 +1,108 @@
+"""
+Parameter sweep over algorithms, seeds, loss probabilities and initial windows.
+
+The grid (the cartesian product of all the options) is sharded across a `ProcessPoolExecutor`
+and the summary metrics of each run (see `simulation.simulate_summary`) are written to one CSV table,
+one row per run. With `--cache DIR`, the runs already done (same algorithm, parameters and trace)
+are read from the result cache (see `cache.py`) instead of simulated again.
+
+Example:
+python sweep.py --algorithms aimd cubic reno --seeds 1 2 3 --loss-probs 0.001 0.01 0.05 --workers 4 --output sweep.csv
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from cache import ResultCache, MAX_BYTES as CACHE_MAX_BYTES
+from methods.base import available_algorithms, get_algorithm
+from simulation import generate_ack_trace, simulate_summary, BASE_RTT, INITIAL_CWND, INITIAL_SSTHRESH
+
+
+GRID_KEYS = ('algorithm', 'seed', 'loss_prob', 'cwnd', 'ssthresh', 'num_acks')
+
+
+def make_grid(algorithms, seeds, loss_probs, cwnds, ssthreshs, num_acks):
+    """Returns the list of configurations (dicts with `GRID_KEYS`) of the cartesian product of the options."""
+    return [dict(zip(GRID_KEYS, values))
+            for values in itertools.product(algorithms, seeds, loss_probs, cwnds, ssthreshs, num_acks)]
+
+
+def run_config(config, cache=None):
+    """
+    Runs one configuration of the grid (through the `ResultCache` `cache`, if given)
+    and returns its row of the result table.
+    """
+    start = time.perf_counter()
+    tcp = get_algorithm(config['algorithm'])(cwnd=config['cwnd'], ssthresh=config['ssthresh'])
+    ack_array = generate_ack_trace(num_acks=config['num_acks'], seed=config['seed'], loss_prob=config['loss_prob'],
+                                   base_rtt=BASE_RTT if tcp.uses_rtt else None)
+    row = dict(config)
+    row.update(simulate_summary(tcp, ack_array, cache=cache))
+    row['elapsed'] = time.perf_counter() - start
+    return row
+
+
+def run_sweep(grid, workers=None, chunksize=1, cache=None):
+    """
+    Runs all the configurations of `grid` in a process pool.
+
+    Parameters:
+    - `grid`: List of configurations, see `make_grid`.
+    - `workers`: Number of worker processes (default: number of CPUs). With `workers=1` the sweep runs in this process.
+    - `chunksize`: Number of configurations sent to a worker at a time.
+    - `cache`: Optional `cache.ResultCache`, shared by the workers.
+
+    Returns:
+    - The list of result rows, in the same order as `grid`.
+    """
+    run = partial(run_config, cache=cache)
+    if workers == 1:
+        return [run(config) for config in grid]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, grid, chunksize=chunksize))
+
+
+def write_table(rows, output):
+    """Writes the result rows as CSV to the file `output` ('-' for stdout)."""
+    f = sys.stdout if output == '-' else open(output, 'w', newline='')
+    try:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else GRID_KEYS)
+        writer.writeheader()
+        writer.writerows(rows)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs a grid of simulations and writes one row per run")
+
+    parser.add_argument('--algorithms', nargs='+', default=available_algorithms(),
+                        help="registered names (see methods/base.py) or 'module:Class'")
+    parser.add_argument('--seeds', nargs='+', type=int, default=[1])
+    parser.add_argument('--loss-probs', nargs='+', type=float, default=[0.01])
+    parser.add_argument('--cwnd', nargs='+', type=int, default=[INITIAL_CWND])
+    parser.add_argument('--ssthresh', nargs='+', type=int, default=[INITIAL_SSTHRESH])
+    parser.add_argument('--num-acks', nargs='+', type=int, default=[10_000])
+
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--chunksize', type=int, default=1, help="configurations sent to a worker at a time")
+    parser.add_argument('--output', default='-', help="CSV file with the results (default: stdout)")
+    parser.add_argument('--cache', default=None, metavar='DIR',
+                        help="read the results of identical runs from (and store new ones in) this cache directory")
+    parser.add_argument('--cache-size', type=float, default=CACHE_MAX_BYTES / 2**20,
+                        help="size bound of the cache directory in MiB (least recently used results are evicted)")
+
+    args = parser.parse_args()
+
+    assert all(0 < p <= 1 for p in args.loss_probs), "Loss probability must be between 0 and 1"
+
+    grid = make_grid(args.algorithms, args.seeds, args.loss_probs, args.cwnd, args.ssthresh, args.num_acks)
+    cache = ResultCache(args.cache, max_bytes=int(args.cache_size * 2**20)) if args.cache is not None else None
+    rows = run_sweep(grid, workers=args.workers, chunksize=args.chunksize, cache=cache)
+    write_table(rows, args.output)
@@ -0,0 +1,118 @@
+"""Tests of the common base class and of the algorithm registry (`methods/base.py`)."""
+import logging
+
+import numpy as np
+import pytest
+
+from methods import base
+from methods.aimd import TCPAIMD
+from methods.base import CongestionControl, available_algorithms, get_algorithm, register
+from simulation import generate_ack_trace, simulate
+
+
+class ConstantWindow(CongestionControl):
+    """Algorithm without a kernel: a fixed window, halved for one ACK on a loss."""
+
+    __slots__ = ('acks',)
+
+    def __init__(self, cwnd=10, ssthresh=10):
+        super().__init__(cwnd, ssthresh)
+        self.acks = 0
+
+    def update_cwnd(self, ack_time, loss_event=False):
+        self.acks += 1
+        self.loss_event = loss_event
+        self.cwnd = self.ssthresh / 2 if loss_event else self.ssthresh
+        self.in_slow_start = False
+
+
+class CappedAIMD(TCPAIMD):
+    """Overrides `update_cwnd` without a new kernel."""
+
+    __slots__ = ()
+
+    def update_cwnd(self, ack_time, loss_event=False):
+        super().update_cwnd(ack_time, loss_event)
+        self.cwnd = min(self.cwnd, 8)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A copy of the registry, restored after the test."""
+    monkeypatch.setattr(base, 'REGISTRY', dict(base.REGISTRY))
+    return base.REGISTRY
+
+
+def test_builtin_algorithms_are_registered():
+    assert available_algorithms() == sorted(['aimd', 'cubic', 'hystart', 'reno', 'westwood'])
+    for name in available_algorithms():
+        cls = get_algorithm(name)
+        assert issubclass(cls, CongestionControl)
+        assert cls.NAME == name and cls.LABEL
+
+
+@pytest.mark.parametrize('name', available_algorithms())
+def test_objects_have_no_dict(name):
+    tcp = get_algorithm(name)()
+    assert not hasattr(tcp, '__dict__')
+    with pytest.raises(AttributeError):
+        tcp.typo = 1
+
+
+def test_module_class_names(registry):
+    assert get_algorithm('methods.aimd:TCPAIMD') is TCPAIMD
+    assert get_algorithm(f'{__name__}:ConstantWindow') is ConstantWindow
+    with pytest.raises(KeyError, match='available: aimd, cubic'):
+        get_algorithm('bbr')
+
+
+def test_register(registry):
+    register('constant', 'Constant window')(ConstantWindow)
+    assert get_algorithm('constant') is ConstantWindow
+    assert ConstantWindow.LABEL == 'Constant window'
+    register('constant')(ConstantWindow)  # the same class again
+    with pytest.raises(ValueError, match='already registered by ConstantWindow'):
+        register('constant')(CappedAIMD)
+
+
+def test_plugins_from_entry_points(registry, monkeypatch, caplog):
+    class EntryPoint:
+        def __init__(self, name, value, cls=None):
+            self.name, self.value, self.cls = name, value, cls
+
+        def load(self):
+            if self.cls is None:
+                raise ImportError("no module named 'broken'")
+            return self.cls
+
+    entry_points = [EntryPoint('constant', 'test_base:ConstantWindow', ConstantWindow),
+                    EntryPoint('broken', 'broken:Broken'), EntryPoint('aimd', 'other:AIMD', CappedAIMD)]
+    monkeypatch.setattr(base.metadata, 'entry_points', lambda group: entry_points)
+    monkeypatch.setattr(base, '_loaded', False)
+    with caplog.at_level(logging.WARNING):
+        assert available_algorithms() == ['aimd', 'constant', 'cubic', 'hystart', 'reno', 'westwood']
+    assert get_algorithm('constant') is ConstantWindow
+    assert get_algorithm('aimd') is TCPAIMD  # the built-in algorithms come first
+    assert "Cannot load algorithm 'broken'" in caplog.text
+
+
+def test_kernel_flags():
+    assert all(get_algorithm(name).kernel_only for name in available_algorithms())
+    assert ConstantWindow.kernel is None and not ConstantWindow.kernel_only
+    # the override runs per ACK, with the kernel of the parent class
+    assert CappedAIMD.kernel is not None and not CappedAIMD.kernel_only
+
+
+@pytest.mark.parametrize('cls', [ConstantWindow, CappedAIMD])
+def test_simulate_runs_update_cwnd_of_subclasses(cls):
+    trace = generate_ack_trace(num_acks=2000, seed=1, loss_prob=0.05)
+    tcp = cls()
+    _, cwnd, _, _ = simulate(tcp, trace)
+    expected = cls()
+    for ack_time, loss_event in zip(trace['time'].tolist(), trace['loss'].tolist()):
+        expected.update_cwnd(ack_time, loss_event)
+    assert cwnd[-1] == expected.cwnd
+    if cls is CappedAIMD:
+        assert np.max(cwnd) == 8
+    else:
+        assert tcp.acks == 2000
@@ -0,0 +1,78 @@
+"""Tests of the benchmark suite (`benchmark.py`): the cases, the measures and the regression check."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark import MEMORY_SLACK, compare, make_cases, measure, run_benchmarks
+from methods.base import available_algorithms
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _result(ns_per_ack, peak_bytes):
+    return {'num_acks': 1000, 'seconds': ns_per_ack * 1e-6, 'acks_per_sec': 1e9 / ns_per_ack,
+            'ns_per_ack': ns_per_ack, 'peak_bytes': peak_bytes}
+
+
+def test_cases_cover_every_algorithm():
+    cases = make_cases(sizes=[100], loss_probs=[0.1])
+    for name in available_algorithms():
+        assert f"update_cwnd/{name}/n=100/loss=0.1" in cases
+        assert f"simulate/{name}/n=100/loss=0.1" in cases
+    assert {num_acks for num_acks, _ in cases.values()} == {100}
+
+
+def test_measure():
+    r = measure(lambda: [0] * 100_000, 1000, repeat=2)
+    assert r['num_acks'] == 1000
+    assert r['ns_per_ack'] == pytest.approx(r['seconds'] / 1000 * 1e9)
+    assert r['peak_bytes'] >= 100_000 * 8  # the list of pointers
+
+
+def test_run_benchmarks_filters_the_cases():
+    results = run_benchmarks(make_cases(sizes=[100], loss_probs=[0.1]), repeat=1, pattern='simulate/aimd/')
+    assert list(results) == ['simulate/aimd/n=100/loss=0.1']
+
+
+@pytest.mark.parametrize('new, regressions', [
+    (_result(105, 10_000_000), []),
+    (_result(120, 10_000_000), [('ns_per_ack', 100, 120)]),
+    (_result(100, 12_000_000), [('peak_bytes', 10_000_000, 12_000_000)]),
+    (_result(120, 12_000_000), [('ns_per_ack', 100, 120), ('peak_bytes', 10_000_000, 12_000_000)]),
+])
+def test_compare_flags_regressions_over_the_threshold(new, regressions):
+    baseline = {'case': _result(100, 10_000_000)}
+    assert compare({'case': new}, baseline, threshold=0.1) == [('case', *r) for r in regressions]
+
+
+def test_compare_tolerates_small_memory_peaks_and_new_cases():
+    baseline = {'case': _result(100, 1000)}
+    results = {'case': _result(100, 1000 + MEMORY_SLACK), 'new case': _result(1000, 10**9)}
+    assert compare(results, baseline) == []
+
+
+def test_baseline_round_trip(tmp_path):
+    baseline = tmp_path / 'baseline.json'
+    command = [sys.executable, os.path.join(HERE, 'benchmark.py'), '--sizes', '100', '--loss-probs', '0.1',
+               '--repeat', '1', '--filter', 'generate_ack_trace']
+    subprocess.run(command + ['--save-baseline', str(baseline)], check=True, capture_output=True, cwd=HERE)
+    assert list(json.loads(baseline.read_text())['results']) == ['generate_ack_trace/n=100/loss=0.1']
+
+    # a large threshold: a second run is not a regression of the first
+    result = subprocess.run(command + ['--baseline', str(baseline), '--threshold', '100'],
+                            capture_output=True, text=True, cwd=HERE)
+    assert result.returncode == 0
+    assert 'no regression' in result.stdout
+
+    # a baseline 1000 times faster: exit status 1
+    saved = json.loads(baseline.read_text())
+    for r in saved['results'].values():
+        r['ns_per_ack'] /= 1000
+    baseline.write_text(json.dumps(saved))
+    result = subprocess.run(command + ['--baseline', str(baseline)], capture_output=True, text=True, cwd=HERE)
+    assert result.returncode == 1
+    assert result.stdout.startswith('REGRESSION generate_ack_trace/n=100/loss=0.1')
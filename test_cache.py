@@ -0,0 +1,125 @@
+"""Tests of the result cache (`cache.py`) and of its use by `simulate`, `simulate_summary` and the sweeps."""
+import os
+
+import numpy as np
+import pytest
+
+import cache as cache_module
+from cache import EVICT_TO, ResultCache, trace_digest
+from methods.cubic import TCPCubic
+from methods.events import EventCounter, attach
+from methods.reno import TCPReno
+from simulation import BASE_RTT, _ack_blocks, generate_ack_trace, simulate, simulate_summary
+from sweep import make_grid, run_sweep
+
+
+@pytest.fixture
+def trace():
+    return generate_ack_trace(num_acks=5000, seed=1, loss_prob=0.02, base_rtt=BASE_RTT)
+
+
+@pytest.mark.parametrize('cls', [TCPReno, lambda: TCPCubic(hystart=True)])
+def test_hit_returns_the_results_and_the_final_state(tmp_path, trace, cls):
+    cache = ResultCache(tmp_path)
+    expected_tcp = cls()
+    expected = simulate(expected_tcp, trace)
+
+    first = simulate(cls(), trace, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    tcp = cls()
+    second = simulate(tcp, trace, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    for a, b, c in zip(first, second, expected):
+        assert np.array_equal(a, c) and np.array_equal(b, c)
+    # the object is left as after a real run
+    assert tcp.snapshot() == expected_tcp.snapshot()
+
+    assert simulate_summary(cls(), trace, cache=cache) == simulate_summary(cls(), trace)
+    assert simulate_summary(cls(), trace, cache=cache) == simulate_summary(cls(), trace)
+    assert cache.hits == 2
+
+
+def test_key_depends_on_the_state_the_trace_and_the_kind(trace):
+    digest = trace_digest(_ack_blocks(trace, 1000))
+    keys = {
+        ResultCache.key(TCPReno(), digest, 'simulate'),
+        ResultCache.key(TCPReno(cwnd=2), digest, 'simulate'),
+        ResultCache.key(TCPReno(hystart=True), digest, 'simulate'),
+        ResultCache.key(TCPCubic(), digest, 'simulate'),
+        ResultCache.key(TCPReno(), digest, 'summary'),
+        ResultCache.key(TCPReno(), digest, 'summary', percentiles=(50,)),
+        ResultCache.key(TCPReno(), trace_digest(_ack_blocks(trace[:-1], 1000)), 'simulate'),
+    }
+    assert len(keys) == 7
+    # the digest does not depend on the block size
+    assert trace_digest(_ack_blocks(trace, 7)) == digest
+    assert trace_digest(_ack_blocks(trace, 7), rtt=True) != digest
+
+
+def test_source_changes_invalidate_the_results(tmp_path, trace, monkeypatch):
+    cache = ResultCache(tmp_path)
+    simulate(TCPReno(), trace, cache=cache)
+    monkeypatch.setitem(cache_module._source_hashes, TCPReno, 'edited')
+    simulate(TCPReno(), trace, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_runs_with_hooks_are_not_cached(tmp_path, trace):
+    cache = ResultCache(tmp_path)
+    for _ in range(2):
+        tcp = TCPReno()
+        counter = EventCounter()
+        attach(tcp, counter)
+        simulate(tcp, trace, cache=cache)
+        assert counter.counts  # the sinks saw the run
+    assert cache.entries() == [] and cache.hits == 0
+
+
+def test_corrupted_entries_are_misses(tmp_path, trace):
+    cache = ResultCache(tmp_path)
+    simulate(TCPReno(), trace, cache=cache)
+    (_, _, path), = cache.entries()
+    with open(path, 'wb') as f:
+        f.write(b'\x80\x05truncated')
+    assert np.array_equal(simulate(TCPReno(), trace, cache=cache)[1], simulate(TCPReno(), trace)[1])
+    assert cache.misses == 2
+
+
+def test_eviction_removes_the_least_recently_used_entries(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=10_000)
+    payload = bytes(1000)
+    for i in range(9):
+        cache.put(f'{i:02d}' * 32, payload)
+        os.utime(cache._path(f'{i:02d}' * 32), (i, i))
+    assert len(cache.entries()) == 9
+    assert cache.get('00' * 32) == payload  # used again: now the most recent
+
+    cache.put('09' * 32, payload)  # over the bound
+    remaining = {os.path.basename(path)[:2] for _, _, path in cache.entries()}
+    assert cache.size() <= EVICT_TO * cache.max_bytes
+    assert '00' in remaining and '09' in remaining
+    assert '01' not in remaining and '02' not in remaining
+
+
+def test_put_keeps_a_running_size(tmp_path, monkeypatch):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    scans = []
+    entries = ResultCache.entries
+    monkeypatch.setattr(ResultCache, 'entries', lambda self: scans.append(1) or entries(self))
+    for i in range(50):
+        cache.put(f'{i:02d}' * 32, bytes(100))
+    cache.put('00' * 32, bytes(200))  # replaces an entry
+    assert len(scans) == 1  # the first put only
+    assert cache._size == cache.size()
+    cache.clear()
+    assert cache._size == 0 and cache.entries() == []
+
+
+def test_sweep_with_a_cache(tmp_path):
+    grid = make_grid(['aimd', 'reno'], [1, 2], [0.01], [1], [64], [2000])
+    cache = ResultCache(tmp_path)
+    rows = run_sweep(grid, workers=2, cache=cache)
+    cached_rows = run_sweep(grid, workers=1, cache=cache)
+    assert cache.hits == len(grid)  # the workers filled the directory
+    assert [{k: v for k, v in row.items() if k != 'elapsed'} for row in cached_rows] == \
+        [{k: v for k, v in row.items() if k != 'elapsed'} for row in rows]
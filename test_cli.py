@@ -0,0 +1,57 @@
+"""Tests of the headless command line of `simulation.py` (run in a subprocess)."""
+import csv
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from methods.reno import TCPReno
+from simulation import generate_ack_trace, simulate
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ARGS = ['--use-reno', '--num-acks', '500', '--seed', '1', '--loss-prob', '0.05']
+
+
+def _run(*args, check=True):
+    return subprocess.run([sys.executable, os.path.join(HERE, 'simulation.py'), *args],
+                          capture_output=True, text=True, check=check, cwd=HERE)
+
+
+def test_no_plot_writes_csv_to_stdout():
+    result = _run(*ARGS, '--no-plot')
+    rows = list(csv.DictReader(io.StringIO(result.stdout)))
+    # the banner goes to stderr, so that stdout is only the table
+    assert result.stderr.startswith('TCP Reno')
+
+    _, cwnd, losses, _ = simulate(TCPReno(), generate_ack_trace(num_acks=500, seed=1, loss_prob=0.05))
+    assert len(rows) == 500
+    assert np.allclose([float(row['cwnd']) for row in rows], cwnd)
+    assert [int(row['loss']) for row in rows] == losses.tolist()
+
+
+def test_no_plot_does_not_import_matplotlib():
+    code = ("import runpy, sys\n"
+            f"sys.argv = ['simulation.py', {', '.join(map(repr, ARGS))}, '--no-plot', '--results', sys.argv[1]]\n"
+            "runpy.run_path('simulation.py', run_name='__main__')\n"
+            "assert 'matplotlib' not in sys.modules\n")
+    subprocess.run([sys.executable, '-c', code, os.devnull], check=True, cwd=HERE, capture_output=True)
+
+
+def test_results_file(tmp_path):
+    _run(*ARGS, '--no-plot', '--results', str(tmp_path / 'results.npz'))
+    results = np.load(tmp_path / 'results.npz')
+    assert sorted(results.files) == ['cwnd', 'loss', 'ssthresh', 'time']
+    assert len(results['cwnd']) == 500
+
+
+@pytest.mark.parametrize('extension, magic', [('png', b'\x89PNG'), ('svg', b'<?xml')])
+def test_output_renders_the_plot_to_a_file(tmp_path, extension, magic):
+    pytest.importorskip('matplotlib')
+    output = tmp_path / f'cwnd.{extension}'
+    result = _run(*ARGS, '--output', str(output), '--plot-ssthresh')
+    assert 'time,cwnd' not in result.stdout  # no CSV without --no-plot or --results
+    assert output.read_bytes().startswith(magic)
@@ -0,0 +1,75 @@
+"""Tests of the plot decimation (`decimate.py`)."""
+import numpy as np
+import pytest
+
+from decimate import decimate, lttb_indices, minmax_indices
+from methods.cubic import TCPCubic
+from simulation import generate_ack_trace, simulate
+
+
+@pytest.fixture(scope='module')
+def cwnd_series():
+    time_stamps, cwnd, _, _ = simulate(TCPCubic(), generate_ack_trace(num_acks=200_000, seed=1, loss_prob=0.01))
+    return np.asarray(time_stamps), np.asarray(cwnd)
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket(cwnd_series):
+    x, y = cwnd_series
+    num_buckets = 500
+    indices = minmax_indices(x, y, num_buckets)
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert len(indices) <= 2 * num_buckets + 2
+
+    kept = np.zeros(len(x), dtype=bool)
+    kept[indices] = True
+    edges = np.searchsorted(x, np.linspace(x[0], x[-1], num_buckets + 1)[1:-1])
+    for bucket, bucket_kept in zip(np.split(y, edges), np.split(kept, edges)):
+        if len(bucket):
+            assert bucket[bucket_kept].min() == bucket.min()
+            assert bucket[bucket_kept].max() == bucket.max()
+    assert y[indices].min() == y.min() and y[indices].max() == y.max()
+
+
+def test_minmax_buckets_by_time():
+    # a burst of 100k ACKs in the first second, then 1000 ACKs over 9 seconds
+    x = np.concatenate((np.linspace(0, 1, 100_000, endpoint=False), np.linspace(1, 10, 1000)))
+    y = np.random.default_rng(2).random(len(x))
+    indices = minmax_indices(x, y, 100)
+    # the sparse stretch gets its share of the buckets (90 of 100, 2 points each), not 1% of them
+    assert np.count_nonzero(x[indices] >= 1) >= 170
+    assert np.count_nonzero(x[indices] < 1) <= 2 * 10 + 1  # the 10 buckets of the burst
+
+
+def test_short_series_are_not_decimated():
+    x = np.arange(10.0)
+    assert np.array_equal(minmax_indices(x, x, 5), np.arange(10))
+    assert np.array_equal(lttb_indices(x, x, 10), np.arange(10))
+
+
+def test_lttb_keeps_a_spike():
+    x = np.arange(10_000, dtype=float)
+    y = np.zeros_like(x)
+    y[4321] = 1.0
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == len(x) - 1
+    assert 4321 in indices
+
+
+@pytest.mark.parametrize('method', ['minmax', 'lttb'])
+def test_decimate_bounds_the_number_of_points(cwnd_series, method):
+    x, y = cwnd_series
+    dx, dy = decimate(x, y, 1000, method=method)
+    assert len(dx) == len(dy) <= 1002
+    assert dy.max() == y.max()
+    assert np.array_equal(dy, y[np.searchsorted(x, dx)])
+
+
+def test_decimate_none_and_unknown_methods(cwnd_series):
+    x, y = cwnd_series
+    dx, dy = decimate(x, y, 1000, method='none')
+    assert dx is x and dy is y
+    with pytest.raises(ValueError, match='Unknown decimation method'):
+        decimate(x, y, 1000, method='random')
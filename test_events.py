@@ -0,0 +1,106 @@
+"""Tests of the event hooks (`methods/events.py`)."""
+import logging
+
+import numpy as np
+import pytest
+
+from methods.base import REGISTRY, available_algorithms
+from methods.events import (Event, EventCounter, EventLogger, EventRecorder, SamplingProfiler, TRANSITIONS, attach,
+                            detach, phase)
+from simulation import BASE_RTT, generate_ack_trace, simulate
+
+
+def _trace():
+    return generate_ack_trace(num_acks=5000, seed=1, loss_prob=0.02, base_rtt=BASE_RTT)
+
+
+def _expected_events(cls, trace):
+    """The events derived from the state flags after each `update_cwnd` call."""
+    tcp = cls()
+    events, previous = [], None
+    for ack_time, loss_event, rtt in zip(trace['time'].tolist(), trace['loss'].tolist(), trace['rtt'].tolist()):
+        tcp.update_cwnd(ack_time, loss_event, **({'rtt': rtt} if tcp.uses_rtt else {}))
+        if tcp.rto_event:
+            events.append((Event.RTO, ack_time))
+        elif tcp.loss_event:
+            events.append((Event.LOSS, ack_time))
+        if phase(tcp) is not previous:
+            previous = phase(tcp)
+            events.append((previous, ack_time))
+    return events
+
+
+@pytest.mark.parametrize('name', available_algorithms())
+def test_no_hooks_by_default(name):
+    tcp = REGISTRY[name]()
+    assert tcp.hooks is None
+    simulate(tcp, _trace())
+    assert tcp.hooks is None
+
+
+@pytest.mark.parametrize('name', available_algorithms())
+def test_hooks_emit_the_transitions(name):
+    cls, trace = REGISTRY[name], _trace()
+    tcp = cls()
+    recorder, counter = EventRecorder(), EventCounter()
+    attach(tcp, recorder, counter)
+    simulate(tcp, trace)
+
+    expected = _expected_events(cls, trace)
+    assert [(event, ack_time) for event, ack_time, _, _ in recorder.records] == expected
+    assert recorder.records[0][0] is Event.SLOW_START
+    assert counter.counts[Event.LOSS] + counter.counts[Event.RTO] > 0
+    assert sum(counter.counts.values()) == len(expected)
+    assert Event.ACK not in counter.counts
+
+
+@pytest.mark.parametrize('name', available_algorithms())
+def test_hooks_do_not_change_the_results(name):
+    cls, trace = REGISTRY[name], _trace()
+    tcp = cls()
+    attach(tcp, EventCounter(), SamplingProfiler(every=100))
+    for column, expected in zip(simulate(tcp, trace), simulate(cls(), trace)):
+        assert np.array_equal(column, expected)
+
+
+def test_ack_events_only_for_subscribers():
+    tcp = REGISTRY['aimd']()
+    transitions, acks = EventCounter(), EventCounter(events=(Event.ACK,))
+    attach(tcp, transitions, acks)
+    simulate(tcp, _trace())
+    assert acks.counts == {Event.ACK: 5000}
+    assert set(transitions.counts) <= TRANSITIONS
+
+
+def test_detach():
+    tcp = REGISTRY['reno']()
+    first, second = EventCounter(), EventCounter()
+    attach(tcp, first, second)
+    detach(tcp, first)
+    assert tcp.hooks is not None
+    simulate(tcp, _trace())
+    assert not first.counts and second.counts
+    detach(tcp, second)
+    assert tcp.hooks is None  # no sink left: back to the path without hooks
+
+
+def test_logger_formats_only_enabled_levels(caplog):
+    tcp = REGISTRY['cubic']()
+    attach(tcp, EventLogger(logging.getLogger('test.events')))
+    with caplog.at_level(logging.INFO, logger='test.events'):
+        simulate(tcp, _trace())
+    assert not caplog.records
+    with caplog.at_level(logging.DEBUG, logger='test.events'):
+        simulate(tcp, _trace())
+    assert caplog.records[0].getMessage().startswith('slow_start    TCPCubic cwnd=')
+
+
+def test_sampling_profiler():
+    tcp = REGISTRY['aimd']()
+    profiler = SamplingProfiler(every=100)
+    attach(tcp, profiler)
+    simulate(tcp, _trace())
+    summary = profiler.summary()
+    # every 100th ACK starts a sample, closed by the next ACK (the last one is still open)
+    assert sum(count for count, _, _ in summary.values()) == 5000 // 100 - 1
+    assert all(0 < mean <= peak for _, mean, peak in summary.values())
@@ -0,0 +1,276 @@
+"""
+Exactness of the fast paths: they must give bit-identical results to `update_cwnd` called once per ACK.
+
+- the transition kernels (`methods/kernels.py`) against `update_cwnd`, and `update_cwnd` against digests of
+  the classes written before the kernels;
+- `simulate` (the kernels run over whole blocks) against `update_cwnd` per ACK;
+- the batch engines (`methods/batch.py`) against the scalar classes;
+- `fastforward.simulate_fast_forward` against `simulate` (AIMD within its documented tolerance);
+- a resumed `simulate_checkpointed` against an uninterrupted run.
+
+The traces are seeded, with losses and gaps between ACKs longer than the RTO threshold.
+
+Run with:
+python -m pytest -q test_exactness.py
+"""
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+import simulation
+from fastforward import simulate_fast_forward
+from methods.aimd import TCPAIMD
+from methods.batch import BatchAIMD, BatchCubic, BatchReno, BatchWestwood, simulate_batch
+from methods.cubic import TCPCubic
+from methods.events import Event, attach
+from methods.hystart import TCPHyStart
+from methods.reno import TCPReno
+from methods.westwood import TCPWestwood
+
+
+NUM_ACKS = 3000
+RTO_GAP = 4.0  # Seconds added between two ACKs, above `RTO_THRESHOLD`
+RTO_GAP_PROB = 0.002
+
+ALGORITHMS = {
+    'aimd': TCPAIMD,
+    'cubic': TCPCubic,
+    'cubic+hystart': lambda: TCPCubic(hystart=True),
+    'reno': TCPReno,
+    'reno+hystart': lambda: TCPReno(hystart=True),
+    'westwood': TCPWestwood,
+    'hystart': TCPHyStart,
+}
+
+# blake2b digests of the per-ACK series of `update_cwnd` (see `_digest`), computed with the classes
+# as they were before the kernels, for `_trace(seed, loss_prob)`
+DIGESTS = {
+    ('aimd', 1, 0.02, False): '90b910fb8b90c6f921bd158b16727fae',
+    ('aimd', 1, 0.2, False): '510a8361ca3c112a70850ad060342a47',
+    ('aimd', 2, 0.02, False): '4e53fbd0ad696bc0f370a5792db938fc',
+    ('aimd', 2, 0.2, False): '287a6a2f11b0a52d32be4c604e797641',
+    ('cubic', 1, 0.02, False): 'c0ef6ac44f6fdaca9be98186e49bde71',
+    ('cubic', 1, 0.2, False): 'aae6a2372a46aa13d4ac1d2bdb781cb0',
+    ('cubic', 2, 0.02, False): '2cc0a43f5f759d0c7c6ee5f5059c8493',
+    ('cubic', 2, 0.2, False): 'dc85253d51419b84f869a6e010f3f59d',
+    ('cubic+hystart', 1, 0.02, False): 'e47b65243178d9b36781381d90682cd9',
+    ('cubic+hystart', 1, 0.2, False): '493156fd2e94dc468af3a93b6d3e3dfb',
+    ('cubic+hystart', 2, 0.02, False): 'b44dbcea68a1ea6db9a9a5406799ea2a',
+    ('cubic+hystart', 2, 0.2, False): '48071d6bc21ca3b308a9cfa635cd7cb6',
+    ('reno', 1, 0.02, False): '42532340630a6db00feb193a4c83cd37',
+    ('reno', 1, 0.02, True): '04a23df4f70ff5cbf7f7c7901255b81a',
+    ('reno', 1, 0.2, False): '31c066835ee53c44ed6759e1f05bc9fd',
+    ('reno', 1, 0.2, True): 'ac51e6a5d8083af7e62e79b5792b3f28',
+    ('reno', 2, 0.02, False): '7f2186e70470905e40404c453ddc388d',
+    ('reno', 2, 0.02, True): '8455e4c0ac38aeb3aaad60f762c1b7df',
+    ('reno', 2, 0.2, False): 'd2b8edc9051408cdca7f219646bc1874',
+    ('reno', 2, 0.2, True): 'e93a6e192f17a592cc395045cdba6a96',
+    ('reno+hystart', 1, 0.02, False): '42532340630a6db00feb193a4c83cd37',
+    ('reno+hystart', 1, 0.02, True): '55fbd550acd81e3c275be41494cfc1f4',
+    ('reno+hystart', 1, 0.2, False): '31c066835ee53c44ed6759e1f05bc9fd',
+    ('reno+hystart', 1, 0.2, True): 'ac51e6a5d8083af7e62e79b5792b3f28',
+    ('reno+hystart', 2, 0.02, False): '7f2186e70470905e40404c453ddc388d',
+    ('reno+hystart', 2, 0.02, True): '62e522a8bd9ed5edd1ff689823fdfcfb',
+    ('reno+hystart', 2, 0.2, False): 'd2b8edc9051408cdca7f219646bc1874',
+    ('reno+hystart', 2, 0.2, True): '734f18f47e55c8855a5fc9cf8285034b',
+    ('westwood', 1, 0.02, False): '82cc4fd3f9061ffb59e593b0e6993f03',
+    ('westwood', 1, 0.2, False): '6cdcad286db292be0f2eb323c02bc3b8',
+    ('westwood', 2, 0.02, False): '4708e770e64b00cf090731ce4a837782',
+    ('westwood', 2, 0.2, False): 'd2a94f79f628ca4b227c5e9b716d62c8',
+    ('hystart', 1, 0.02, False): 'deef9539810e670ad644edd652eb62b0',
+    ('hystart', 1, 0.2, False): 'b4ba703a2533eb08107270946bd87620',
+    ('hystart', 2, 0.02, False): 'fb509e74731ee0ee889c69dcd372ece2',
+    ('hystart', 2, 0.2, False): '44267233bcbf49832fbe8d504856de71',
+}
+
+
+def _trace(seed, loss_prob, num_acks=NUM_ACKS):
+    """Seeded trace with an `rtt` column, losses and RTO gaps."""
+    trace = simulation.generate_ack_trace(num_acks=num_acks, loss_prob=loss_prob, seed=seed,
+                                          base_rtt=simulation.BASE_RTT)
+    gaps = np.random.default_rng(seed).random(num_acks) < RTO_GAP_PROB
+    trace['time'] += np.cumsum(gaps * RTO_GAP)
+    return trace
+
+
+def _reno_inputs(trace, seed):
+    """ACK times with repeated values (duplicate ACKs), and random `timeout` / `dup_ack` inputs of `TCPReno`."""
+    rng = np.random.default_rng(seed + 1)
+    n = len(trace)
+    times = trace['time'].copy()
+    for i in np.flatnonzero(rng.random(n) < 0.6):
+        if i > 0:
+            times[i] = times[i - 1]  # in order: runs of equal times
+    return times.tolist(), (rng.random(n) < 0.01).tolist(), (rng.random(n) < 0.5).tolist()
+
+
+def _inputs(tcp, trace, seed=0, reno=False):
+    """Per-ACK keyword arguments of `update_cwnd`."""
+    times, losses, rtts = trace['time'].tolist(), trace['loss'].tolist(), trace['rtt'].tolist()
+    if reno:
+        times, timeouts, dup_acks = _reno_inputs(trace, seed)
+    for i, (ack_time, loss_event, rtt) in enumerate(zip(times, losses, rtts)):
+        kwargs = {'rtt': rtt} if tcp.uses_rtt else {}
+        if reno:
+            kwargs.update(timeout=timeouts[i], dup_ack=dup_acks[i])
+        yield ack_time, loss_event, kwargs
+
+
+def _flags(tcp):
+    return (tcp.cwnd, tcp.ssthresh, tcp.loss_event, tcp.rto_event, tcp.in_slow_start,
+            getattr(tcp, 'in_fast_recovery', False))
+
+
+def _series(tcp, trace, seed=0, reno=False):
+    """State after each ACK, with `update_cwnd` called once per ACK."""
+    series = []
+    for ack_time, loss_event, kwargs in _inputs(tcp, trace, seed, reno):
+        tcp.update_cwnd(ack_time, loss_event, **kwargs)
+        series.append(_flags(tcp))
+    return series
+
+
+def _digest(series):
+    return hashlib.blake2b(np.array(series, dtype=np.float64).tobytes(), digest_size=16).hexdigest()
+
+
+CASES = [(name, seed, loss_prob) for name in ALGORITHMS for seed in (1, 2) for loss_prob in (0.02, 0.2)]
+
+
+@pytest.mark.parametrize('name, seed, loss_prob', CASES)
+def test_update_cwnd_matches_previous_classes(name, seed, loss_prob):
+    trace = _trace(seed, loss_prob)
+    assert _digest(_series(ALGORITHMS[name](), trace)) == DIGESTS[name, seed, loss_prob, False]
+    if name.startswith('reno'):
+        assert _digest(_series(ALGORITHMS[name](), trace, seed, reno=True)) == DIGESTS[name, seed, loss_prob, True]
+
+
+@pytest.mark.parametrize('name, seed, loss_prob', CASES)
+def test_kernel_matches_update_cwnd(name, seed, loss_prob):
+    trace = _trace(seed, loss_prob)
+    for reno in (False, True) if name.startswith('reno') else (False,):
+        tcp, ref = ALGORITHMS[name](), ALGORITHMS[name]()
+        for ack_time, loss_event, kwargs in _inputs(tcp, trace, seed, reno):
+            tcp.update_cwnd(ack_time, loss_event, **kwargs)
+            ref._store(ref.kernel(ref._record(), ack_time, loss_event, **kwargs))
+            assert _flags(ref) == _flags(tcp)
+        assert ref.snapshot() == tcp.snapshot()
+
+
+@pytest.mark.parametrize('name, seed, loss_prob', CASES)
+def test_simulate_matches_update_cwnd(name, seed, loss_prob):
+    trace = _trace(seed, loss_prob)
+    tcp, ref = ALGORITHMS[name](), ALGORITHMS[name]()
+    assert tcp.hooks is None  # the block loop of the kernels
+    time_stamps, cwnd_evolution, loss_events, ssthreshs = simulation.simulate(tcp, trace, chunk_size=777)
+    series = _series(ref, trace)
+    assert cwnd_evolution.tolist() == [cwnd for cwnd, *_ in series]
+    assert ssthreshs.tolist() == [ssthresh for _, ssthresh, *_ in series]
+    assert loss_events.tolist() == [int(loss_event) for _, _, loss_event, *_ in series]
+    assert tcp.snapshot() == ref.snapshot()
+
+
+BATCH = [(TCPAIMD, BatchAIMD), (TCPCubic, BatchCubic), (TCPReno, BatchReno), (TCPWestwood, BatchWestwood)]
+
+
+@pytest.mark.parametrize('cls, engine_cls', BATCH)
+def test_batch_matches_scalar(cls, engine_cls):
+    num_flows = 8
+    traces = [_trace(seed, 0.05, num_acks=1000) for seed in range(num_flows)]
+    times, losses, rtts = (np.stack([trace[name] for trace in traces], axis=1) for name in ('time', 'loss', 'rtt'))
+    rng = np.random.default_rng(0)
+    cwnd = rng.integers(1, 20, num_flows)
+    ssthresh = rng.integers(5, 120, num_flows)
+
+    engine = engine_cls(num_flows, cwnd=cwnd, ssthresh=ssthresh)
+    cwnd_evolution, loss_events, ssthreshs = simulate_batch(engine, times, losses,
+                                                            rtts if engine_cls is BatchWestwood else None)
+    for f, trace in enumerate(traces):
+        tcp = cls(cwnd=int(cwnd[f]), ssthresh=int(ssthresh[f]))
+        series = _series(tcp, trace)
+        assert cwnd_evolution[:, f].tolist() == [cwnd for cwnd, *_ in series]
+        assert ssthreshs[:, f].tolist() == [ssthresh for _, ssthresh, *_ in series]
+        assert loss_events[:, f].tolist() == [int(loss_event) for _, _, loss_event, *_ in series]
+        assert (engine.in_slow_start[f], engine.rto_event[f]) == (tcp.in_slow_start, tcp.rto_event)
+
+
+def test_batch_reno_timeouts_and_duplicate_acks():
+    num_flows = 8
+    traces = [_trace(seed, 0.05, num_acks=1000) for seed in range(num_flows)]
+    inputs = [_reno_inputs(trace, seed) for seed, trace in enumerate(traces)]
+    engine = BatchReno(num_flows)
+    tcps = [TCPReno() for _ in range(num_flows)]
+    for i in range(len(traces[0])):
+        times = [flow_inputs[0][i] for flow_inputs in inputs]
+        losses = [trace['loss'][i] for trace in traces]
+        timeouts = [flow_inputs[1][i] for flow_inputs in inputs]
+        dup_acks = [flow_inputs[2][i] for flow_inputs in inputs]
+        engine.step(times, losses, timeout=timeouts, dup_ack=dup_acks)
+        for f, tcp in enumerate(tcps):
+            tcp.update_cwnd(times[f], bool(losses[f]), timeout=timeouts[f], dup_ack=dup_acks[f])
+            assert (engine.cwnd[f], engine.ssthresh[f], engine.loss_event[f], engine.rto_event[f],
+                    engine.in_slow_start[f], engine.dup_ack_count[f]) == \
+                (tcp.cwnd, tcp.ssthresh, tcp.loss_event, tcp.rto_event, tcp.in_slow_start, tcp.dup_ack_count)
+
+
+@pytest.mark.parametrize('cls', [TCPAIMD, TCPCubic, TCPReno])
+@pytest.mark.parametrize('seed, loss_prob', [(1, 0.02), (2, 0.2)])
+def test_fast_forward_matches_simulate(cls, seed, loss_prob):
+    trace = _trace(seed, loss_prob)
+    tcp, ref = cls(), cls()
+    time_stamps, cwnd_evolution, loss_events, ssthreshs = simulate_fast_forward(tcp, trace)
+    expected = simulation.simulate(ref, trace)
+    assert np.array_equal(time_stamps, expected[0])
+    assert np.array_equal(loss_events, expected[2])
+    if cls is TCPAIMD:
+        # closed form of AIMD's congestion avoidance (see `fastforward`)
+        np.testing.assert_allclose(cwnd_evolution, expected[1], rtol=1e-6)
+        np.testing.assert_allclose(ssthreshs, expected[3], rtol=1e-6)
+    else:
+        assert np.array_equal(cwnd_evolution, expected[1])
+        assert np.array_equal(ssthreshs, expected[3])
+        assert tcp.snapshot() == ref.snapshot()
+
+
+def test_fast_forward_rejects_unsupported_algorithms():
+    with pytest.raises(ValueError):
+        simulate_fast_forward(TCPWestwood(), _trace(1, 0.02))
+
+
+class Interrupt(Exception):
+    pass
+
+
+def _interrupt_after(num_acks):
+    """Event sink raising `Interrupt` on its `num_acks`-th ACK (a killed run)."""
+    count = [0]
+
+    def sink(event, tcp, ack_time):
+        count[0] += 1
+        if count[0] == num_acks:
+            raise Interrupt
+    sink.events = (Event.ACK,)
+    return sink
+
+
+@pytest.mark.parametrize('name', ['cubic+hystart', 'reno', 'westwood'])
+def test_checkpoint_resume_is_bit_identical(name, tmp_path):
+    trace = _trace(3, 0.05)
+    expected = simulation.simulate(ALGORITHMS[name](), trace)
+
+    tcp = ALGORITHMS[name]()
+    attach(tcp, _interrupt_after(2000))  # killed in the middle of a block, after some checkpoints
+    with pytest.raises(Interrupt):
+        simulation.simulate_checkpointed(tcp, trace, tmp_path, chunk_size=333, interval=0)
+    with open(tmp_path / simulation.CHECKPOINT_FILE) as f:
+        assert 0 < json.load(f)['offset'] < len(trace)
+
+    tcp = ALGORITHMS[name]()
+    results = simulation.simulate_checkpointed(tcp, trace, tmp_path, chunk_size=333)
+    for result, column in zip(results, expected):
+        assert np.array_equal(result, column)
+    full = ALGORITHMS[name]()
+    simulation.simulate(full, trace)
+    assert tcp.snapshot() == full.snapshot()
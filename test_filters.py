@@ -0,0 +1,86 @@
+"""Tests of the bandwidth/RTT filters (`methods/filters.py`) against their sequential definitions."""
+import bisect
+
+import numpy as np
+import pytest
+
+from methods.filters import WESTWOOD_ALPHA, BandwidthSampler, WindowedMax, WindowedMin, ewma
+
+
+def _keys_values(seed, n=5000):
+    rng = np.random.default_rng(seed)
+    keys = np.cumsum(rng.choice([0.0, 0.01, 0.05, 0.3], size=n))  # repeated keys, and gaps longer than the window
+    return keys.tolist(), rng.normal(10, 3, size=n).round(1).tolist()  # rounded: equal values too
+
+
+def _sequential_ewma(samples, alpha, initial=None):
+    out, y = [], initial
+    for x in samples:
+        y = x if y is None else alpha * y + (1 - alpha) * x
+        out.append(y)
+    return np.array(out)
+
+
+@pytest.mark.parametrize('cls, best', [(WindowedMax, max), (WindowedMin, min)])
+@pytest.mark.parametrize('window', [0.1, 1.0, 10.0])
+def test_windowed_filter_matches_a_scan_of_the_window(cls, best, window):
+    keys, values = _keys_values(seed=1)
+    f = cls(window)
+    assert f.value is None
+    for i, (key, value) in enumerate(zip(keys, values)):
+        expected = best(values[bisect.bisect_right(keys, key - window):i + 1])
+        assert f.update(key, value) == expected
+        assert f.value == expected
+        assert len(f) <= i + 1
+
+
+def test_windowed_filter_keeps_only_the_candidates():
+    f = WindowedMax(1e9)
+    for i in range(10_000):
+        f.update(i, -i)  # decreasing: every sample may become the maximum later
+    assert len(f) == 10_000
+    f = WindowedMax(1e9)
+    for i in range(10_000):
+        f.update(i, i)  # increasing: only the last one can be the maximum
+    assert len(f) == 1
+
+
+def test_windowed_filter_snapshot():
+    keys, values = _keys_values(seed=2, n=500)
+    f = WindowedMin(1.0)
+    for key, value in zip(keys[:250], values[:250]):
+        f.update(key, value)
+    g = WindowedMin.from_snapshot(f.snapshot())
+    for key, value in zip(keys[250:], values[250:]):
+        assert g.update(key, value) == f.update(key, value)
+    f.reset()
+    assert f.value is None
+
+
+@pytest.mark.parametrize('alpha', [0.0, 0.3, WESTWOOD_ALPHA, 0.999, 1.0])
+@pytest.mark.parametrize('initial', [None, 5.0])
+def test_ewma_matches_the_sequential_recursion(alpha, initial):
+    # long enough for several sub-blocks (the weights alpha ** -k would overflow over the whole array)
+    samples = np.random.default_rng(3).exponential(100, size=200_000)
+    expected = _sequential_ewma(samples.tolist(), alpha, initial)
+    assert np.allclose(ewma(samples, alpha, initial), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_ewma_segments_chain():
+    samples = np.random.default_rng(4).random(10_000)
+    first = ewma(samples[:3000])
+    second = ewma(samples[3000:], initial=first[-1])
+    assert np.allclose(np.concatenate((first, second)), ewma(samples), rtol=1e-12)
+    assert len(ewma([])) == 0
+    assert ewma([3.0]).tolist() == [3.0]
+
+
+def test_bandwidth_sampler():
+    sampler = BandwidthSampler()
+    # 100 segments/s, sampled every 0.2 s: the estimate converges to the rate, whatever the ACK spacing
+    rng = np.random.default_rng(5)
+    times = np.cumsum(rng.exponential(0.01, size=20_000))
+    for ack_time in times.tolist():
+        estimate = sampler.update(ack_time, 1, 0.2)
+    assert estimate == pytest.approx(len(times) / times[-1], rel=0.05)
+    assert BandwidthSampler.from_snapshot(sampler.snapshot()).bw_est == sampler.bw_est
@@ -0,0 +1,75 @@
+"""Tests of the RTT column of the traces and of the HyStart slow start exit (`methods/hystart.py`)."""
+import numpy as np
+import pytest
+
+from methods.aimd import TCPAIMD
+from methods.cubic import TCPCubic
+from methods.hystart import DELAY_THRESHOLD, HyStartDelay, TCPHyStart
+from methods.reno import TCPReno
+from simulation import (ACK_TIME_RECOVERY_DELAY, ACK_TIME_SATURATION_DELAY, RTT_JITTER, generate_ack_trace, simulate,
+                        simulate_summary)
+
+
+BASE_RTT = 0.05
+SATURATION_EVENT = 30  # Queue build-up (RTT increase) while CUBIC is still in slow start
+
+
+def test_rtt_column_does_not_change_the_other_columns():
+    with_rtt = generate_ack_trace(num_acks=1000, seed=1, loss_prob=0.05, base_rtt=BASE_RTT)
+    without_rtt = generate_ack_trace(num_acks=1000, seed=1, loss_prob=0.05)
+    assert without_rtt.dtype.names == ('ack', 'time', 'loss')
+    for name in without_rtt.dtype.names:
+        assert np.array_equal(with_rtt[name], without_rtt[name])
+
+
+def test_rtt_follows_the_queueing_delay():
+    trace = generate_ack_trace(num_acks=200, seed=2, saturation_event=SATURATION_EVENT, base_rtt=BASE_RTT)
+    queue_delay = trace['rtt'] - BASE_RTT
+    i = SATURATION_EVENT - 1
+    assert np.all((queue_delay[:i] >= 0) & (queue_delay[:i] < RTT_JITTER))
+    assert ACK_TIME_SATURATION_DELAY <= queue_delay[i] < ACK_TIME_SATURATION_DELAY + RTT_JITTER
+    assert np.all(queue_delay[i + 1:] >= ACK_TIME_RECOVERY_DELAY)
+
+
+def test_delay_exit():
+    hystart = HyStartDelay()
+    assert not any(hystart.exit(rtt) for rtt in (0.06, 0.05, 0.055, 0.05 * DELAY_THRESHOLD))
+    assert hystart.min_rtt == 0.05
+    assert hystart.exit(0.05 * DELAY_THRESHOLD + 1e-9)
+
+
+@pytest.mark.parametrize('cls', [lambda: TCPCubic(hystart=True), TCPHyStart])
+def test_slow_start_ends_when_the_rtt_grows(cls):
+    trace = generate_ack_trace(num_acks=200, seed=3, loss_prob=0, saturation_event=SATURATION_EVENT,
+                               base_rtt=BASE_RTT)
+    tcp = cls()
+    exit_ack = None
+    for ack, ack_time, rtt in zip(trace['ack'].tolist(), trace['time'].tolist(), trace['rtt'].tolist()):
+        tcp.update_cwnd(ack_time, False, rtt=rtt)
+        if exit_ack is None and not tcp.in_slow_start:
+            exit_ack = ack
+            assert tcp.ssthresh == tcp.cwnd
+    # without losses, slow start ends on the first RTT sample of the queue build-up
+    assert exit_ack == SATURATION_EVENT
+
+
+def test_cubic_without_hystart_overshoots():
+    trace = generate_ack_trace(num_acks=200, seed=3, loss_prob=0, saturation_event=SATURATION_EVENT,
+                               base_rtt=BASE_RTT)
+    _, cwnd_hystart, _, ssthresh_hystart = simulate(TCPCubic(hystart=True), trace)
+    _, cwnd, _, ssthresh = simulate(TCPCubic(), trace)
+    assert ssthresh_hystart[-1] == SATURATION_EVENT < ssthresh[-1]
+    assert cwnd_hystart[SATURATION_EVENT] < cwnd[SATURATION_EVENT]
+
+
+def test_uses_rtt():
+    assert not TCPCubic().uses_rtt and not TCPReno().uses_rtt
+    assert TCPCubic(hystart=True).uses_rtt and TCPReno(hystart=True).uses_rtt and TCPHyStart().uses_rtt
+    with pytest.raises(TypeError):
+        TCPAIMD(hystart=True)
+
+
+@pytest.mark.parametrize('run', [simulate, simulate_summary])
+def test_trace_without_rtt_is_an_error(run):
+    with pytest.raises(ValueError, match='needs RTT samples'):
+        run(TCPCubic(hystart=True), generate_ack_trace(num_acks=100, seed=1))
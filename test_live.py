@@ -0,0 +1,94 @@
+"""Tests of the live mode (`live.py`): event parsing, the flows' controllers and the asyncio service."""
+import asyncio
+
+import pytest
+
+from live import LiveModel, LiveService, replay_events
+from methods.cubic import TCPCubic
+from methods.reno import TCPReno
+from simulation import BASE_RTT, generate_ack_trace, simulate
+
+
+def _segments(trace, num_flows):
+    """The segment of the trace of each flow (see `replay_events`)."""
+    segment = len(trace) // num_flows
+    return [trace[i * segment:(i + 1) * segment] for i in range(num_flows)]
+
+
+@pytest.mark.parametrize('factory, base_rtt', [(TCPReno, None), (lambda: TCPCubic(hystart=True), BASE_RTT)])
+def test_replayed_flows_match_simulate(factory, base_rtt):
+    trace = generate_ack_trace(num_acks=30_000, seed=1, loss_prob=0.02, base_rtt=base_rtt)
+    model = LiveModel(factory)
+    for chunk in replay_events(trace, num_flows=7, chunk_size=1000):
+        model.apply(chunk)
+
+    assert model.num_events == 30_000 // 7 * 7 and model.num_errors == 0
+    for flow, segment in enumerate(_segments(trace, 7)):
+        _, cwnd, _, ssthresh = simulate(factory(), segment)
+        tcp = model.flows[str(flow).encode()]
+        assert (tcp.cwnd, tcp.ssthresh) == (cwnd[-1], ssthresh[-1])
+
+
+def test_column_and_line_paths_agree():
+    lines = [b'a 0.1 0', b'b 0.2 1', b'a 0.3 true', b'b 0.4 False', b'a 5.0 0']
+    fast, slow = LiveModel(TCPReno), LiveModel(TCPReno)
+    assert fast.apply(b'\n'.join(lines) + b'\n') == 5
+    for line in lines:
+        slow.apply(line + b'\n\n')  # blank lines: line path
+    assert fast.snapshot() == slow.snapshot()
+
+
+@pytest.mark.parametrize('bad_line', [b'c 0.25 x', b'c 0.25 2', b'c 0.25 lost', b'c zero 0', b'c 0.25', b'c'])
+def test_malformed_lines_are_counted_and_skipped(bad_line):
+    good = [b'a 0.1 0', b'b 0.2 1', b'a 0.3 1', b'b 0.4 0']
+    model, expected = LiveModel(TCPReno), LiveModel(TCPReno)
+    # the column path fails on the bad line before any update, then the lines are applied one by one
+    assert model.apply(b'\n'.join(good[:2] + [bad_line] + good[2:]) + b'\n') == 4
+    expected.apply(b'\n'.join(good) + b'\n')
+    assert model.num_errors == 1 and b'c' not in model.flows
+    assert model.snapshot(full=True)['flows'] == expected.snapshot(full=True)['flows']
+
+
+def test_lines_with_and_without_rtt():
+    model = LiveModel(lambda: TCPCubic(hystart=True))
+    reference = TCPCubic(hystart=True)
+    model.apply(b'f 0.1 0 0.05\nf 0.2 0\nf 0.3 0 0.2\n')
+    reference.update_cwnd(0.1, False, rtt=0.05)
+    reference.update_cwnd(0.2, False)
+    reference.update_cwnd(0.3, False, rtt=0.2)  # RTT increase: HyStart ends slow start
+    tcp = model.flows[b'f']
+    assert (tcp.cwnd, tcp.ssthresh, tcp.in_slow_start) == (reference.cwnd, reference.ssthresh, False)
+    assert model.num_errors == 0
+
+
+def test_snapshots_only_publish_the_updated_flows():
+    model = LiveModel(TCPReno)
+    model.apply(b'a 0.1 0\nb 0.1 0\n')
+    assert sorted(model.snapshot()['flows']) == ['a', 'b']
+    model.apply(b'b 0.2 0\nbad\n')
+    snapshot = model.snapshot()
+    assert list(snapshot['flows']) == ['b']
+    assert (snapshot['events'], snapshot['errors'], snapshot['num_flows']) == (3, 1, 2)
+    assert sorted(model.snapshot(full=True)['flows']) == ['a', 'b']
+    assert model.snapshot()['flows'] == {}
+
+
+def test_service_consumes_a_stream():
+    trace = generate_ack_trace(num_acks=5000, seed=2, loss_prob=0.05)
+    data = b''.join(replay_events(trace, num_flows=3))
+    snapshots = []
+
+    async def main():
+        reader = asyncio.StreamReader()
+        # reads that end in the middle of a line, and a last line without a newline
+        for start in range(0, len(data) - 1, 777):
+            reader.feed_data(data[start:min(start + 777, len(data) - 1)])
+        reader.feed_eof()
+        service = LiveService(LiveModel(TCPReno), publish=snapshots.append, interval=0.01, full=True)
+        await service.run(service.consume(reader))
+
+    asyncio.run(main())
+    last = snapshots[-1]
+    assert (last['events'], last['errors'], last['num_flows']) == (5000 // 3 * 3, 0, 3)
+    for flow, segment in enumerate(_segments(trace, 3)):
+        assert last['flows'][str(flow)][0] == simulate(TCPReno(), segment)[1][-1]
@@ -0,0 +1,47 @@
+"""Tests of the shared bottleneck simulator (`netsim.py`)."""
+import numpy as np
+import pytest
+
+import netsim
+from methods.aimd import TCPAIMD
+from methods.cubic import TCPCubic
+from methods.reno import TCPReno
+from netsim import BottleneckLink, jain_fairness, simulate_network
+
+
+@pytest.mark.parametrize('cls', [TCPAIMD, TCPReno])
+def test_every_flow_makes_progress(cls):
+    # 1000 flows started together: without start jitter and retransmission timeouts, half of them never
+    # got a packet through the queue refilled by the others
+    link = BottleneckLink(capacity=20000, buffer_size=500)
+    _, flows = simulate_network([cls() for _ in range(1000)], link, 10, record=False, seed=1)
+    assert flows['delivered'].min() > 0
+    assert jain_fairness(flows['throughput']) > 0.5
+
+
+def test_flow_recovers_from_a_dropped_window(monkeypatch):
+    def run():
+        # flow 1 sends its only packet into the buffer just filled by flow 0: nothing left in flight
+        link = BottleneckLink(capacity=100, buffer_size=10, prop_delay=0.01)
+        return simulate_network([TCPAIMD(cwnd=20), TCPAIMD(cwnd=1)], link, 20, start_jitter=0, seed=1)[1]
+
+    assert run()['delivered'][1] > 0
+    monkeypatch.setattr(netsim, 'RTO_INITIAL', float('inf'))  # the retransmission timer restarts it
+    assert run()['delivered'][1] == 0
+
+
+def test_seed_makes_runs_reproducible():
+    def run(seed):
+        link = BottleneckLink(capacity=2000, buffer_size=50)
+        return simulate_network([TCPAIMD(), TCPReno(), TCPCubic()], link, 5, seed=seed)
+
+    (records, flows), (same_records, same_flows) = run(7), run(7)
+    assert np.array_equal(records, same_records)
+    assert all(np.array_equal(flows[name], same_flows[name]) for name in flows)
+
+
+def test_queue_never_exceeds_the_buffer():
+    link = BottleneckLink(capacity=1000, buffer_size=20)
+    records, flows = simulate_network([TCPAIMD() for _ in range(10)], link, 10, seed=1)
+    assert records['queue'].max() <= 20
+    assert flows['lost'].sum() <= link.num_drops  # the drops detected before the end
@@ -0,0 +1,80 @@
+"""Tests of the sharded trace generation (`sharding.py`) and of the replay of sharded traces."""
+import numpy as np
+import pytest
+
+from methods.cubic import TCPCubic
+from methods.reno import TCPReno
+from sharding import generate_sharded_trace
+from simulation import (ACK_RTT_DTYPE, ACK_TIME_RECOVERY_DELAY, ACK_TIME_SATURATION_DELAY, RTT_JITTER,
+                        generate_ack_trace, simulate)
+from tracefile import ShardedTrace, load_trace
+
+
+BASE_RTT = 0.05
+
+
+def _unsharded(num_acks, shard_size, seed, **params):
+    """The same trace, generated piece by piece in memory from the same random streams."""
+    seed_seqs = np.random.SeedSequence(seed).spawn(-(-num_acks // shard_size))
+    pieces, start_time = [], 0.0
+    for i, seed_seq in enumerate(seed_seqs):
+        piece = generate_ack_trace(num_acks=min(shard_size, num_acks - i * shard_size), seed=seed_seq,
+                                   first_ack=i * shard_size + 1, start_time=start_time, **params)
+        pieces.append(piece)
+        start_time = piece['time'][-1]
+    return np.concatenate(pieces)
+
+
+def test_shards_stitch_into_one_trace(tmp_path):
+    trace = generate_sharded_trace(tmp_path, 1050, shard_size=100, loss_prob=0.05, base_rtt=BASE_RTT, seed=1,
+                                   workers=1)
+    expected = _unsharded(1050, 100, seed=1, loss_prob=0.05, base_rtt=BASE_RTT)
+
+    assert isinstance(trace, ShardedTrace)
+    assert len(trace.shards) == 11 and len(trace.shards[-1]) == 50
+    assert len(trace) == 1050
+    assert np.array_equal(trace['ack'], np.arange(1, 1051))
+    assert np.array_equal(trace['loss'], expected['loss'])
+    assert np.array_equal(trace['rtt'], expected['rtt'])
+    # each shard is shifted to start where the previous one ended
+    assert np.all(np.diff(trace['time']) > 0)
+    assert np.allclose(trace['time'], expected['time'], rtol=0, atol=1e-9)
+
+
+def test_saturation_follows_the_global_ack_number(tmp_path):
+    # the saturation event (ACK 80) is in the middle of the second shard
+    trace = generate_sharded_trace(tmp_path, 300, shard_size=50, base_rtt=BASE_RTT, saturation_event=80, seed=2,
+                                   workers=1)
+    queue_delay = trace['rtt'] - BASE_RTT
+    assert np.all(queue_delay[:79] < RTT_JITTER)
+    assert queue_delay[79] >= ACK_TIME_SATURATION_DELAY
+    assert np.all(queue_delay[80:] >= ACK_TIME_RECOVERY_DELAY)
+
+
+@pytest.mark.parametrize('saturation_event', [None, 0])
+def test_no_saturation(tmp_path, saturation_event):
+    trace = generate_sharded_trace(tmp_path, 300, shard_size=50, base_rtt=BASE_RTT, saturation_event=saturation_event,
+                                   seed=3, workers=1)
+    assert np.all(trace['rtt'] - BASE_RTT < RTT_JITTER)
+
+
+def test_same_trace_whatever_the_number_of_workers(tmp_path):
+    serial = generate_sharded_trace(tmp_path / 'serial', 5000, shard_size=700, seed=4, workers=1)
+    parallel = generate_sharded_trace(tmp_path / 'parallel', 5000, shard_size=700, seed=4, workers=3)
+    for name in ('ack', 'time', 'loss'):
+        assert np.array_equal(serial[name], parallel[name])
+
+
+@pytest.mark.parametrize('cls', [TCPReno, lambda: TCPCubic(hystart=True)])
+def test_sharded_replay_matches_the_unsharded_run(tmp_path, cls):
+    generate_sharded_trace(tmp_path, 20_000, shard_size=3000, loss_prob=0.01, base_rtt=BASE_RTT, seed=5, workers=1)
+    trace = load_trace(tmp_path)
+    in_memory = np.empty(len(trace), dtype=ACK_RTT_DTYPE)
+    for name in trace.keys():
+        in_memory[name] = trace[name]
+
+    # blocks of 1000 ACKs do not line up with the shards
+    results = simulate(cls(), str(tmp_path), chunk_size=1000)
+    expected = simulate(cls(), in_memory)
+    for column, expected_column in zip(results, expected):
+        assert np.array_equal(column, expected_column)
@@ -0,0 +1,90 @@
+"""Tests of the controller snapshots (`methods/base.py`) and of `simulation.simulate_checkpointed`."""
+import json
+
+import numpy as np
+import pytest
+
+from methods.aimd import TCPAIMD
+from methods.base import available_algorithms, get_algorithm
+from methods.cubic import TCPCubic
+from methods.events import EventCounter, attach
+from methods.reno import TCPReno
+from simulation import BASE_RTT, CHECKPOINT_FILE, generate_ack_trace, simulate, simulate_checkpointed
+
+
+ALGORITHMS = {name: get_algorithm(name) for name in available_algorithms()}
+ALGORITHMS.update({'cubic+hystart': lambda: TCPCubic(hystart=True), 'reno+hystart': lambda: TCPReno(hystart=True)})
+
+
+@pytest.fixture(scope='module')
+def trace():
+    return generate_ack_trace(num_acks=6000, seed=1, loss_prob=0.02, base_rtt=BASE_RTT)
+
+
+def _warm(factory, trace):
+    """An object after the first half of the trace."""
+    tcp = factory()
+    simulate(tcp, trace[:3000])
+    return tcp
+
+
+def _continue(tcp, trace):
+    return simulate(tcp, trace[3000:])
+
+
+@pytest.mark.parametrize('name', ALGORITHMS)
+def test_restored_snapshot_continues_like_the_original(name, trace):
+    tcp = _warm(ALGORITHMS[name], trace)
+    state = json.loads(json.dumps(tcp.snapshot()))  # plain values only
+    restored = type(tcp).from_snapshot(state)
+    assert restored.snapshot() == tcp.snapshot()
+    assert restored.hooks is None
+
+    into_new = ALGORITHMS[name]().restore(state)
+    for a, b, c in zip(_continue(restored, trace), _continue(into_new, trace), _continue(tcp, trace)):
+        assert np.array_equal(a, c) and np.array_equal(b, c)
+
+
+@pytest.mark.parametrize('name', ALGORITHMS)
+def test_fork_is_independent(name, trace):
+    tcp = _warm(ALGORITHMS[name], trace)
+    before = tcp.snapshot()
+    forks = [tcp.fork() for _ in range(2)]
+    first = _continue(forks[0], trace)
+    assert tcp.snapshot() == before == forks[1].snapshot()  # nested filters are copies too
+    for a, b in zip(_continue(forks[1], trace), first):
+        assert np.array_equal(a, b)
+
+
+def test_fork_does_not_copy_the_hooks(trace):
+    tcp = TCPAIMD()
+    counter = EventCounter()
+    attach(tcp, counter)
+    simulate(tcp, trace[:100])
+    fork = tcp.fork()
+    assert fork.hooks is None and 'hooks' not in tcp.snapshot()
+    count = sum(counter.counts.values())
+    simulate(fork, trace[100:])
+    assert sum(counter.counts.values()) == count
+
+
+def test_completed_checkpoint_is_reused(tmp_path, trace):
+    expected = simulate(TCPReno(), trace)
+    first = simulate_checkpointed(TCPReno(), trace, tmp_path, chunk_size=1000)
+    tcp = TCPReno()
+    again = simulate_checkpointed(tcp, trace, tmp_path, chunk_size=1000)
+    for a, b, c in zip(first, again, expected):
+        assert np.array_equal(a, c) and np.array_equal(b, c)
+    assert tcp.cwnd == expected[1][-1]  # restored from the last checkpoint
+    assert json.loads((tmp_path / CHECKPOINT_FILE).read_text())['offset'] == len(trace)
+
+
+@pytest.mark.parametrize('other', [
+    lambda trace: (TCPCubic(), trace),
+    lambda trace: (TCPReno(), trace[:5000]),
+    lambda trace: (TCPReno(), generate_ack_trace(num_acks=6000, seed=2, base_rtt=BASE_RTT)),
+])
+def test_checkpoint_of_another_run_is_an_error(tmp_path, trace, other):
+    simulate_checkpointed(TCPReno(), trace, tmp_path)
+    with pytest.raises(ValueError, match='checkpoint of another run'):
+        simulate_checkpointed(*other(trace), tmp_path)
@@ -0,0 +1,66 @@
+"""Tests of the streaming statistics (`stats.py`) and `simulation.simulate_summary`."""
+import math
+
+import numpy as np
+import pytest
+
+from methods.aimd import TCPAIMD
+from methods.cubic import TCPCubic
+from methods.reno import TCPReno
+from simulation import generate_ack_trace, simulate, simulate_summary
+from stats import PERCENTILES, HistogramSketch, RunningStats
+
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(1).normal(50, 10, 10_000)
+    stats = RunningStats()
+    for x in values.tolist():
+        stats.update(x)
+    assert stats.count == len(values)
+    assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert stats.std == pytest.approx(values.std(), rel=1e-9)
+    assert math.isnan(RunningStats().variance)
+
+
+@pytest.mark.parametrize('dist', ['uniform', 'normal', 'exponential'])
+def test_sketch_percentiles_match_numpy(dist):
+    rng = np.random.default_rng(2)
+    values = {'uniform': rng.uniform(0, 100, 50_000),
+              'normal': np.clip(rng.normal(40, 15, 50_000), 0, 100),
+              'exponential': np.clip(rng.exponential(10, 50_000), 0, 100)}[dist]
+    sketch = HistogramSketch(0, 100, bins=1000)
+    for x in values.tolist():
+        sketch.add(x)
+    for p in PERCENTILES:
+        # the error of the estimate is below the width of a bin
+        assert sketch.percentile(p) == pytest.approx(np.percentile(values, p), abs=100 / 1000)
+
+
+def test_sketch_clamps_out_of_range_values():
+    sketch = HistogramSketch(0, 10, bins=10)
+    for x in (-5, 50, 5):
+        sketch.add(x)
+    assert sketch.counts[0] == sketch.counts[-1] == sketch.counts[5] == 1
+    assert math.isnan(HistogramSketch().percentile(50))
+
+
+@pytest.mark.parametrize('cls', [TCPAIMD, TCPCubic, TCPReno])
+def test_summary_matches_the_full_series(cls):
+    ack_array = generate_ack_trace(num_acks=20_000, seed=5, loss_prob=0.01)
+    summary = simulate_summary(cls(), ack_array, chunk_size=1000)
+    time_stamps, cwnd, loss_events, _ = simulate(cls(), ack_array)
+    cwnd = np.asarray(cwnd, dtype=float)
+    time_stamps = np.asarray(time_stamps)
+
+    assert summary['num_acks'] == len(cwnd)
+    assert summary['duration'] == pytest.approx(time_stamps[-1] - time_stamps[0])
+    assert summary['mean_cwnd'] == pytest.approx(cwnd.mean(), rel=1e-9)
+    assert summary['std_cwnd'] == pytest.approx(cwnd.std(), rel=1e-6)
+    assert summary['num_losses'] == int(np.sum(loss_events))
+    # each window holds until the next ACK
+    time_avg = np.sum(cwnd[:-1] * np.diff(time_stamps)) / (time_stamps[-1] - time_stamps[0])
+    assert summary['time_avg_cwnd'] == pytest.approx(time_avg, rel=1e-9)
+    assert sum(summary[f'time_{phase}'] for phase in ('slow_start', 'avoidance', 'fast_recovery')) == \
+        pytest.approx(summary['duration'])
+    for p in PERCENTILES:
+        assert summary[f'p{p}_cwnd'] == pytest.approx(np.percentile(cwnd, p), abs=cls.CWND_MAX / 1000 + 1e-9)
@@ -0,0 +1,54 @@
+"""Tests of the parameter sweep runner (`sweep.py`)."""
+import csv
+
+from methods.aimd import TCPAIMD
+from simulation import generate_ack_trace, simulate_summary
+from sweep import GRID_KEYS, make_grid, run_config, run_sweep, write_table
+
+
+def _without_elapsed(rows):
+    return [{key: value for key, value in row.items() if key != 'elapsed'} for row in rows]
+
+
+def test_grid_is_the_cartesian_product():
+    grid = make_grid(['aimd', 'reno'], [1, 2, 3], [0.01, 0.05], [1], [64], [1000])
+    assert len(grid) == 2 * 3 * 2
+    assert all(set(config) == set(GRID_KEYS) for config in grid)
+    assert len({tuple(config.values()) for config in grid}) == len(grid)
+    assert grid[0] == dict(algorithm='aimd', seed=1, loss_prob=0.01, cwnd=1, ssthresh=64, num_acks=1000)
+
+
+def test_row_is_the_summary_of_the_run():
+    config = dict(algorithm='aimd', seed=3, loss_prob=0.02, cwnd=2, ssthresh=32, num_acks=2000)
+    row = run_config(config)
+    expected = simulate_summary(TCPAIMD(cwnd=2, ssthresh=32),
+                                generate_ack_trace(num_acks=2000, seed=3, loss_prob=0.02))
+    assert {key: row[key] for key in config} == config
+    assert {key: row[key] for key in expected} == expected
+    assert row['elapsed'] > 0
+
+
+def test_parallel_sweep_matches_serial_sweep():
+    grid = make_grid(['aimd', 'cubic', 'reno'], [1, 2], [0.01, 0.05], [1], [64], [2000])
+    serial = run_sweep(grid, workers=1)
+    parallel = run_sweep(grid, workers=2, chunksize=3)
+    # same rows, in the order of the grid
+    assert _without_elapsed(parallel) == _without_elapsed(serial)
+
+
+def test_write_table(tmp_path):
+    rows = run_sweep(make_grid(['aimd'], [1, 2], [0.01], [1], [64], [500]), workers=1)
+    path = tmp_path / 'sweep.csv'
+    write_table(rows, str(path))
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        read = list(reader)
+    assert reader.fieldnames == list(rows[0])
+    assert [row['seed'] for row in read] == ['1', '2']
+    assert [float(row['mean_cwnd']) for row in read] == [row['mean_cwnd'] for row in rows]
+
+
+def test_write_empty_table(tmp_path):
+    path = tmp_path / 'sweep.csv'
+    write_table([], str(path))
+    assert path.read_text().strip() == ','.join(GRID_KEYS)
@@ -0,0 +1,100 @@
+"""Tests of the binary trace format (`tracefile.py`) and of the replay of mapped traces."""
+import json
+
+import numpy as np
+import pytest
+
+import tracefile
+from methods.cubic import TCPCubic
+from methods.reno import TCPReno
+from simulation import generate_ack_trace, save_results, simulate
+from tracefile import ALIGNMENT, MappedTrace, load_trace, save_trace
+
+
+@pytest.mark.parametrize('base_rtt', [None, 0.05])
+def test_save_load_round_trip(tmp_path, base_rtt):
+    trace = generate_ack_trace(num_acks=10_000, seed=1, loss_prob=0.05, base_rtt=base_rtt)
+    path = tmp_path / 'trace.bin'
+    save_trace(path, trace)
+    mapped = load_trace(path)
+
+    assert isinstance(mapped, MappedTrace)
+    assert len(mapped) == len(trace)
+    assert list(mapped.keys()) == list(trace.dtype.names)
+    for name in trace.dtype.names:
+        assert isinstance(mapped[name], np.memmap)
+        assert np.array_equal(mapped[name], trace[name])
+    assert mapped['ack'].dtype == np.uint32  # the ACK numbers fit in 4 bytes
+    assert mapped['loss'].dtype == np.bool_
+
+
+def test_columns_are_aligned(tmp_path):
+    path = tmp_path / 'trace.bin'
+    save_trace(path, generate_ack_trace(num_acks=1001, seed=2, base_rtt=0.05))
+    with open(path, 'rb') as f:
+        f.seek(len(tracefile.MAGIC))
+        header = json.loads(f.read(int.from_bytes(f.read(4), 'little')))
+    assert header['num_acks'] == 1001
+    assert all(column['offset'] % ALIGNMENT == 0 for column in header['columns'])
+
+
+def test_large_ack_numbers_keep_64_bits(tmp_path):
+    trace = generate_ack_trace(num_acks=100, seed=3, first_ack=2**33)
+    path = tmp_path / 'trace.bin'
+    save_trace(path, trace)
+    mapped = load_trace(path)
+    assert mapped['ack'].dtype == np.int64
+    assert np.array_equal(mapped['ack'], trace['ack'])
+
+
+def test_empty_trace(tmp_path):
+    path = tmp_path / 'empty.bin'
+    save_trace(path, generate_ack_trace(num_acks=0, seed=1))
+    mapped = load_trace(path)
+    assert len(mapped) == 0
+    assert simulate(TCPReno(), mapped)[0].size == 0
+
+
+def test_slices_are_zero_copy(tmp_path):
+    path = tmp_path / 'trace.bin'
+    trace = generate_ack_trace(num_acks=1000, seed=4)
+    save_trace(path, trace)
+    mapped = load_trace(path)
+    part = mapped[100:200]
+    assert len(part) == 100
+    assert all(np.shares_memory(part[name], mapped[name]) for name in mapped.keys())
+    assert np.array_equal(part['time'], trace['time'][100:200])
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'trace.csv'
+    path.write_text('ack,time,loss\n1,0.1,0\n')
+    with pytest.raises(ValueError, match='not a trace file'):
+        load_trace(path)
+
+
+def test_rejects_newer_versions(tmp_path, monkeypatch):
+    path = tmp_path / 'trace.bin'
+    monkeypatch.setattr(tracefile, 'VERSION', tracefile.VERSION + 1)
+    save_trace(path, generate_ack_trace(num_acks=10, seed=1))
+    monkeypatch.undo()
+    with pytest.raises(ValueError, match='unsupported trace format version'):
+        load_trace(path)
+
+
+@pytest.mark.parametrize('cls', [TCPReno, lambda: TCPCubic(hystart=True)])
+def test_replay_matches_the_in_memory_trace(tmp_path, cls):
+    trace = generate_ack_trace(num_acks=20_000, seed=5, loss_prob=0.01, base_rtt=0.05)
+    path = tmp_path / 'trace.bin'
+    save_trace(path, trace)
+
+    expected = simulate(cls(), trace)
+    results = simulate(cls(), str(path), chunk_size=3000)  # a path is mapped by `simulate`
+    # the results of a mapped trace are memory-mapped too
+    assert all(isinstance(column, np.memmap) for column in results)
+    for column, expected_column in zip(results, expected):
+        assert np.array_equal(column, expected_column)
+
+    save_results(tmp_path / 'mapped.csv', *results)
+    save_results(tmp_path / 'memory.csv', *expected)
+    assert (tmp_path / 'mapped.csv').read_bytes() == (tmp_path / 'memory.csv').read_bytes()
@@ -0,0 +1,185 @@
+"""
+Compact columnar binary format for ACK traces, read through `numpy.memmap`.
+
+Layout of a trace file:
+- magic `TCPTRACE` (8 bytes) and the length of the header (uint32, little endian);
+- JSON header with the number of ACKs and, for each column, its name, dtype and offset in the file;
+- the columns, one after the other, each one aligned to `ALIGNMENT` bytes.
+
+The columns are `ack` (uint32 when the ACK numbers fit, else int64), `time` (float64), `loss` (bool)
+and, optionally, `rtt`. Loading a trace only maps the file: the data are read by the OS on access,
+so replaying a trace needs no more RAM than the chunk being processed.
+
+A very large trace can be split in shards: a directory with one trace file per shard and a
+`manifest.json` listing them in order (see `sharding.generate_sharded_trace`).
+`load_trace` maps such a directory as one logical `ShardedTrace`.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+
+MAGIC = b'TCPTRACE'
+VERSION = 1
+ALIGNMENT = 64  # Offset alignment of the header end and of each column
+WRITE_CHUNK = 1 << 20  # Number of values written at a time
+
+COLUMNS = ('ack', 'time', 'loss', 'rtt')  # Known columns, in file order
+MANIFEST = 'manifest.json'  # Index of the shards of a sharded trace
+
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _column_dtype(name, column):
+    """Storage dtype of a column: the ACK numbers use 4 bytes when they fit."""
+    if name == 'ack' and (len(column) == 0 or (column[0] >= 0 and column[-1] <= np.iinfo(np.uint32).max)):
+        return np.dtype('<u4')
+    return np.asarray(column[:0]).dtype.newbyteorder('<')
+
+
+def save_trace(path, trace):
+    """
+    Saves a trace in the binary trace format.
+
+    Parameters:
+    - `path`: Output file.
+    - `trace`: Trace from `simulation.generate_ack_trace` (or anything indexable by column name),
+      with at least the `ack`, `time` and `loss` columns.
+    """
+    names = trace.dtype.names if isinstance(trace, np.ndarray) else tuple(trace.keys())
+    names = [name for name in COLUMNS if name in names]
+    num_acks = len(trace['time'])
+    if 'ack' not in names:
+        raise ValueError("trace needs an 'ack' column")
+
+    # compute the layout: the header size depends on the offsets, so iterate until it is stable
+    dtypes = [_column_dtype(name, trace[name]) for name in names]
+    header_size = ALIGNMENT
+    while True:
+        columns, offset = [], header_size
+        for name, dtype in zip(names, dtypes):
+            columns.append({'name': name, 'dtype': dtype.str, 'offset': offset})
+            offset = _aligned(offset + num_acks * dtype.itemsize)
+        header = json.dumps({'version': VERSION, 'num_acks': num_acks, 'columns': columns}).encode()
+        if _aligned(len(MAGIC) + 4 + len(header)) <= header_size:
+            break
+        header_size = _aligned(len(MAGIC) + 4 + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for column, dtype in zip(columns, dtypes):
+            f.seek(column['offset'])
+            values = trace[column['name']]
+            for start in range(0, num_acks, WRITE_CHUNK):
+                f.write(np.ascontiguousarray(values[start:start + WRITE_CHUNK], dtype=dtype).tobytes())
+        f.truncate(offset)
+
+
+class MappedTrace:
+    """
+    Trace backed by a trace file: `trace[name]` is a read-only memmap of the column `name`,
+    `trace[start:stop]` is a (zero-copy) slice of all the columns and `len(trace)` is the number of ACKs.
+    """
+
+    def __init__(self, columns, path=None):
+        self.columns = columns
+        self.path = path
+
+    def keys(self):
+        return self.columns.keys()
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return MappedTrace({name: column[key] for name, column in self.columns.items()}, self.path)
+        return self.columns[key]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        return len(self.columns['time'])
+
+    def __repr__(self):
+        return f"MappedTrace({self.path!r}, num_acks={len(self)}, columns={list(self.columns)})"
+
+
+class ShardedTrace:
+    """
+    Trace split in several trace files, replayed as one logical trace.
+
+    `blocks()` iterates over the shards without copying, and `trace[name]` concatenates
+    the column `name` of all the shards in memory.
+    """
+
+    def __init__(self, shards, path=None):
+        self.shards = shards
+        self.path = path
+
+    def keys(self):
+        return self.shards[0].keys() if self.shards else ('ack', 'time', 'loss')
+
+    def __getitem__(self, name):
+        if not self.shards:
+            return np.empty(0)
+        return np.concatenate([shard[name] for shard in self.shards])
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def blocks(self, chunk_size):
+        """
+        Yields (time, loss, rtt) column slices with up to `chunk_size` ACKs, shard after shard
+        (rtt None if absent).
+        """
+        for shard in self.shards:
+            times, losses = shard['time'], shard['loss']
+            rtts = shard['rtt'] if 'rtt' in shard else None
+            for start in range(0, len(shard), chunk_size):
+                end = start + chunk_size
+                yield times[start:end], losses[start:end], rtts[start:end] if rtts is not None else None
+
+    def __repr__(self):
+        return f"ShardedTrace({self.path!r}, num_acks={len(self)}, shards={len(self.shards)})"
+
+
+def save_manifest(directory, shard_files, **metadata):
+    """Writes the manifest of a sharded trace: the shard files (relative to `directory`), in order."""
+    manifest = {'version': VERSION, 'shards': list(shard_files), **metadata}
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_trace(path):
+    """
+    Maps a trace file (see `save_trace`), or a directory of trace shards, without reading it.
+
+    Returns:
+    - A `MappedTrace` (or `ShardedTrace`), usable wherever `simulation.simulate` takes a trace.
+    """
+    if os.path.isdir(path):
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        shards = [load_trace(os.path.join(path, name)) for name in manifest['shards']]
+        return ShardedTrace(shards, path=os.fspath(path))
+
+    with open(path, 'rb') as f:
+        prefix = f.read(len(MAGIC) + 4)
+        if len(prefix) < len(MAGIC) + 4 or prefix[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+        header = json.loads(f.read(struct.unpack('<I', prefix[len(MAGIC):])[0]))
+    if header['version'] > VERSION:
+        raise ValueError(f"{path}: unsupported trace format version {header['version']}")
+
+    num_acks = header['num_acks']
+    columns = {}
+    for column in header['columns']:
+        dtype = np.dtype(column['dtype'])
+        if num_acks == 0:
+            columns[column['name']] = np.empty(0, dtype=dtype)
+        else:
+            columns[column['name']] = np.memmap(path, dtype=dtype, mode='r', offset=column['offset'], shape=(num_acks,))
+    return MappedTrace(columns, path=os.fspath(path))